@@ -1,6 +1,7 @@
-#!/usr/bin/env python2
+#!/usr/bin/env python3
 
 import os
+import re
 import sys
 import argparse
 
@@ -10,27 +11,77 @@ parser.add_argument("-i", "--input", type=str, default=None,
                     help="Input directory of files to summarize")
 parser.add_argument("-o", "--output", type=str,
                     help="Summaries output directory")
+parser.add_argument("-k", "--key-suffix", type=str, default=None,
+                    help="set suffix of the sentence keys of the topic in the "
+                    "clusters files (e.g. A when sentence n is written nA). "
+                    "By default, the set of the topic name (D0801-A: A) if "
+                    "the file has such keys, else its only suffix")
 args = parser.parse_args()
 
-for pfile in os.listdir(args.input):
-    with open(args.input+pfile) as file:
-        print(pfile)
-        filename = pfile.split(".")[0]
-        sourcefile = args.output+filename+".sent.tok"
-        print(sourcefile)
-        nsent = sum(1 for line in open(sourcefile))
-        print("sourcefile sentences number is "+str(nsent))
-        with open(args.output+filename+".sent.clus", "w") as ofile:
-            print(args.output+filename+".sent.clus")
-            lines = file.readlines()
-            lines = [str.strip(line) for line in lines]
-            for n in range(nsent):
-                found = False
-                print(n)
-                for num, line in enumerate(lines):
-                    if str(n) in line:
-                        ofile.write(str(num)+"\n")
-                        found = True
-                        # print(num)
-                if not found:
-                    sys.exit("Missing sentence!!!")
+KEY = re.compile(r"^(\d+)([A-Za-z]*)$")
+
+
+def cluster_index(lines):
+    """
+    {(sentence number, set suffix): number of its cluster} of the lines of a
+    .clus file, keys being written n or n<set> (3, 3A)
+    """
+    index = {}
+    for num, line in enumerate(lines):
+        for key in line.split():
+            match = KEY.match(key)
+            if match:
+                index.setdefault((int(match.group(1)), match.group(2)), num)
+    return index
+
+
+def topic_suffix(filename, index):
+    """
+    suffix of the keys of the sentences of the topic filename, None if it
+    cannot be told
+    """
+    suffixes = set(suffix for n, suffix in index)
+    match = re.search(r"-([A-Za-z]+)$", filename)
+    if match and match.group(1) in suffixes:
+        return match.group(1)
+    if len(suffixes) == 1:
+        return suffixes.pop()
+    return None
+
+
+missing_topics = 0
+for pfile in sorted(os.listdir(args.input)):
+    print(pfile)
+    filename = pfile.split(".")[0]
+    sourcefile = os.path.join(args.output, filename+".sent.tok")
+    print(sourcefile)
+    with open(sourcefile) as source:
+        nsent = sum(1 for line in source)
+    print("sourcefile sentences number is "+str(nsent))
+    with open(os.path.join(args.input, pfile)) as file:
+        index = cluster_index(file)
+    suffix = args.key_suffix
+    if suffix is None:
+        suffix = topic_suffix(filename, index)
+    suffixes = sorted(set(suffix for n, suffix in index))
+    if suffix is None or suffix not in suffixes:
+        print("%s: no key of the topic sentences (key sets: %s), use -k" % (
+            pfile, " ".join(repr(s) for s in suffixes) or "none"),
+            file=sys.stderr)
+        missing_topics += 1
+        continue
+    clusters = [index.get((n, suffix)) for n in range(nsent)]
+    missing = [n for n, num in enumerate(clusters) if num is None]
+    if missing:
+        print("%s: %d missing sentences: %s" % (
+            pfile, len(missing), " ".join(str(n) for n in missing)),
+            file=sys.stderr)
+        missing_topics += 1
+        continue
+    outfile = os.path.join(args.output, filename+".sent.clus")
+    print(outfile)
+    with open(outfile, "w") as ofile:
+        ofile.write("".join(str(num)+"\n" for num in clusters))
+
+if missing_topics:
+    sys.exit("Missing sentences in %d topics!!!" % missing_topics)
@@ -284,6 +284,7 @@ class SentenceSelectionILP(IntegerLinearProgram):
             use_min_length_ratio = False, \
             min_length_ratio = 0.5):
         IntegerLinearProgram.__init__(self)
+        self.number_format = "%+f"
         self.use_removables = use_removables
         self.use_subsentences = use_subsentences
         self.use_alternatives = use_alternatives
@@ -302,7 +303,7 @@ class SentenceSelectionILP(IntegerLinearProgram):
             self.concept_dict[concept] = id
             self.dict_to_weight[id] = concept_weight[concept]
             next_concept_id += 1
-        self.constraints["length"] = ""
+        self.add_constraint("length")
 
     def nodeHasSelectedParent(self, node):
         if node.parent != None:
@@ -357,40 +358,40 @@ class SentenceSelectionILP(IntegerLinearProgram):
             if not hasattr(node, "id"):
                 continue
             if self.nodeIsSubsentence(child):
-                self.constraints["sub_%s_%s" % (node.id, child.id)] = "%s - %s <= 0" % (node.id, child.id)
+                self.add_constraint("sub_%s_%s" % (node.id, child.id), [node.id, child.id], [1, -1], "<=", 0)
             if self.nodeIsRemovable(child):
-                self.constraints["rem_%s_%s" % (node.id, child.id)] = "%s - %s <= 0" % (child.id, node.id)
+                self.add_constraint("rem_%s_%s" % (node.id, child.id), [child.id, node.id], [1, -1], "<=", 0)
             if self.nodeIsAlternative(child):
                 name = "alt_%s_%d" % (node.id, node.index) # hack: prevent collision with another alternative from the parent
-                if name not in self.constraints:
-                    self.constraints[name] = " - " + node.id + " + " + child.id
-                else:
-                    self.constraints[name] += " + " + child.id
+                if name not in self.row_index:
+                    self.add_constraint(name, [node.id], -1, "=", 0)
+                self.add_constraint(name, [child.id], 1)
         if not node.isLeaf():
             node.length, node.concepts = get_concepts_from_node(node)
             cumulative_length += node.length
         if self.nodeIsSubsentence(node) or self.nodeIsRemovable(node) or self.nodeIsAlternative(node):
             node.length = cumulative_length
             cumulative_length = 0
-            self.constraints["length"] += " + %d %s" % (node.length, node.id)
+            self.add_constraint("length", [node.id], [node.length])
             for concept in node.concepts:
                 if concept not in self.concept_dict:
                     continue
                 concept = self.concept_dict[concept]
                 name = "in_%s_%s" % (node.id, concept)
-                self.constraints[name] = node.id + " - " + concept + " <= 0"
+                self.add_constraint(name, [node.id, concept], [1, -1], "<=", 0)
                 self.binary[concept] = 1
                 name = "presence_" + concept
-                if name not in self.constraints:
-                    self.constraints[name] = " - " + concept
-                self.constraints[name] += " + " + node.id
+                if name not in self.row_index:
+                    self.add_constraint(name, [concept], -1, ">=", 0)
+                self.add_constraint(name, [node.id], 1)
             if self.use_min_length or self.use_min_length_ratio \
                     and len(node.getParentsByFilter(lambda x: self.nodeIsSubsentence(x) or self.nodeIsRemovable(x))) == 0:
                 from_same_sentence = [x for x in node if self.nodeIsSubsentence(x) or self.nodeIsRemovable(x) or self.nodeIsAlternative(x)]
                 total_length = reduce(lambda x, y: x + y, [x.length for x in from_same_sentence], 0)
                 for removable in from_same_sentence:
                     name = "min_length_%s" % removable.id
-                    self.constraints[name] = " + ".join("%d %s" % (x.length, x.id) for x in from_same_sentence if x != removable)
+                    others = [x for x in from_same_sentence if x != removable]
+                    self.add_constraint(name, [x.id for x in others], [x.length for x in others], ">=", 0)
                     actual_length = removable.length
                     min_length_ratio = int(total_length * self.min_length_ratio)
                     if self.use_min_length:
@@ -399,24 +400,14 @@ class SentenceSelectionILP(IntegerLinearProgram):
                             actual_length -= min_length_ratio
                     else:
                         actual_length -= min_length_ratio
-                    self.constraints[name] += " %+d %s >= 0" % (actual_length, removable.id)
+                    self.add_constraint(name, [removable.id], [actual_length])
         return cumulative_length
 
     def run(self):
-        self.constraints["length"] += " <= %d" % self.length_limit
-        #del self.constraints["length"]
-        self.objective["score"] = ""
-        for constraint in self.constraints:
-            if constraint.startswith("alt_"):
-                self.constraints[constraint] += " = 0"
+        self.set_bound("length", "<=", self.length_limit)
         for concept in self.binary.keys():
             if concept.startswith("c"):
-                if self.dict_to_weight[concept] >= 0:
-                    self.objective["score"] += " +"
-                else:
-                    self.objective["score"] += " -"
-                self.objective["score"] += " %f %s" % (self.dict_to_weight[concept], concept)
-                self.constraints["presence_%s" % concept] += " >= 0"
+                self.add_objective([concept], [self.dict_to_weight[concept]])
         IntegerLinearProgram.run(self)
 
 def postProcess(text):
@@ -1,4 +1,4 @@
-import os, sys, re, math, util, ilp, text, treenode, prob_util
+import os, sys, re, math, util, ilp, presolve, localsearch, text, treenode, prob_util
 from operator import itemgetter  # for sorting dictionaries by value
 from globals import *
 
@@ -47,9 +47,11 @@ class Mapper:
         """
         abstract()
 
-    def run(self, max_length=100, style='ilp'):
+    def run(self, max_length=100, style='ilp', presolved=False, time_limit=1):
         """
         Step 3: create formatted output
+        style: 'ilp' solves the ILP, 'local' runs localsearch.LocalSearch for time_limit seconds
+        presolved: reduce the ILP with presolve.presolve before solving it
         """
         ## make sure step 2 has been completed
         if not self.relevant_sents:
@@ -78,59 +80,54 @@ class Mapper:
         #print 'avg sent length [%1.2f]' %(1.0*sum(sent_lengths)/len(sent_lengths))
         #print
 
-        ## custom format
+        ## local search over the sentence selections, same objective as the ILP
         if style != 'ilp':
-            ## TODO: this is broken! Add local search solver class
-            output.append('%s NUM_SENTENCES %d' %(id, len(curr_sents)))
-            output.append('%s NUM_CONCEPTS %d' %(id, len(curr_concept_index)))
-            output.append('%s TEXT TOPIC %s %s' %(id, self.problem.title, self.problem.narr))
-
-            ## sentence info
-            for sent_index in range(len(curr_sents)):
-                output.append('%s LENGTH %d %d' %(id, sent_index, curr_sents[sent_index].length))
-                output.append('%s TEXT %d %s' %(id, sent_index, curr_sents[sent_index].original))
-                concept_list = ' '.join(map(str, curr_sent_concepts[sent_index]))
-                output.append('%s CONCEPTS %d %d %s' %(id, sent_index, len(curr_sent_concepts[sent_index]), concept_list))
-
-            ## concept info
-            for concept in curr_concept_weights.keys():
-                str_concept = '_'.join(concept)
-                concept_weight = curr_concept_weights[concept]
-                concept_index = curr_concept_index[concept]
-                output.append('%s CONCEPT_INFO %d %1.4f %s' %(id, concept_index, concept_weight, str_concept))
-
-        ## ILP output format used by glpsol (glpk)
-        else:
-            problem = ilp.IntegerLinearProgram()
-            obj = ' + '.join(['%f c%d' %(weight, curr_concept_index[concept]) for concept, weight in curr_concept_weights.items()])
-            obj = obj.replace(' + -', ' - ')
-            problem.objective["score"] = obj
+            concept_weights = dict((concept_index, curr_concept_weights[concept]) for concept, concept_index in curr_concept_index.items())
+            search = localsearch.LocalSearch(concept_weights, dict(enumerate(curr_sent_concepts)), [sent.length for sent in curr_sents], max_length, forced_coverage=True)
+            output = [curr_sents[sent_index] for sent_index in search.run(time_limit=time_limit)]
+            sys.stderr.write('%s\n' %search.report())
 
-            s1 = ' + '.join(['%d s%d' %(curr_sents[sent_index].length, sent_index) for sent_index in range(len(curr_sents))])
-            s2 = ' <= %s\n' %max_length
-            problem.constraints["length"] = s1 + s2
+        ## ILP solved by glpsol (glpk) or scipy
+        else:
+            concept_weights = dict((concept_index, curr_concept_weights[concept]) for concept, concept_index in curr_concept_index.items())
+            sentences = list(range(len(curr_sents)))
+            concept_sents = curr_concept_sents
+            bonus = {}
+            if presolved:
+                ## the absence constraints cover all the concepts of the selected sentences
+                reduction = presolve.presolve(concept_weights, dict(enumerate(curr_sent_concepts)), [sent.length for sent in curr_sents], forced_coverage=True)
+                sys.stderr.write('%s\n' %reduction.report())
+                concept_weights = reduction.concept_weights
+                sentences = sorted(reduction.sentence_concepts)
+                concept_sents = reduction.index
+                bonus = reduction.bonus
 
-            for concept, concept_index in curr_concept_index.items():
+            problem = ilp.IntegerLinearProgram()
+            problem.number_format = "%+f"
+            for sent_index in sentences:
+                problem.add_binary("s%d" % sent_index, curr_sents[sent_index])
+            for concept_index in concept_weights:
+                problem.add_binary("c%d" % concept_index)
+            problem.add_objective(["c%d" % concept_index for concept_index in concept_weights], list(concept_weights.values()))
+            problem.add_objective(["s%d" % sent_index for sent_index in bonus], list(bonus.values()))
+
+            problem.add_constraint("length", ["s%d" % sent_index for sent_index in sentences], [curr_sents[sent_index].length for sent_index in sentences], "<=", max_length)
+
+            for concept_index in concept_weights:
+                sents = ["s%d" % sent_index for sent_index in concept_sents[concept_index]]
                 ## at least one sentence containing a selected bigram must be selected
-                s1 = ' + '.join([ 's%d' %sent_index for sent_index in curr_concept_sents[concept_index]])
-                s2 = ' - c%d >= 0' %concept_index
-                problem.constraints["presence_%d" % concept_index] = s1 + s2
+                problem.add_constraint("presence_%d" % concept_index, sents, 1, ">=", 0)
+                problem.add_constraint("presence_%d" % concept_index, ["c%d" % concept_index], -1)
 
                 ## if a bigram is not selected then all sentences containing it are deselected
-                s1 = ' + '.join([ 's%d' %sent_index for sent_index in curr_concept_sents[concept_index]])
-                s2 = '- %d c%d <= 0' %(len(curr_concept_sents[concept_index]), concept_index)
-                problem.constraints["absence_%d" % concept_index] = s1 + s2
-
-            for sent_index in range(len(curr_sents)):
-                problem.binary["s%d" % sent_index] = curr_sents[sent_index]
-            for concept, concept_index in curr_concept_index.items():
-                problem.binary["c%d" % concept_index] = 1
+                problem.add_constraint("absence_%d" % concept_index, sents, 1, "<=", 0)
+                problem.add_constraint("absence_%d" % concept_index, ["c%d" % concept_index], -len(sents))
 
             #problem.debug = 1
             problem.run()
             output = []
-            for sent_index in range(len(curr_sents)):
-                if problem.output["s%d" % sent_index] == 1:
+            for sent_index in sentences:
+                if problem.output.get("s%d" % sent_index) == 1:
                     output.append(curr_sents[sent_index])
 
         return output
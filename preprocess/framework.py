@@ -1,8 +1,38 @@
-import os, sys, re
-import util, compression, text, ilp
+import os, sys, re, multiprocessing, multiprocessing.util
+import util, compression, text, ilp, problemcache
 from globals import *
 import nltk
 
+def cached_documents(name):
+    """
+    property for the documents of a problem, read from its cache shard (see
+    problemcache) when first used
+    """
+    def get(self):
+        if self.shard is not None:
+            shard, self.shard = self.shard, None
+            shard.load(self)
+        return self.__dict__.get('_' + name)
+    def set(self, value):
+        self.__dict__['_' + name] = value
+    return property(get, set)
+
+def load_document(job):
+    """
+    Document of a (path, is_clean, split) job, split in sentences if split
+    """
+    path, is_clean, split = job
+    doc = text.Document(path, is_clean=is_clean)
+    if split: doc.get_sentences()
+    return doc
+
+def init_loader(splitta_model):
+    # the sentence splitter of a process loading documents
+    text.text_processor.load_splitta_model(splitta_model)
+    if MEMO_FILE and multiprocessing.current_process().name != 'MainProcess':
+        # pool workers exit without running the atexit functions
+        multiprocessing.util.Finalize(None, util.save_memos, (MEMO_FILE, text.text_processor.memos), exitpriority=0)
+
 class SummaryProblem:
     """
     A class for representing elements of a summary problem
@@ -14,6 +44,8 @@ class SummaryProblem:
     self.old_docs_paths    a list of paths to 'old' input docs (update task only)
     self.new_docs         [Document1, ... ]
     self.old_docs         [Document1, ... ]
+    self.ir_docs          [Document1, ... ] (ir.get_docs)
+    self.shard            problemcache.Shard of the documents not loaded yet
     self.annotators       set(['A', 'B', 'C', 'D'])
     self.training         {'A': <summary A>, ... }
     """
@@ -32,30 +64,37 @@ class SummaryProblem:
         self.loaded_ir_docs = False
 
         ## variables that might get set later
+        self.shard = None
         self.new_docs = None
         self.old_docs = None
+        self.ir_docs = None
         self.training = {}
         self.annotators = set()
 
-    def load_documents(self, is_clean=False):
+    def document_jobs(self, is_clean=False):
         """
+        load_document jobs of the new then old documents
         """
-        self.new_docs = []
-        for path in self.new_docs_paths:
-            doc = text.Document(path, is_clean=is_clean)
-            doc.get_sentences()
-            self.new_docs.append(doc)
-	#print "**************************************************"
-        #print self.new_docs_paths
-        self.old_docs = []
-        for path in self.old_docs_paths:
-            doc = text.Document(path, is_clean=is_clean)
-            self.old_docs.append(doc)
-	#print "=================================================="
-        #print self.old_docs_paths
+        return [(path, is_clean, True) for path in self.new_docs_paths] + \
+               [(path, is_clean, False) for path in self.old_docs_paths]
 
+    def set_documents(self, docs):
+        """
+        docs are the results of the document_jobs
+        """
+        self.new_docs = docs[:len(self.new_docs_paths)]
+        self.old_docs = docs[len(self.new_docs_paths):]
         self.loaded_docs = True
 
+    def load_documents(self, is_clean=False):
+        """
+        """
+        self.set_documents([load_document(job) for job in self.document_jobs(is_clean)])
+
+    new_docs = cached_documents('new_docs')
+    old_docs = cached_documents('old_docs')
+    ir_docs = cached_documents('ir_docs')
+
     def _load_training(self, path, source='DUC'):
         """
         load [human] summaries, setting these member variables:
@@ -278,35 +317,64 @@ def setup_DUC_basic(task, skip_updates=False):
     task.problems = problems
 
 def setup_DUC_sentences(task, parser=None, reload=False, options=None,
-                        is_clean=False):
-
-    ## load problems quickly from pickle file
-    if (not reload) and os.path.isfile(task.data_pickle):
-        sys.stderr.write('Loading [%s] problem data from [%s]\n' %(task.name, task.data_pickle))
-        task.problems = util.load_pickle(task.data_pickle)
-        return
-
-    ## parse sentences
-    if options:
-        text.text_processor.load_splitta_model(options.splitta_model)
-    else:
-        text.text_processor.load_splitta_model('/u/dgillick/sbd/splitta/model_nb/')
+                        is_clean=False, jobs=1):
+    """
+    load the documents of the problems, from the cache or split by jobs
+    processes
+    """
+
+    ## problems whose cache shard is up to date are loaded when used
+    cache = problemcache.ProblemCache(task.data_cache)
+    problems = []
     for problem in task.problems:
-        sys.stderr.write('%s\n' %problem.id)
-        problem.load_documents(is_clean=is_clean)
+        entry = None
+        if not reload:
+            entry = cache.lookup(problem, is_clean=is_clean, parsed=bool(parser))
+        if entry: cache.attach(problem, entry)
+        else: problems.append(problem)
+    sys.stderr.write('Loading [%s] problem data from [%s]: %d cached, %d to load\n'
+                     %(task.name, task.data_cache, len(task.problems) - len(problems), len(problems)))
+    if problems:
+        ## split sentences, the documents of all the problems are shared by the
+        ## workers and come back in order
+        if options: splitta_model = options.splitta_model
+        else: splitta_model = '/u/dgillick/sbd/splitta/model_nb/'
+        doc_jobs = [problem.document_jobs(is_clean) for problem in problems]
+        pool = None
+        if jobs > 1:
+            pool = multiprocessing.Pool(jobs, init_loader, (splitta_model,))
+            docs = pool.imap(load_document, [job for problem_jobs in doc_jobs for job in problem_jobs], chunksize=4)
+        else:
+            init_loader(splitta_model)
+            docs = (load_document(job) for problem_jobs in doc_jobs for job in problem_jobs)
+        try:
+            for problem, problem_jobs in zip(problems, doc_jobs):
+                sys.stderr.write('%s\n' %problem.id)
+                problem.set_documents([next(docs) for job in problem_jobs])
+                if parser:
+                    for doc in problem.new_docs:
+                        doc.parse_sentences(parser)
+                        problem.parsed = True
+        except BaseException:
+            if pool: pool.terminate()
+            raise
+        finally:
+            if pool:
+                pool.close()
+                pool.join()
+
         if parser:
-            for doc in problem.new_docs:
-                doc.parse_sentences(parser)
-                problem.parsed = True
+            parser.run()
+            for sentence, parsetree in parser.parsed.items():
+                sentence.parsed = parsetree
 
-    if parser:
-        parser.run()
-        for sentence, parsetree in parser.parsed.items():
-            sentence.parsed = parsetree
+        sys.stderr.write('Saving [%s] problem data in [%s]\n' %(task.name, task.data_cache))
 
-    ## save pickled version for faster loading later
-    sys.stderr.write('Saving [%s] problem data in [%s]\n' %(task.name, task.data_pickle))
-    util.save_pickle(task.problems, task.data_pickle)
+    ## save the shards for faster loading later (and the times of the
+    ## unchanged sources in the manifest)
+    for problem in problems:
+        cache.save(problem, is_clean=is_clean)
+    cache.write_manifest()
 
 
 def build_program(problem, concept_weight, length=100, sentences = None):
@@ -472,46 +540,43 @@ def build_alternative_program(problem, concept_weight, length=100, sentences = N
 
     # generate the actual ILP
     program = ilp.IntegerLinearProgram()
+    program.number_format = "%+f"
 
-    program.objective["score"] = ' + '.join(['%f c%d' %(concept_weight[concept], concept_index[concept]) for concept in concept_index])
+    for sent_index in range(len(relevant_sentences)):
+        program.add_binary("s%d" % sent_index, relevant_sentences[sent_index])
+    for concept, index in concept_index.items():
+        program.add_binary("c%d" % index)
+    for acronym, id in acronym_id.items():
+        program.add_binary("a%d" % id)
+
+    program.add_objective(["c%d" % concept_index[concept] for concept in concept_index], [concept_weight[concept] for concept in concept_index])
 
-    s1 = ' + '.join(['%d s%d' %(relevant_sentences[sent_index].length, sent_index) for sent_index in range(len(relevant_sentences))])
+    program.add_constraint("length", ["s%d" % sent_index for sent_index in range(len(relevant_sentences))], [sent.length for sent in relevant_sentences], "<=", length)
     # add enough space to fit the definition of each acronym employed in the summary
-    s_acronyms = ' + '.join(['%d a%d' %(acronym_length[acronym], acronym_id[acronym]) for acronym in acronym_id])
-    if s_acronyms != "":
-        s_acronyms = " + " + s_acronyms
-    s2 = ' <= %s\n' %length
-    program.constraints["length"] = s1 + s_acronyms + s2
+    program.add_constraint("length", ["a%d" % acronym_id[acronym] for acronym in acronym_id], [acronym_length[acronym] for acronym in acronym_id])
 
     for concept, index in concept_index.items():
+        sents = ["s%d" % sent_index for sent_index in curr_concept_sents[index]]
         ## at least one sentence containing a selected bigram must be selected
-        s1 = ' + '.join([ 's%d' %sent_index for sent_index in curr_concept_sents[index]])
-        s2 = ' - c%d >= 0' %index
-        program.constraints["presence_%d" % index] = s1 + s2
+        program.add_constraint("presence_%d" % index, sents, 1, ">=", 0)
+        program.add_constraint("presence_%d" % index, ["c%d" % index], -1)
         ## if a bigram is not selected then all sentences containing it are deselected
-        s1 = ' + '.join([ 's%d' %sent_index for sent_index in curr_concept_sents[index]])
-        s2 = '- %d c%d <= 0' %(len(curr_concept_sents[index]), index)
-        program.constraints["absence_%d" % index] = s1 + s2
+        program.add_constraint("absence_%d" % index, sents, 1, "<=", 0)
+        program.add_constraint("absence_%d" % index, ["c%d" % index], -len(sents))
 
     # constraints so that acronyms get selected along with sentences they belong to
     for acronym, index in acronym_index.items():
-        s1 = ' + '.join([ 's%d' %sent_index for sent_index in index])
-        s2 = ' - a%d >= 0' %acronym_id[acronym]
-        program.constraints["acronym_presence_%d" % acronym_id[acronym]] = s1 + s2
-        s1 = ' + '.join([ 's%d' %sent_index for sent_index in index])
-        s2 = '- %d a%d <= 0' %(len(index), acronym_id[acronym])
-        program.constraints["acronym_absence_%d" % acronym_id[acronym]] = s1 + s2
+        sents = ["s%d" % sent_index for sent_index in index]
+        name = "acronym_presence_%d" % acronym_id[acronym]
+        program.add_constraint(name, sents, 1, ">=", 0)
+        program.add_constraint(name, ["a%d" % acronym_id[acronym]], -1)
+        name = "acronym_absence_%d" % acronym_id[acronym]
+        program.add_constraint(name, sents, 1, "<=", 0)
+        program.add_constraint(name, ["a%d" % acronym_id[acronym]], -len(sents))
 
     # add sentence compression groups
     for group in groups:
-        program.constraints["group_%d" % group] = " + ".join(["s%d" % sent_index for sent_index in groups[group]]) + " <= 1"
-
-    for sent_index in range(len(relevant_sentences)):
-        program.binary["s%d" % sent_index] = relevant_sentences[sent_index]
-    for concept, concept_index in concept_index.items():
-        program.binary["c%d" % concept_index] = 1
-    for acronym, id in acronym_id.items():
-        program.binary["a%d" % id] = 1
+        program.add_constraint("group_%d" % group, ["s%d" % sent_index for sent_index in groups[group]], 1, "<=", 1)
 
     sys.stderr.write("compression candidates: %d, original: %d\n" % (len(relevant_sentences), len(sentences)))
     program.acronyms = acronymMapping
@@ -13,6 +13,14 @@ STATIC_DATA_ROOT = DATA_ROOT
 
 STOPWORDS = os.path.join(DATA_ROOT, 'stopwords.english')
 ILP_SOLVER = os.path.join(TOOLS_ROOT, 'solver/glpk-4.43/glpsol')
+# glpsol: run ILP_SOLVER, milp: solve in process with scipy.optimize.milp
+ILP_BACKEND = os.environ.get('ILP_BACKEND', 'glpsol')
+# directory of the ILP solution cache (ilp.SolutionCache), None: disabled
+ILP_CACHE = os.environ.get('ILP_CACHE')
+ILP_CACHE_SIZE = int(os.environ.get('ILP_CACHE_SIZE', 10000))
+# file of the memoized stems and tokenized sentences (util.Memo), loaded at
+# start and updated at exit, None: not saved
+MEMO_FILE = os.environ.get('MEMO_FILE')
 GENETIC_SUMMARIZER = os.path.join(TOOLS_ROOT,
                                   'genetic/greedy_concept_summarizer')
 BERKELEY_PARSER_CMD = '%s/parser_bin/distribute.sh %s/parser_bin/berkeleyParser+Postagger.sh' % (TOOLS_ROOT, TOOLS_ROOT)
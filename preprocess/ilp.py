@@ -1,5 +1,6 @@
 from globals import *
-import os
+import os, sys, re, json, hashlib
+from array import array
 
 class IntegerLinearProgram:
     # this class handles a basic ILP for glpsol from the Gnu linear programming toolkit, in cpxlp format
@@ -7,48 +8,179 @@ class IntegerLinearProgram:
     # - only binary and integer variables are supported
     # - the behavior is not defined if no solution is found
     # - the solver might run for a long time
-    def __init__(self, command = ILP_SOLVER, tmp = "./tmp.glpsol", debug = 0, time_limit = 100):
+    # - backend "glpsol" runs the command on a cpxlp file, "milp" solves the program in
+    #   process with scipy.optimize.milp (HiGHS)
+    def __init__(self, command = ILP_SOLVER, tmp = "./tmp.glpsol", debug = 0, time_limit = 100, backend = None):
         self.command = command
         self.tmp = tmp
         self.debug = debug
         self.time_limit = time_limit
+        self.backend = backend if backend else ILP_BACKEND
+        self.number_format = "%+g" # coefficients in the cpxlp text, rounded as glpsol reads them
         self.objective = {}
         self.constraints = {}
         self.binary = {}
         self.integer = {}
         self.output = {}
+        self.status = None
+        self.optimal = False # only the optimal solutions are cached
+        self.variable_index = {}
+        self.variable_names = []
+        self.objective_terms = {}
+        self.row_index = {}
+        self.row_names = []
+        self.row_senses = []
+        self.row_rhs = []
+        self.coo_rows = array('i')
+        self.coo_cols = array('i')
+        self.coo_values = array('d')
 
     def __str__(self):
-        output = ''
-        if len(self.objective) > 0:
-            output += "Maximize\n"
-            for function in sorted(self.objective.keys()):
-                output += function + ": " + self.objective[function] + "\n"
-
-        if self.constraints > 0:
-            output += "\nSubject To\n"
-            for constraint in sorted(self.constraints.keys()):
-                output += constraint + ": " + self.constraints[constraint] + "\n"
-        if len(self.binary) > 0:
-            output += "\nBinary\n"
+        return self.cpxlp(self.number_format)
+
+    def cpxlp(self, number_format):
+        # cpxlp text of the program, built on demand from the string and the
+        # structured parts. The structured terms are written in the order they
+        # were added, as the string builders did (glpsol numbers the columns in
+        # the order they appear, which decides between equal summaries)
+        objective = dict(self.objective)
+        if self.objective_terms:
+            terms = format_terms(self.objective_terms, self.variable_names, number_format)
+            objective["score"] = (objective["score"] + " " + terms) if "score" in objective else terms
+        constraints = dict(self.constraints)
+        for row, terms in enumerate(self.row_terms()):
+            name = self.row_names[row]
+            if len(terms) == 0: continue # trivially satisfied
+            if self.row_senses[row] is None:
+                raise ValueError("constraint %s has no relation" % name)
+            constraints[name] = format_terms(terms, self.variable_names, number_format) + " %s %.12g" % (self.row_senses[row], self.row_rhs[row])
+
+        output = []
+        if len(objective) > 0:
+            output.append("Maximize\n")
+            for function in sorted(objective.keys()):
+                output.append(function + ": " + objective[function] + "\n")
+
+        if constraints:
+            output.append("\nSubject To\n")
+            for constraint in sorted(constraints.keys()):
+                output.append(constraint + ": " + constraints[constraint] + "\n")
+        if self.binary:
+            output.append("\nBinary\n")
             for variable in sorted(self.binary.keys()):
-                output += variable + "\n"
-        if len(self.integer) > 0:    
-            output += "\nInteger\n"
+                output.append(variable + "\n")
+        if self.integer:
+            output.append("\nInteger\n")
             for variable in sorted(self.integer.keys()):
-                output += variable + "\n"
-        output += "End\n"        
-        return output
+                output.append(variable + "\n")
+        output.append("End\n")
+        return "".join(output)
+
+    # structured model: the variables and constraints get integer indices and
+    # the coefficients of the constraints are stored in COO arrays, so that
+    # building a program is linear in its size. The string objective and
+    # constraints above are still accepted and combined with them.
+
+    def index(self, name):
+        # integer index of the variable name, registered if new
+        index = self.variable_index.get(name)
+        if index is None:
+            index = len(self.variable_names)
+            self.variable_index[name] = index
+            self.variable_names.append(name)
+        return index
+
+    def add_binary(self, name, value=1):
+        # declare a binary variable, value being what self.binary maps it to
+        self.binary[name] = value
+        return self.index(name)
+
+    def add_integer(self, name, value=1):
+        self.integer[name] = value
+        return self.index(name)
+
+    def add_objective(self, names, coefficients):
+        # add coefficients (a list, or a number for all the variables) to the
+        # maximized objective
+        if isinstance(coefficients, (int, float)):
+            coefficients = [coefficients] * len(names)
+        for name, coefficient in zip(names, coefficients):
+            index = self.index(name)
+            self.objective_terms[index] = self.objective_terms.get(index, 0.0) + coefficient
+
+    def num_constraints(self):
+        return len(self.constraints) + len(self.row_names)
+
+    def constraint_name(self, group):
+        # new constraint name of a group of constraints: group_<number>
+        return "%s_%d" % (group, self.num_constraints())
+
+    def add_constraint(self, name, names=(), coefficients=1.0, sense=None, rhs=0.0):
+        # add the terms to the constraint name, created if needed. sense is
+        # "<=", ">=" or "=" and may be set later with set_bound
+        row = self.row_index.get(name)
+        if row is None:
+            row = len(self.row_names)
+            self.row_index[name] = row
+            self.row_names.append(name)
+            self.row_senses.append(sense)
+            self.row_rhs.append(float(rhs))
+        elif sense is not None:
+            self.set_bound(name, sense, rhs)
+        if isinstance(coefficients, (int, float)):
+            coefficients = [coefficients] * len(names)
+        for variable, coefficient in zip(names, coefficients):
+            self.coo_rows.append(row)
+            self.coo_cols.append(self.index(variable))
+            self.coo_values.append(coefficient)
+        return row
+
+    def set_bound(self, name, sense, rhs=0.0):
+        row = self.row_index[name]
+        self.row_senses[row] = sense
+        self.row_rhs[row] = float(rhs)
+
+    def row_terms(self):
+        # {variable index: coefficient} of each structured constraint
+        terms = [{} for name in self.row_names]
+        for row, column, value in zip(self.coo_rows, self.coo_cols, self.coo_values):
+            terms[row][column] = terms[row].get(column, 0.0) + value
+        return terms
 
     def run(self):
+        text = None
+        if CACHE is not None:
+            # milp solves the coefficients as they are, not rounded as in the text
+            text = str(self) if self.backend != "milp" else self.cpxlp("%+.17g")
+            key = CACHE.key(text, self.backend, self.time_limit)
+            solution = CACHE.get(key)
+            if solution is not None:
+                self.status, output = solution
+                self.output.update(output)
+                return
+
+        if self.backend == "milp":
+            self.run_milp()
+        else:
+            self.run_glpsol(str(self) if text is None else text)
+
+        if CACHE is not None and self.optimal:
+            CACHE.put(key, self.status, self.output)
+
+    def run_glpsol(self, text):
         input = open(self.tmp + ".ilp", "w")
-        input.write(str(self))
+        input.write(text)
         input.close()
 
         if self.debug:
             os.system("%s --tmlim %d --cpxlp %s.ilp -o %s.sol >&2" % (self.command, self.time_limit, self.tmp, self.tmp))
         else:
-            os.popen("%s --tmlim %d --cpxlp %s.ilp -o %s.sol" % (self.command, self.time_limit, self.tmp, self.tmp))
+            output = os.popen("%s --tmlim %d --cpxlp %s.ilp -o %s.sol" % (self.command, self.time_limit, self.tmp, self.tmp))
+            text = "".join(output.readlines())
+            if output.close():
+                sys.stderr.write("ERROR: glpsol failed\n")
+                sys.stderr.write(text)
+                sys.exit(1)
 
         self.get_solution()
 
@@ -58,7 +190,215 @@ class IntegerLinearProgram:
 
     def get_solution(self):
         for line in open("%s.sol" % self.tmp).readlines():
+            if line.startswith("Status:"):
+                self.status = line.split(":", 1)[1].strip()
+                self.optimal = self.status in ("OPTIMAL", "INTEGER OPTIMAL")
             fields = line.strip().split()
             if len(fields) >= 5 and ((fields[1] in self.binary) or (fields[1] in self.integer)):
                 self.output[fields[1]] = int(fields[3])
 
+    def run_milp(self):
+        # solve the program in process with scipy.optimize.milp (HiGHS). The
+        # structured part is used as is, the string objective and constraints
+        # are parsed
+        import numpy as np
+        from scipy import sparse
+        from scipy.optimize import milp, Bounds, LinearConstraint
+
+        columns = dict(self.variable_index)
+        def column(variable):
+            return columns.setdefault(variable, len(columns))
+
+        cost = {}
+        for index, coefficient in self.objective_terms.items():
+            cost[index] = cost.get(index, 0.0) - coefficient # milp minimizes
+        for function in sorted(self.objective.keys()):
+            for variable, coefficient in parse_expression(self.objective[function])[0].items():
+                index = column(variable)
+                cost[index] = cost.get(index, 0.0) - coefficient
+
+        rows = list(self.coo_rows)
+        cols = list(self.coo_cols)
+        values = list(self.coo_values)
+        senses = list(self.row_senses)
+        rhs = list(self.row_rhs)
+        for name in sorted(self.constraints.keys()):
+            coefficients, sense, value = parse_constraint(self.constraints[name])
+            for variable, coefficient in coefficients.items():
+                rows.append(len(senses))
+                cols.append(column(variable))
+                values.append(coefficient)
+            senses.append(sense)
+            rhs.append(value)
+        for row, sense in enumerate(senses):
+            if sense is None:
+                raise ValueError("constraint %s has no relation" % self.row_names[row])
+        for variable in list(self.binary.keys()) + list(self.integer.keys()):
+            column(variable)
+
+        if len(columns) == 0:
+            self.status = "empty program"
+            self.optimal = True
+            return
+        objective = np.zeros(len(columns))
+        for index, coefficient in cost.items():
+            objective[index] = coefficient
+        integrality = np.zeros(len(columns))
+        upper = np.full(len(columns), np.inf)
+        for variable in self.integer:
+            integrality[columns[variable]] = 1
+        for variable in self.binary:
+            integrality[columns[variable]] = 1
+            upper[columns[variable]] = 1
+
+        rhs = np.array(rhs, dtype=float)
+        senses = np.array(senses)
+        lower_rhs = np.where(senses == "<=", -np.inf, rhs)
+        upper_rhs = np.where(senses == ">=", np.inf, rhs)
+        matrix = sparse.csr_matrix((values, (rows, cols)), shape=(len(senses), len(columns)))
+
+        result = milp(objective, integrality=integrality, bounds=Bounds(np.zeros(len(columns)), upper),
+                      constraints=[LinearConstraint(matrix, lower_rhs, upper_rhs)] if len(senses) else None,
+                      options={"time_limit": self.time_limit})
+        if result.x is None:
+            sys.stderr.write("ERROR: milp found no solution: %s\n" % result.message)
+            return
+        self.status = result.message
+        self.optimal = result.status == 0
+        for variable in list(self.binary.keys()) + list(self.integer.keys()):
+            self.output[variable] = int(round(result.x[columns[variable]]))
+
+
+class SolutionCache:
+    """
+    on-disk cache of the solutions of the programs, so that a program solved
+    before (e.g. when re-running the chain with other parameters for the
+    later stages) is not solved again
+    self.directory  one <key>.json file per program, key being the sha256 of
+                    its cpxlp text, backend and time limit
+    self.size       maximum number of files, the least recently used ones are
+                    removed when there are 10% more
+    self.count      number of files, counted again when pruning
+    self.hits       number of programs found in the cache
+    self.misses     number of programs solved
+    """
+
+    def __init__(self, directory, size=10000):
+        self.directory = directory
+        self.size = size
+        self.count = None
+        self.hits = 0
+        self.misses = 0
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+
+    def key(self, text, backend, time_limit):
+        digest = hashlib.sha256()
+        digest.update(("%s\t%d\n" % (backend, time_limit)).encode("utf-8"))
+        digest.update(text.encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, key):
+        # (status, output) of the program, None if it is not cached
+        path = os.path.join(self.directory, key + ".json")
+        try:
+            with open(path) as input:
+                solution = json.load(input)
+            os.utime(path, None) # most recently used
+        except (IOError, OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return solution["status"], solution["output"]
+
+    def put(self, key, status, output):
+        path = os.path.join(self.directory, key + ".json")
+        # written under a temporary name so that concurrent runs never read a partial file
+        tmp = "%s.%d.tmp" % (path, os.getpid())
+        with open(tmp, "w") as result:
+            json.dump({"status": status, "output": output}, result)
+        new = not os.path.exists(path)
+        os.replace(tmp, path)
+        if self.count is None:
+            self.prune()
+        elif new:
+            self.count += 1
+        # pruned in batches, not after every program
+        if self.count > self.size + self.size // 10:
+            self.prune()
+
+    def prune(self):
+        names = [name for name in os.listdir(self.directory) if name.endswith(".json")]
+        self.count = len(names)
+        if len(names) <= self.size:
+            return
+        paths = [os.path.join(self.directory, name) for name in names]
+        paths.sort(key=lambda path: os.path.getmtime(path) if os.path.exists(path) else 0)
+        for path in paths[:len(paths) - self.size]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        self.count = self.size
+
+    def report(self):
+        return "ilp cache: %d hits, %d misses" % (self.hits, self.misses)
+
+
+# tokens of the cpxlp expressions: relation, sign, number or variable name
+LP_TOKEN = re.compile(r'\s*(?:(<=|>=|=<|=>|<|>|=)|([+-])|((?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)|([A-Za-z_][^\s+\-<>=*]*))')
+LP_RELATIONS = {"<=": "<=", "=<": "<=", "<": "<=", ">=": ">=", "=>": ">=", ">": ">=", "=": "="}
+
+def format_terms(terms, names, number_format="%+g"):
+    # {variable index: coefficient} as a cpxlp expression
+    return " ".join((number_format + " %s") % (coefficient, names[index]) for index, coefficient in terms.items())
+
+def parse_expression(text):
+    """
+    ({variable: coefficient}, constant) of a linear expression in cpxlp syntax
+    (e.g. "+3 c1 - 0.5 s2 + s3")
+    """
+    coefficients = {}
+    constant = 0.0
+    sign, number = 1.0, None
+    position = 0
+    text = text.strip()
+    while position < len(text):
+        match = LP_TOKEN.match(text, position)
+        if match is None or match.end() == position:
+            raise ValueError("cannot parse linear expression: %s" % text)
+        position = match.end()
+        relation, op, value, variable = match.groups()
+        if relation:
+            raise ValueError("unexpected relation in linear expression: %s" % text)
+        if op:
+            if number is not None:
+                constant += sign * number
+                sign, number = 1.0, None
+            if op == "-":
+                sign = -sign
+        elif value:
+            number = float(value) if number is None else number * float(value)
+        else:
+            coefficients[variable] = coefficients.get(variable, 0.0) + sign * (1.0 if number is None else number)
+            sign, number = 1.0, None
+    if number is not None:
+        constant += sign * number
+    return coefficients, constant
+
+def parse_constraint(text):
+    """
+    ({variable: coefficient}, relation, right hand side) of a cpxlp constraint
+    (e.g. "s1 + s2 - c3 >= 0"), relation being "<=", ">=" or "="
+    """
+    match = re.search(r'(<=|>=|=<|=>|<|>|=)', text)
+    if match is None:
+        raise ValueError("no relation in constraint: %s" % text)
+    coefficients, constant = parse_expression(text[:match.start()])
+    rhs_coefficients, rhs = parse_expression(text[match.end():])
+    for variable, coefficient in rhs_coefficients.items():
+        coefficients[variable] = coefficients.get(variable, 0.0) - coefficient
+    return coefficients, LP_RELATIONS[match.group(1)], rhs - constant
+
+# solution cache of all the programs (None: disabled)
+CACHE = SolutionCache(ILP_CACHE, ILP_CACHE_SIZE) if ILP_CACHE else None
@@ -1,6 +1,6 @@
 import sys
 sys.path.append('IR/')
-import tfidf, util, prob_util, framework, concept_mapper
+import tfidf, util, prob_util, framework, concept_mapper, problemcache
 
 
 def make_query(problem):
@@ -16,18 +16,20 @@ def get_docs(task, num_docs, reload=False):
     """
     returns a new task, where each problem in task.problems has:
     problem.ir_docs = [ ... ]
+    only the problems without ir documents are searched (all with reload)
     """
     
     ## check state
     if not reload and framework.check_state(task.problems)['ir']:
         sys.stderr.write('already have ir documents loaded\n')
         return task
+    problems = [problem for problem in task.problems if reload or not problem.loaded_ir_docs]
     
     max_files = 0
 
     ## get all query tokens; use tfidf.get_tokens because this matches the index's tokenization
     queries_by_problem_id = {}
-    for problem in task.problems:
+    for problem in problems:
         #curr_query = ' '.join(tfidf.get_tokens(problem.query.original))
         curr_query = ' '.join(make_query(problem))
         queries_by_problem_id[problem.id] = curr_query
@@ -40,7 +42,7 @@ def get_docs(task, num_docs, reload=False):
     docfh = open('irdoc_debug', 'w')
     
     ## allocate docs to problems
-    for problem in task.problems:
+    for problem in problems:
         query = queries_by_problem_id[problem.id]
         docs_with_values = docs_by_query[query]
 
@@ -58,7 +60,11 @@ def get_docs(task, num_docs, reload=False):
         problem.ir_docs = docs
         problem.loaded_ir_docs = True
         
-    ## pickle it up
-    sys.stderr.write('Saving [%s] problem data in [%s]\n' %(task.name, task.data_pickle))
-    util.save_pickle(task.problems, task.data_pickle)
+    ## update the cache shards of the problems searched, the others are not
+    ## loaded from their shards
+    sys.stderr.write('Saving [%s] problem data in [%s]\n' %(task.name, task.data_cache))
+    cache = problemcache.ProblemCache(task.data_cache)
+    for problem in problems:
+        cache.save(problem)
+    cache.write_manifest()
     return task
@@ -1,7 +1,7 @@
 import sys, os, re, time
 import framework, concept_mapper, ordering, berkeleyparser, compression, util, prob_util
 from globals import *
-import ilp, text
+import ilp, text, sentstore
 
 class Task:
     """
@@ -16,7 +16,7 @@ class Task:
         self.doc_path = doc_path
         self.manual_path = manual_path
         self.length_limit = length_limit
-        self.data_pickle = '%s/%s_data.pickle' %(DATA_ROOT, self.name)
+        self.data_cache = '%s/%s_data' %(DATA_ROOT, self.name)
         self.problems = None
 
 def parse_options():
@@ -52,11 +52,27 @@ def parse_options():
                       help='number of documents to retrieve using IR')
     parser.add_option('--splitta-model', dest='splitta_model', default=None, type='str',
                       help='model directory for sentence splitter')
+    parser.add_option('--ilp-backend', dest='ilp_backend', default=ILP_BACKEND, type='str',
+                      help='ILP solver: glpsol (external program) or milp (scipy, in process)')
+    parser.add_option('--ilp-cache', dest='ilp_cache', default=ILP_CACHE, type='str',
+                      help='directory of the cache of the ILP solutions (default: $ILP_CACHE, no cache if unset)')
+    parser.add_option('--presolve', dest='presolve', default=False, action='store_true',
+                      help='remove dominated sentences and fold the concepts of a single sentence before solving the ILP')
+    parser.add_option('--local-search', dest='local_search', default=0, type='int',
+                      help='select the sentences by local search for this number of seconds instead of solving the ILP (0: ILP)')
+    parser.add_option('-j', '--jobs', dest='jobs', default=1, type='int',
+                      help='number of processes loading and splitting the documents')
     parser.add_option('-i', '--is_clean', dest='is_clean', default=False,
                       action='store_true',
                       help='If True, input files are raw text and xml otherwise')
     (options, args) = parser.parse_args()
 
+    if not options.ilp_backend in ['glpsol', 'milp']:
+        parser.error('unrecognized ILP backend [%s]' %options.ilp_backend)
+    ilp.ILP_BACKEND = options.ilp_backend
+    if options.ilp_cache:
+        ilp.CACHE = ilp.SolutionCache(options.ilp_cache, ILP_CACHE_SIZE)
+
     ## setup a Task instance
     if not options.task in ['u09', 'u08', 'u07', 'm07', 'm06', 'm05', 'u04', 'chorali']:
         parser.error('unrecognized task [%s], use --help to get a list of valid tasks' %options.task)
@@ -76,7 +92,7 @@ def parse_options():
     ## create data root directory
     if options.dataroot:
         os.popen('mkdir -p %s' %options.dataroot)
-        task.data_pickle = '%s/%s_data.pickle' %(options.dataroot, task.name)
+        task.data_cache = '%s/%s_data' %(options.dataroot, task.name)
 
     return options, task
 
@@ -180,26 +196,22 @@ def run_standard(options, max_sents=10000):
 
             # construct ILP
             program = ilp.IntegerLinearProgram(debug=0)
-            objective = []
-            length_constraint = []
             for sentence in sentences:
-                objective.append("%+g s%d" % (sentence.rel_score, sentence.index))
-                program.binary["s%d" % sentence.index] = sentence
-                length_constraint.append("%+g s%d" % (sentence.length, sentence.index))
+                name = "s%d" % sentence.index
+                program.add_binary(name, sentence)
+                program.add_objective([name], [sentence.rel_score])
+                program.add_constraint("length", [name], [sentence.length])
                 for peer in sentences:
                     if sentence == peer: continue
                     score = sentence.sim_cosine(peer, word_idf)
                     if score > 0:
-                        objective.append("%+g s%d_%d" % (-score, sentence.index, peer.index))
-                        program.binary["s%d_%d" % (sentence.index, peer.index)] = [sentence, peer]
-                        program.constraints["c1_%d_%d" % (sentence.index, peer.index)] = \
-                            "s%d_%d - s%d <= 0" % (sentence.index, peer.index, sentence.index)
-                        program.constraints["c2_%d_%d" % (sentence.index, peer.index)] = \
-                            "s%d_%d - s%d <= 0" % (sentence.index, peer.index, peer.index)
-                        program.constraints["c3_%d_%d" % (sentence.index, peer.index)] = \
-                            "s%d + s%d - s%d_%d <= 1" % (sentence.index, peer.index, sentence.index, peer.index)
-            program.objective["score"] = " ".join(objective)
-            program.constraints["length"] = " ".join(length_constraint) + " <= %g" % task.length_limit
+                        pair = "s%d_%d" % (sentence.index, peer.index)
+                        program.add_binary(pair, [sentence, peer])
+                        program.add_objective([pair], [-score])
+                        program.add_constraint("c1_%d_%d" % (sentence.index, peer.index), [pair, name], [1, -1], "<=", 0)
+                        program.add_constraint("c2_%d_%d" % (sentence.index, peer.index), [pair, "s%d" % peer.index], [1, -1], "<=", 0)
+                        program.add_constraint("c3_%d_%d" % (sentence.index, peer.index), [name, "s%d" % peer.index, pair], [1, 1, -1], "<=", 1)
+            program.add_constraint("length", sense="<=", rhs=task.length_limit)
 
             run_times[problem.id] = time.time()
             program.run()
@@ -287,7 +299,7 @@ def run_standard(options, max_sents=10000):
 
             ## setup and run the ILP
             run_times[problem.id] = time.time()
-            selection = mapper.run(task.length_limit)
+            selection = mapper.run(task.length_limit, style='local' if options.local_search else 'ilp', presolved=options.presolve, time_limit=options.local_search)
             selection = ordering.by_date(selection)
             run_times[problem.id] = time.time() - run_times[problem.id]
 
@@ -351,12 +363,8 @@ def dump_data(path):
     import sentence_cleaner
 
     for problem in task.problems:
-        sent_file = '%s/%s.sent' %(path, problem.id)
-        doc_file = '%s/%s.doc' %(path, problem.id)
-        par_file = '%s/%s.par' %(path, problem.id)
-        sent_fh = open(sent_file, 'w')
-        doc_fh = open(doc_file, 'w')
-        par_fh = open(par_file, 'w')
+        ## sentence store, exported as the .sent, .doc and .par files
+        texts, docs, pars = [], [], []
         for doc in problem.new_docs:
             count = 0
             for sent in doc.sentences:
@@ -368,12 +376,13 @@ def dump_data(path):
                 if sent.order == 0: cleaned = sentence_cleaner.clean_aggressive(sent.original)
                 else: cleaned = sentence_cleaner.clean(sent.original)
 
-                sent_fh.write('%s\n' %cleaned)
-                doc_fh.write('%s\n' %(doc.id))
-                par_fh.write('%d\n' %int(sent.paragraph_starter))
-        sent_fh.close()
-        doc_fh.close()
-        par_fh.close()
+                texts.append(cleaned)
+                docs.append(doc.id)
+                pars.append(int(sent.paragraph_starter))
+        store_file = sentstore.store_path(path, problem.id)
+        sentstore.write(store_file, texts, docs, pars)
+        with sentstore.SentenceStore(store_file) as store:
+            store.export('%s/%s' %(path, problem.id))
 
         query_file = '%s/%s.query' %(path, problem.id)
         query_fh = open(query_file, 'w')
@@ -408,7 +417,7 @@ if __name__ == '__main__':
         print('compress')
         parser = berkeleyparser.CommandLineParser(BERKELEY_PARSER_CMD)
     framework.setup_DUC_sentences(task, parser, reload=options.reload,
-                                  options=options, is_clean=options.is_clean)
+                                  options=options, is_clean=options.is_clean, jobs=options.jobs)
 
     ## testing
     #test()
@@ -422,6 +431,12 @@ if __name__ == '__main__':
     #dump_data('../bourbon/duc06m_v4')
     #dump_data('../bourbon/tac09_v4')
 
+    if ilp.CACHE:
+        sys.stderr.write('%s\n' %ilp.CACHE.report())
+    sys.stderr.write('%s\n' %text.text_processor.memo_report())
+
+    ## the summaries below (run_standard, and so --ilp-backend, --presolve
+    ## and --local-search) are only made without this exit
     print("Before exit"    )
     sys.exit()
     print("After exit" )
@@ -33,7 +33,7 @@ class Task:
         self.doc_path = doc_path
         self.manual_path = manual_path
         self.length_limit = length_limit
-        self.data_pickle = '%s/%s_data.pickle' %(DATA_ROOT, self.name)
+        self.data_cache = '%s/%s_data' %(DATA_ROOT, self.name)
         self.problems = None
 
 def parse_options():
@@ -97,7 +97,7 @@ def parse_options():
     ## create data root directory
     if options.dataroot:
         os.popen('mkdir -p %s' %options.dataroot)
-        task.data_pickle = '%s/%s_data.pickle' %(options.dataroot, task.name)
+        task.data_cache = '%s/%s_data' %(options.dataroot, task.name)
 
     return options, task
 
@@ -0,0 +1,187 @@
+"""
+cache of the documents of the summary problems (framework.setup_DUC_sentences,
+ir.get_docs), replacing the single pickle of task.problems: a directory with
+one shard per problem and a manifest.
+
+A shard (<problem id>.pickle, gzipped) holds the documents as tuples of
+strings, not Document/Sentence objects:
+    (id, source, date, paragraphs, is empty, sentences)
+with sentences None if the document was not split, else a list of
+    (text, order, paragraph_starter, parse tree)
+The Sentence objects are rebuilt from the text (util.Memo makes stemming
+cheap) when the documents of the problem are first used (see
+framework.SummaryProblem), so a run only reads the shards it needs.
+
+The manifest (manifest.json) gives for each problem its shard, the options
+it was built with and the md5 of its source files, with their size and
+modification time: a shard is stale when a source changed (the md5 is only
+computed again if the size or time did) or when it was built with other
+options.
+"""
+import os, sys, json, hashlib
+import util, text
+
+VERSION = 2
+MANIFEST = 'manifest.json'
+
+
+def file_digest(path):
+    """
+    md5 of the contents of a file, of the string itself for raw documents
+    given instead of a path (see text.Document)
+    """
+    digest = hashlib.md5()
+    if not os.path.isfile(path):
+        digest.update(path.encode('utf-8'))
+        return digest.hexdigest()
+    with open(path, 'rb') as fh:
+        for block in iter(lambda: fh.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def source_state(path, previous=None):
+    """
+    [size, modification time, md5] of a source, the md5 of previous is kept
+    if the size and time did not change
+    """
+    if not os.path.isfile(path):
+        return [len(path), 0, file_digest(path)]
+    stat = os.stat(path)
+    if previous and previous[:2] == [stat.st_size, stat.st_mtime]:
+        return previous
+    return [stat.st_size, stat.st_mtime, file_digest(path)]
+
+
+def compact_document(doc):
+    sentences = None
+    if hasattr(doc, 'sentences'):
+        sentences = [(sentence.original, sentence.order, getattr(sentence, 'paragraph_starter', False), sentence.parsed)
+                     for sentence in doc.sentences]
+    return (doc.id, doc.source, doc.date, doc.paragraphs, doc._isempty, sentences)
+
+
+def restore_document(record):
+    id, source, date, paragraphs, isempty, sentences = record
+    doc = text.Document.__new__(text.Document)
+    doc.id, doc.source, doc.date = id, source, date
+    doc.paragraphs = paragraphs
+    doc._isempty = isempty
+    if sentences is not None:
+        doc.sentences = []
+        for sent_text, order, paragraph_starter, parsed in sentences:
+            sentence = text.Sentence(sent_text, order, source, date)
+            sentence.paragraph_starter = paragraph_starter
+            sentence.parsed = parsed
+            doc.sentences.append(sentence)
+    return doc
+
+
+class Shard:
+    """
+    documents of a problem in the cache, loaded by the problem when first used
+    self.path  path of the shard file
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self, problem):
+        sys.stderr.write('Loading [%s] documents from [%s]\n' %(problem.id, self.path))
+        data = util.load_pickle(self.path)
+        for name in ('new_docs', 'old_docs', 'ir_docs'):
+            if data.get(name) is not None:
+                setattr(problem, name, [restore_document(record) for record in data[name]])
+
+
+class ProblemCache:
+    """
+    directory of the shards
+    self.path      cache directory
+    self.manifest  {problem id: {'shard', 'sources', 'is_clean', 'parsed', 'ir'}}
+    self.changed   the manifest needs to be written again
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.manifest = {}
+        self.changed = False
+        manifest_path = os.path.join(path, MANIFEST)
+        if os.path.isfile(manifest_path):
+            try:
+                with open(manifest_path) as fh:
+                    saved = json.load(fh)
+                if saved.get('version') == VERSION:
+                    self.manifest = saved['problems']
+            except ValueError as e:
+                sys.stderr.write('WARNING: cannot read the manifest %s: %s\n' %(manifest_path, e))
+
+    def sources(self, problem, previous={}):
+        return dict((path, source_state(path, previous.get(path)))
+                    for path in problem.new_docs_paths + problem.old_docs_paths)
+
+    def lookup(self, problem, is_clean=False, parsed=False):
+        """
+        manifest entry of the problem, None if it has no shard or the shard is stale
+        """
+        entry = self.manifest.get(problem.id)
+        if not entry or entry['is_clean'] != is_clean or (parsed and not entry['parsed']):
+            return None
+        if not os.path.isfile(os.path.join(self.path, entry['shard'])):
+            return None
+        if sorted(entry['sources']) != sorted(problem.new_docs_paths + problem.old_docs_paths):
+            return None
+        sources = self.sources(problem, entry['sources'])
+        for path, state in sources.items():
+            if state[2] != entry['sources'][path][2]:
+                return None
+        ## sources touched but not changed, refresh their times
+        if sources != entry['sources']:
+            entry['sources'] = sources
+            self.changed = True
+        return entry
+
+    def attach(self, problem, entry):
+        """
+        the documents of problem are loaded from its shard when first used
+        """
+        problem.shard = Shard(os.path.join(self.path, entry['shard']))
+        problem.loaded_docs = True
+        problem.parsed = entry['parsed']
+        problem.loaded_ir_docs = entry['ir']
+
+    def save(self, problem, is_clean=None):
+        """
+        write the shard of a problem whose documents are loaded, the manifest
+        is written by write_manifest. is_clean defaults to the value of the
+        previous shard
+        """
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path)
+        data = {}
+        for name in ('new_docs', 'old_docs', 'ir_docs'):
+            docs = getattr(problem, name, None)
+            data[name] = None if docs is None else [compact_document(doc) for doc in docs]
+        shard = '%s.pickle' %problem.id
+        tmp = os.path.join(self.path, '%s.%d.tmp' %(shard, os.getpid()))
+        util.save_pickle(data, tmp)
+        os.replace(tmp, os.path.join(self.path, shard))
+        previous = self.manifest.get(problem.id, {})
+        if is_clean is None:
+            is_clean = previous.get('is_clean', False)
+        self.manifest[problem.id] = {'shard': shard, 'sources': self.sources(problem, previous.get('sources', {})), 'is_clean': is_clean,
+                                     'parsed': problem.parsed, 'ir': problem.loaded_ir_docs}
+        self.changed = True
+
+    def write_manifest(self):
+        """
+        write the manifest if a shard was saved or a time refreshed since it
+        was read
+        """
+        if not self.changed:
+            return
+        tmp = os.path.join(self.path, '%s.%d.tmp' %(MANIFEST, os.getpid()))
+        with open(tmp, 'w') as fh:
+            json.dump({'version': VERSION, 'problems': self.manifest}, fh, indent=1, sort_keys=True)
+        os.replace(tmp, os.path.join(self.path, MANIFEST))
+        self.changed = False
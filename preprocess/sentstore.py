@@ -0,0 +1,181 @@
+"""
+columnar store of the sentences of a topic, in a single .npz file written by
+preprocess/main.py (dump_data) and read by summarizer/inference.py
+(load_sents), replacing the line-aligned .sent, .doc and .par files (which
+can still be exported from it).
+
+Columns (arrays of the .npz file):
+    text      original (cleaned) text of each sentence
+    tokens    tokens of each sentence (optional)
+    stems     stems of each sentence (optional)
+    doc       document of each sentence, as ids in a table of names
+    par       1 if the sentence starts a paragraph
+    order     position of the sentence in its document
+
+Strings are stored as one utf-8 buffer and the offsets of each string in
+it; token lists as a string column of all the tokens and the index of the
+first token of each sentence. The arrays are only read when a column is
+used.
+
+    sentstore.py export <topic>.npz <prefix>          # <prefix>.sent, .doc, .par (.sent.tok)
+    sentstore.py add <topic>.npz tokens <topic>.sent.tok
+"""
+import os, sys
+import numpy as np
+
+EXTENSION = '.npz'
+
+
+def encode_strings(strings):
+    """
+    (utf-8 buffer, offsets) of the strings, string i is buffer[offsets[i]:offsets[i + 1]]
+    """
+    encoded = [string.encode('utf-8') for string in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(string) for string in encoded], out=offsets[1:])
+    return np.frombuffer(b''.join(encoded), dtype=np.uint8), offsets
+
+
+def decode_strings(buffer, offsets):
+    data = buffer.tobytes()
+    return [data[start:end].decode('utf-8') for start, end in zip(offsets[:-1].tolist(), offsets[1:].tolist())]
+
+
+def encode_columns(name, values, arrays):
+    # add the arrays of a column of strings or of token lists to arrays
+    if len(values) > 0 and not isinstance(values[0], str):
+        sentences = np.zeros(len(values) + 1, dtype=np.int64)
+        np.cumsum([len(tokens) for tokens in values], out=sentences[1:])
+        arrays[name + '.sentences'] = sentences
+        values = [token for tokens in values for token in tokens]
+    arrays[name + '.buffer'], arrays[name + '.offsets'] = encode_strings(values)
+
+
+def write(path, texts, docs, pars, orders=None, tokens=None, stems=None):
+    """
+    write the store of the sentences given by the columns (lists with one value per
+    sentence, tokens and stems are lists of strings). Without orders, the position of
+    the sentences in their document is computed as by load_sents
+    """
+    if orders is None:
+        orders = []
+        for index, doc in enumerate(docs):
+            orders.append(orders[-1] + 1 if index > 0 and docs[index - 1] == doc else 0)
+    names = sorted(set(docs))
+    doc_ids = dict((name, id) for id, name in enumerate(names))
+    arrays = {
+        'doc.ids': np.array([doc_ids[doc] for doc in docs], dtype=np.int32),
+        'par': np.array(pars, dtype=bool),
+        'order': np.array(orders, dtype=np.int32),
+    }
+    encode_columns('text', list(texts), arrays)
+    encode_columns('doc.names', names, arrays)
+    for name, column in (('tokens', tokens), ('stems', stems)):
+        if column is not None:
+            encode_columns(name, [list(values) for values in column], arrays)
+    ## written atomically, np.savez adds the extension
+    tmp = '%s.%d.tmp' % (path, os.getpid())
+    np.savez(tmp, **arrays)
+    os.replace(tmp + EXTENSION, path)
+
+
+class SentenceStore:
+    """
+    sentences of a store file, the columns are decoded when first used. The
+    file is open until close (or the end of a with block)
+    self.path     path of the .npz file
+    self.columns  names of the columns of the file
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._arrays = np.load(path)
+        self.columns = sorted(set(name.split('.')[0] for name in self._arrays.files))
+        self._decoded = {}
+
+    def close(self):
+        # the file stays open while the columns may be read
+        self._arrays.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return len(self._arrays['order'])
+
+    def _column(self, name):
+        if name not in self._decoded:
+            if name + '.buffer' not in self._arrays.files:
+                return None
+            values = decode_strings(self._arrays[name + '.buffer'], self._arrays[name + '.offsets'])
+            if name + '.sentences' in self._arrays.files:
+                sentences = self._arrays[name + '.sentences'].tolist()
+                values = [values[start:end] for start, end in zip(sentences[:-1], sentences[1:])]
+            self._decoded[name] = values
+        return self._decoded[name]
+
+    def texts(self):
+        return self._column('text')
+
+    def tokens(self):
+        # token lists, None if the store has no tokens
+        return self._column('tokens')
+
+    def stems(self):
+        return self._column('stems')
+
+    def docs(self):
+        names = self._column('doc.names')
+        return [names[id] for id in self._arrays['doc.ids'].tolist()]
+
+    def pars(self):
+        return self._arrays['par'].tolist()
+
+    def orders(self):
+        return self._arrays['order'].tolist()
+
+    def add(self, name, values):
+        """
+        write the store again with the tokens or stems column set to values
+        """
+        if len(values) != len(self):
+            raise ValueError('%d values for the %d sentences of %s' % (len(values), len(self), self.path))
+        columns = {'tokens': self.tokens(), 'stems': self.stems()}
+        columns[name] = values
+        texts, docs, pars, orders = self.texts(), self.docs(), self.pars(), self.orders()
+        self.close()
+        write(self.path, texts, docs, pars, orders, columns['tokens'], columns['stems'])
+        self.__init__(self.path)
+
+    def export(self, prefix):
+        """
+        write the line-aligned files <prefix>.sent, .doc and .par, and .sent.tok if the
+        store has tokens
+        """
+        files = [('.sent', self.texts()), ('.doc', self.docs()), ('.par', ['%d' % int(par) for par in self.pars()])]
+        if self.tokens() is not None:
+            files.append(('.sent.tok', [' '.join(tokens) for tokens in self.tokens()]))
+        for extension, lines in files:
+            with open(prefix + extension, 'w') as out_fh:
+                for line in lines:
+                    out_fh.write('%s\n' % line)
+
+
+def store_path(path, id):
+    return os.path.join(path, id + EXTENSION)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) == 4 and sys.argv[1] == 'export':
+        with SentenceStore(sys.argv[2]) as store:
+            store.export(sys.argv[3])
+    elif len(sys.argv) == 5 and sys.argv[1] == 'add' and sys.argv[3] in ('tokens', 'stems'):
+        with open(sys.argv[4]) as lines_fh:
+            with SentenceStore(sys.argv[2]) as store:
+                store.add(sys.argv[3], [line.split() for line in lines_fh.read().splitlines()])
+    else:
+        sys.stderr.write('USAGE: %s export <store> <prefix> | add <store> tokens|stems <file>\n' % sys.argv[0])
+        sys.exit(1)
@@ -1,4 +1,4 @@
-import os, sys, re, math
+import os, sys, re, math, atexit
 import util
 from globals import *
 import nltk
@@ -11,6 +11,10 @@ class TextProcessor:
         self._no_punct_pattern = re.compile('[a-zA-Z0-9- ]')
         self._stopwords = set(open(STOPWORDS).read().splitlines())
         self._porter_stemmer = nltk.stem.porter.PorterStemmer()
+        ## stems and tokenized sentences, shared by all the sentences (see MEMO_FILE)
+        self._stem_memo = util.Memo(self._porter_stemmer.stem, 200000)
+        self._tokenize_memo = util.Memo(lambda text: tuple(WordPunctTokenizer().tokenize(text)), 50000)
+        self.memos = {'stem': self._stem_memo, 'tokenize': self._tokenize_memo}
         #self._sent_tokenizer = util.load_pickle('%s%s' %(STATIC_DATA_ROOT, 'punkt/m07_punkt.pickle'))
         self._sent_split_ABBR_LIST = set(['Mr.', 'Mrs.', 'Sen.', 'No.', 'Dr.', 'Gen.', 'St.', 'Lt.', 'Col.', 'Capt.'])
         self._sent_split_PUNCT_LIST = set(['\" ', '\")', ') ', '\' ', '\"\''])
@@ -67,12 +71,14 @@ class TextProcessor:
         return sbd.sbd_text(self._splitta_model, text, do_tok=False)
 
     def tokenize(self, text):
-        punkt_word_tokenizer = WordPunctTokenizer()
         #return nltk.tokenize.punkt_word_tokenize(text)
-        return punkt_word_tokenizer.tokenize(text)
+        return list(self._tokenize_memo(text))
 
     def porter_stem(self, word):
-        return self._porter_stemmer.stem(word)
+        return self._stem_memo(word)
+
+    def memo_report(self):
+        return '\n'.join(memo.report(name) for name, memo in sorted(self.memos.items()))
 
     def remove_stopwords(self, words):
         return [w for w in words if not w in self._stopwords]
@@ -88,6 +94,9 @@ class TextProcessor:
         return re.sub(r'[^a-zA-Z0-9- ]', '', sentence).strip()
 
 text_processor = TextProcessor()
+if MEMO_FILE:
+    util.load_memos(MEMO_FILE, text_processor.memos)
+    atexit.register(util.save_memos, MEMO_FILE, text_processor.memos)
 
 class Sentence:
     """
@@ -107,8 +116,8 @@ class Sentence:
         self.parsed = None
         self.length = len(self.original.split())
         self.tokens = text_processor.tokenize(text_processor.remove_punct(self.original.lower()))
-        self.stemmed = map(text_processor.porter_stem, self.tokens)
-        self.no_stop = map(text_processor.porter_stem, text_processor.remove_stopwords(self.tokens))
+        self.stemmed = [text_processor.porter_stem(token) for token in self.tokens]
+        self.no_stop = [text_processor.porter_stem(token) for token in text_processor.remove_stopwords(self.tokens)]
 
         self.no_stop_freq = {}
         for word in self.no_stop:
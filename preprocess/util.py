@@ -1,6 +1,6 @@
 import treenode
 from globals import *
-import re, pickle, os, gzip
+import re, pickle, os, sys, gzip, collections, fcntl
 
 def save_pickle(data, path):
     o = gzip.open(path, 'wb')
@@ -20,6 +20,90 @@ def flushFile(fh):
    fh.flush()
    os.fsync(fh.fileno())
 
+class Memo:
+    """
+    bounded memo of a function of one hashable argument, the least recently
+    used results are dropped first
+    self.function  memoized function
+    self.size      maximum number of results kept
+    self.results   {argument: result}, least recently used first
+    self.hits      number of calls answered by the memo
+    self.misses    number of calls of the function
+    """
+
+    def __init__(self, function, size=100000):
+        self.function = function
+        self.size = size
+        self.results = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __call__(self, argument):
+        if argument in self.results:
+            self.hits += 1
+            self.results.move_to_end(argument)
+            return self.results[argument]
+        self.misses += 1
+        result = self.function(argument)
+        self.results[argument] = result
+        if len(self.results) > self.size:
+            self.results.popitem(last=False)
+        return result
+
+    def update(self, results):
+        # add results (e.g. loaded from a file, least recently used first) before
+        # the current ones
+        for argument, result in reversed(list(results.items())):
+            if argument not in self.results and len(self.results) < self.size:
+                self.results[argument] = result
+                self.results.move_to_end(argument, last=False)
+
+    def report(self, name):
+        calls = max(self.hits + self.misses, 1)
+        return "%s memo: %d hits, %d misses (%.1f%% hits), %d entries" % (
+            name, self.hits, self.misses, 100.0 * self.hits / calls, len(self.results))
+
+def load_memos(path, memos):
+    """
+    fill the memos {name: Memo} with the results saved in path by save_memos
+    """
+    if not os.path.exists(path):
+        return
+    try:
+        saved = load_pickle(path)
+    except Exception as e:
+        sys.stderr.write('WARNING: cannot read the memo file %s: %s\n' % (path, e))
+        return
+    for name, memo in memos.items():
+        memo.update(saved.get(name, {}))
+
+def save_memos(path, memos):
+    """
+    save the results of the memos {name: Memo} in path, merged with those
+    already saved (by another process), the file is replaced atomically. The
+    merge holds a lock on <path>.lock so that concurrent runs keep each
+    other's results
+    """
+    with open(path + '.lock', 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        saved = {}
+        if os.path.exists(path):
+            try:
+                saved = load_pickle(path)
+            except Exception:
+                saved = {}
+        for name, memo in memos.items():
+            results = collections.OrderedDict(saved.get(name, {}))
+            for argument, result in memo.results.items():
+                results.pop(argument, None)
+                results[argument] = result
+            while len(results) > memo.size:
+                results.popitem(last=False)
+            saved[name] = results
+        tmp = '%s.%d.tmp' % (path, os.getpid())
+        save_pickle(saved, tmp)
+        os.replace(tmp, path)
+
 def remove_tags(text):
     """
     remove html style tags from some text
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# coding: utf8
+"""
+Compares the clustering backends of sparsemcl.py on a directory of
+similarity graphs (e.g. the TAC'08 AB graphs of $SIM_DATA/0.7): for each
+graph and threshold, the agreement of the connected components with MCL
+(adjusted Rand index and Rand index, i.e. the fraction of the pairs of
+sentences on which both clusterings agree) and the runtime of both.
+
+The reference MCL clusterings are computed in process, or read from the
+<file><threshold>.clus files written by the mcl program
+(mcl_optimised_with_params.sh temp directory) with --reference.
+
+    benchmark_clustering.py -i $DATA/2008/$SIM_DATA/0.7 \\
+        -r $DATA/2008/$CLUSTERS/temp
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+from scipy import sparse
+
+import simabc
+import sparsemcl
+
+
+def labels_of(clusters, n):
+    labels = np.zeros(n, dtype=int)
+    for num, cluster in enumerate(clusters):
+        labels[cluster] = num
+    return labels
+
+
+def read_clus(path, keys):
+    """
+    clusters of a .clus file as lists of indices of keys. Sentences missing
+    from the file are singletons
+    """
+    index = dict((key, i) for i, key in enumerate(keys))
+    clusters = []
+    seen = set()
+    with open(path) as clus_f:
+        for line in clus_f:
+            cluster = [index[key] for key in line.split() if key in index]
+            seen.update(cluster)
+            if cluster:
+                clusters.append(cluster)
+    clusters += [[i] for i in range(len(keys)) if i not in seen]
+    return clusters
+
+
+def rand_indices(labels_a, labels_b):
+    """
+    (adjusted Rand index, Rand index) of two clusterings given as labels
+    """
+    n = len(labels_a)
+    pairs = n * (n - 1) / 2.0
+    if pairs == 0:
+        return 1.0, 1.0
+    contingency = sparse.coo_matrix(
+        (np.ones(n), (labels_a, labels_b))).tocsr()
+    comb = lambda x: (x * (x - 1) / 2.0).sum()
+    both = comb(contingency.data)
+    in_a = comb(np.asarray(contingency.sum(axis=1)).ravel())
+    in_b = comb(np.asarray(contingency.sum(axis=0)).ravel())
+    rand = (pairs + 2 * both - in_a - in_b) / pairs
+    expected = in_a * in_b / pairs
+    maximum = (in_a + in_b) / 2.0
+    if maximum == expected:
+        return 1.0, rand
+    return (both - expected) / (maximum - expected), rand
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-i", "--input", type=str, required=True,
+                        help="similarity graphs directory")
+    parser.add_argument("-t", "--thresholds", type=str, nargs='+',
+                        default=["0.96", "0.97", "0.98", "0.99"],
+                        help="similarity thresholds")
+    parser.add_argument("-s", "--max-size", type=int, default=0,
+                        help="maximum size of a connected component cluster")
+    parser.add_argument("-r", "--reference", type=str, default=None,
+                        help="directory of the .clus files of the mcl "
+                        "program, used as reference instead of sparsemcl")
+    args = parser.parse_args()
+
+    thresholds = [float(t) for t in args.thresholds]
+    totals = {"mcl": 0.0, "components": 0.0}
+    scores = []
+    print("file\tthreshold\tari\trand\tmcl_clusters\tcomponents_clusters")
+    for name in sorted(os.listdir(args.input)):
+        path = os.path.join(args.input, name)
+        keys, rows, cols, weights = simabc.read_edges(path)
+        ordered = simabc.is_sorted(path)
+        if simabc.is_npz(name):
+            name = name[:-len(".npz")]
+        results = {}
+        for backend in ("mcl", "components"):
+            if backend == "mcl" and args.reference:
+                results[backend] = [
+                    (threshold, read_clus(os.path.join(
+                        args.reference, name + label + ".clus"), keys))
+                    for threshold, label in zip(thresholds, args.thresholds)]
+                continue
+            start = time.time()
+            results[backend] = sparsemcl.threshold_sweep(
+                keys, rows, cols, weights, thresholds, backend,
+                args.max_size, ordered)
+            totals[backend] += time.time() - start
+        for label, (_, reference), (_, components) in zip(
+                args.thresholds, results["mcl"], results["components"]):
+            ari, rand = rand_indices(labels_of(reference, len(keys)),
+                                     labels_of(components, len(keys)))
+            scores.append((ari, rand))
+            print("%s\t%s\t%.4f\t%.4f\t%d\t%d" % (
+                name, label, ari, rand, len(reference), len(components)))
+    if scores:
+        ari, rand = np.mean(scores, axis=0)
+        print("mean ARI %.4f, mean Rand index %.4f on %d clusterings" % (
+            ari, rand, len(scores)), file=sys.stderr)
+    if not args.reference:
+        print("sparsemcl runtime %.2fs" % totals["mcl"], file=sys.stderr)
+    print("components runtime %.2fs" % totals["components"], file=sys.stderr)
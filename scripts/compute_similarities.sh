@@ -33,7 +33,12 @@ install -d $out
 
 
 minsim=0.0
+# Add "-f sparse" (abc text) or "-f npz" (binary) to only write the pairs
+# above $minsim instead of one line per pair of sentences. For very large
+# topics, add "--lsh-bits 16" with a sparse format and a high $minsim to
+# only compute the similarities of LSH candidate pairs (the recall measured
+# on a sample of sentences is reported on stderr)
 # python -m cProfile ${SCRIPTS}/similarities_lines_AB.py -A $inA -B $inB -e ${EMBEDDINGS} -b True -m $minsim -o $out/
-python ${SCRIPTS}/similarities_lines_AB.py -A $inA -B $inB -e ${EMBEDDINGS} -b True -m $minsim -o $out/
+python ${SCRIPTS}/similarities_lines_AB.py -A $inA -B $inB -e ${EMBEDDINGS} -b True -m $minsim -o $out/ -w ${WORKERS:-1}
 
 
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# coding: utf8
+"""
+Word embeddings stored as a float32 .npy matrix plus a vocabulary file, to
+avoid parsing the original word2vec/GloVe file at each run.
+
+Conversion (once):
+    embeddingstore.py -e glove.840B.300d.bin -b True -o glove840b
+    embeddingstore.py -e glove.840B.300d.bin -o glove840b_u08 \\
+        -c $DATA/2008/source_alpha_lines_icsi $DATA/2008/source_alpha_lines_icsi_B
+The second form only keeps the words occurring in the .sent files of the
+given directories. The store is then used by giving glove840b.npy to the
+--embeddings option of similarities_lines_AB.py.
+"""
+from __future__ import unicode_literals
+import argparse
+import codecs
+import os
+import sys
+
+import numpy as np
+
+
+def is_store(path):
+    return path.endswith('.npy')
+
+
+def store_paths(path):
+    """
+    (vectors, vocabulary) file names of the store with prefix or .npy path
+    """
+    prefix = path[:-len('.npy')] if is_store(path) else path
+    return prefix + '.npy', prefix + '.vocab'
+
+
+def unitvec(vec):
+    norm = np.sqrt(np.dot(vec, vec))
+    if norm > 0.0:
+        return (vec / norm).astype(vec.dtype)
+    return vec
+
+
+class EmbeddingStore:
+    """
+    Read only word vectors with the part of the gensim KeyedVectors
+    interface used in similaritymeasures.py
+    self.vocab        {word: row in self.vectors}
+    self.vectors      words x dims float32 matrix, memory mapped
+    self.vector_size  number of dimensions
+    """
+
+    def __init__(self, path):
+        vectors_file, vocab_file = store_paths(path)
+        self.vectors = np.load(vectors_file, mmap_mode='r')
+        with codecs.open(vocab_file, 'r', 'utf-8') as vocab_fh:
+            words = vocab_fh.read().split('\n')[:-1]
+        if len(words) != self.vectors.shape[0]:
+            raise ValueError('%s has %d words for %d vectors' % (
+                vocab_file, len(words), self.vectors.shape[0]))
+        self.vocab = dict((w, i) for i, w in enumerate(words))
+        self.vector_size = self.vectors.shape[1]
+
+    def __contains__(self, word):
+        return word in self.vocab
+
+    def __getitem__(self, word):
+        return np.asarray(self.vectors[self.vocab[word]])
+
+    def similarity(self, w1, w2):
+        return np.dot(unitvec(self[w1]), unitvec(self[w2]))
+
+    def n_similarity(self, ws1, ws2):
+        if not (len(ws1) and len(ws2)):
+            raise ZeroDivisionError('At least one of the passed list is empty.')
+        v1 = np.array([self[word] for word in ws1]).mean(axis=0)
+        v2 = np.array([self[word] for word in ws2]).mean(axis=0)
+        return np.dot(unitvec(v1), unitvec(v2))
+
+
+def corpus_vocabulary(dirs):
+    """
+    tokens (and '_' joined token bigrams, used by w2v_bigrams) of all the
+    .sent files of the given directories
+    """
+    from nltk.tokenize import word_tokenize
+    words = set()
+    for dir in dirs:
+        for name in os.listdir(dir):
+            if not name.endswith('.sent'):
+                continue
+            with codecs.open(os.path.join(dir, name), 'r', 'utf-8') as sent_fh:
+                for line in sent_fh:
+                    tokens = word_tokenize(line.strip())
+                    words.update(tokens)
+                    words.update(a + '_' + b for a, b in zip(tokens, tokens[1:]))
+    return words
+
+
+def convert(wordmodel, path, keep=None):
+    """
+    write the vectors of wordmodel (gensim KeyedVectors) in a store, only
+    keeping the words of the set keep if given
+    """
+    vectors_file, vocab_file = store_paths(path)
+    words = wordmodel.index2word
+    if keep is not None:
+        words = [w for w in words if w in keep]
+    rows = [wordmodel.vocab[w].index for w in words]
+    np.save(vectors_file, np.asarray(wordmodel.vectors[rows], dtype=np.float32))
+    with codecs.open(vocab_file, 'w', 'utf-8') as vocab_fh:
+        for word in words:
+            vocab_fh.write(word + '\n')
+    return len(words)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-e", "--embeddings", type=str, required=True,
+                        help="path to the word2vec format embeddings file")
+    parser.add_argument("-b", "--binary", type=bool, default=True,
+                        help="true if embeddings file is binary")
+    parser.add_argument("-o", "--output", type=str, required=True,
+                        help="store prefix (<output>.npy, <output>.vocab)")
+    parser.add_argument("-c", "--corpus", type=str, nargs='*', default=None,
+                        help="only keep the words of the .sent files of "
+                        "these directories")
+    args = parser.parse_args()
+
+    from gensim import models
+    print(f"Loading embeddings {args.embeddings}", file=sys.stderr)
+    wordmodel = models.KeyedVectors.load_word2vec_format(args.embeddings,
+                                                         binary=args.binary)
+    keep = corpus_vocabulary(args.corpus) if args.corpus else None
+    count = convert(wordmodel, args.output, keep)
+    print(f"Stored {count} words in {args.output}", file=sys.stderr)
@@ -0,0 +1,111 @@
+# coding: utf8
+"""
+Persistent cache of the per sentence features of similaritymatrix.py
+(content words, known words and centroid vector), so that reruns and
+parameter sweeps on an unchanged corpus skip tokenization and embedding
+lookups.
+
+Entries are stored in a SQLite file, keyed by the MD5 of the sentence text
+and of the identity of the embeddings file. The number of entries is capped,
+the least recently used ones being evicted first.
+"""
+
+import os
+import sqlite3
+import time
+
+import numpy as np
+
+from similaritymatrix import SentenceFeatures
+
+
+def embeddings_identity(path):
+    """
+    identifies an embeddings file by its real path, size and modification
+    time: a new or modified file invalidates all the cached features
+    """
+    info = os.stat(path)
+    return "%s:%d:%d" % (os.path.realpath(path), info.st_size,
+                         info.st_mtime_ns)
+
+
+class FeatureCache:
+    """
+    self.path         SQLite file
+    self.max_entries  number of entries kept by evict()
+    self.hits         lookups found in the cache
+    self.misses       lookups not found
+    """
+
+    def __init__(self, path, max_entries=1000000):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._db = sqlite3.connect(path, timeout=600)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS features ("
+                         "key TEXT PRIMARY KEY, content TEXT, words TEXT, "
+                         "vector BLOB, used REAL)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS features_used "
+                         "ON features (used)")
+        self._db.commit()
+
+    def get(self, keys):
+        """
+        {key: SentenceFeatures} for the keys found in the cache, marking
+        them as recently used
+        """
+        found = {}
+        keys = list(set(keys))
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            query = ("SELECT key, content, words, vector FROM features "
+                     "WHERE key IN (%s)" % ",".join("?" * len(chunk)))
+            for key, content, words, vector in self._db.execute(query, chunk):
+                if vector is not None:
+                    vector = np.frombuffer(vector, dtype=np.float32)
+                found[key] = SentenceFeatures(
+                    frozenset(content.split("\n")) if content else frozenset(),
+                    words.split("\n") if words else [],
+                    vector)
+        now = time.time()
+        self._db.executemany("UPDATE features SET used = ? WHERE key = ?",
+                             [(now, key) for key in found])
+        self._db.commit()
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    def put(self, features):
+        """
+        store a {key: SentenceFeatures} dictionary
+        """
+        now = time.time()
+        rows = []
+        for key, feat in features.items():
+            vector = None
+            if feat.vector is not None:
+                vector = np.asarray(feat.vector, dtype=np.float32).tobytes()
+            rows.append((key, "\n".join(sorted(feat.content)),
+                         "\n".join(feat.words), vector, now))
+        self._db.executemany("INSERT OR REPLACE INTO features "
+                             "VALUES (?, ?, ?, ?, ?)", rows)
+        self._db.commit()
+
+    def evict(self):
+        """
+        remove the least recently used entries above max_entries. Returns
+        the number of removed entries
+        """
+        count = self._db.execute("SELECT COUNT(*) FROM features").fetchone()[0]
+        excess = count - self.max_entries
+        if excess <= 0:
+            return 0
+        self._db.execute("DELETE FROM features WHERE key IN (SELECT key FROM "
+                         "features ORDER BY used LIMIT ?)", (excess,))
+        self._db.commit()
+        return excess
+
+    def close(self):
+        self._db.close()
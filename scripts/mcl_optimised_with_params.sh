@@ -15,6 +15,10 @@
 # - SIM_DATA The folder containing input precomputed similarities;
 # - CLUSTERS The subdir where to put resulting clusters;
 # - SCRIPTS The scripts folder.
+# CLUSTER_BACKEND can be set to "python" to cluster in process with
+# scripts/sparsemcl.py (same thresholds and selection rule) instead of
+# running the mcl program for each file and threshold, or to "components"
+# to use the connected components of the thresholded graphs.
 
 set -o errexit
 set -o pipefail
@@ -41,6 +45,17 @@ install -d ${output}/temp
 #for sim_threshold in 0.7 0.8 0.76 0.78 #0.82 0.8 0.95 0.9 0.72 0.74 0.76 0.78 0.7 #0.82 0.89 0.86 0.84
 for sim_threshold in 0.7
 do
+    if [ "${CLUSTER_BACKEND:-mcl}" != "mcl" ]
+    then
+        backend=mcl
+        if [ "${CLUSTER_BACKEND}" == "components" ]
+        then
+            backend=components
+        fi
+        python ${SCRIPTS}/sparsemcl.py -b ${backend} -i ${input}/${sim_threshold} \
+            -o ${output} -t 0.96 0.97 0.98 0.99 -f 10 -T ${output}/temp
+        continue
+    fi
     files=$(ls ${input}/${sim_threshold})
     for file in $files
     do
@@ -29,7 +29,7 @@ export PATH=${ICSISUMM}/solver/glpk-4.43/examples/:$PATH
 install -d $OUTPUT
 
 # Preprocessing
-python ${ICSISUMM}/preprocess/main.py --output $OUTPUT --docpath $DOCS --manpath $REF --task u${TAC_NUMBER} --reload --splitta-model ${ICSISUMM}/preprocess/splitta/model_nb/ 1>&2
+python ${ICSISUMM}/preprocess/main.py --output $OUTPUT --docpath $DOCS --manpath $REF --task u${TAC_NUMBER} --reload --splitta-model ${ICSISUMM}/preprocess/splitta/model_nb/ --jobs ${WORKERS:-1} 1>&2
 
 install -d ${DATA}/20${TAC_NUMBER}/source_alpha_lines_icsi
 cp  $OUTPUT/*-A.sent ${DATA}/20${TAC_NUMBER}/source_alpha_lines_icsi
@@ -42,6 +42,8 @@ echo "Sentence splitting DONE"  1>&2
 for i in $OUTPUT/*.sent ; do
   echo "Tokenizing $OUTPUT/*.sent" 1>&2
   ${ICSISUMM}/preprocess/penn_treebank_tokenizer.sed $i > $i.tok  
+  # tokens column of the sentence store written by main.py
+  python ${ICSISUMM}/preprocess/sentstore.py add ${i%.sent}.npz tokens $i.tok
 done
 echo "Tokenization DONE" 1>&2
 
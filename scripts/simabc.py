@@ -0,0 +1,126 @@
+# coding: utf8
+"""
+Reading and writing of sentence similarity graphs.
+
+Two formats are supported:
+- the mcl abc text format, one "<key1> <key2> <weight>" line per edge. The
+  dense variant written by similarities_lines_AB.py has one line per pair of
+  sentences, the sparse variant only the edges above a floor. In the sparse
+  variant, sentences without any edge are written as a zero weight self pair
+  so that mcl still knows about them;
+- a binary .npz file holding the sentence keys and three parallel arrays:
+  row (int32), col (int32) and weight (float32). A sorted .npz file (written
+  by filterSimABC.py --sorted) has its edges in decreasing weight order and
+  a true 'sorted' entry: the graph at any threshold is a prefix of the
+  arrays, found by cut_edges without reading the edges one by one.
+"""
+
+import numpy as np
+
+
+def is_npz(path):
+    return path.endswith('.npz')
+
+
+def edges_from_matrix(sim, floor, topk=0):
+    """
+    upper triangle edges of the similarity matrix sim above floor. If topk
+    is positive, an edge is only kept if it is among the topk best edges of
+    one of its two sentences
+    """
+    n = sim.shape[0]
+    rows, cols = np.triu_indices(n, 1)
+    weights = sim[rows, cols]
+    kept = weights > floor
+    if topk > 0 and n > 1:
+        ranked = np.where(np.eye(n, dtype=bool), -np.inf, sim)
+        k = min(topk, n - 1)
+        best = np.argpartition(-ranked, k - 1, axis=1)[:, :k]
+        neighbours = np.zeros((n, n), dtype=bool)
+        neighbours[np.repeat(np.arange(n), k), best.ravel()] = True
+        kept &= neighbours[rows, cols] | neighbours[cols, rows]
+    return (rows[kept].astype(np.int32), cols[kept].astype(np.int32),
+            weights[kept].astype(np.float32))
+
+
+def write_sparse(out_f, keys, rows, cols, weights):
+    """
+    write the edges in abc text format, adding a zero weight self pair for
+    each sentence without edge
+    """
+    for r, c, w in zip(rows.tolist(), cols.tolist(), weights.astype(str)):
+        out_f.write("%s %s %s\n" % (keys[r], keys[c], w))
+    connected = np.zeros(len(keys), dtype=bool)
+    connected[rows] = True
+    connected[cols] = True
+    for i in np.flatnonzero(~connected).tolist():
+        out_f.write("%s %s 0.0\n" % (keys[i], keys[i]))
+
+
+def write_npz(path, keys, rows, cols, weights, ordered=False):
+    np.savez_compressed(path, keys=np.array(keys, dtype=str),
+                        row=np.asarray(rows, dtype=np.int32),
+                        col=np.asarray(cols, dtype=np.int32),
+                        weight=np.asarray(weights, dtype=np.float32),
+                        sorted=np.array(ordered))
+
+
+def sort_edges(rows, cols, weights):
+    """
+    the edges with a positive weight, without self pairs, in decreasing
+    weight order (ties in the original order)
+    """
+    kept = (weights > 0.0) & (rows != cols)
+    rows, cols, weights = rows[kept], cols[kept], weights[kept]
+    order = np.argsort(-weights, kind="stable")
+    return rows[order], cols[order], weights[order]
+
+
+def is_sorted(path):
+    if not is_npz(path):
+        return False
+    with np.load(path) as data:
+        return 'sorted' in data.files and bool(data['sorted'])
+
+
+def cut_edges(rows, cols, weights, minsim):
+    """
+    edges of weight at least minsim of a graph sorted by sort_edges
+    """
+    n = np.searchsorted(-weights, -np.float32(minsim), side='right')
+    return rows[:n], cols[:n], weights[:n]
+
+
+def threshold_edges(rows, cols, weights, minsim, ordered=False):
+    """
+    edges of weight at least minsim, compared in float32 as the weights. If
+    ordered (is_sorted), they are cut by cut_edges instead of being scanned
+    """
+    if ordered:
+        return cut_edges(rows, cols, weights, minsim)
+    kept = weights >= np.float32(minsim)
+    return rows[kept], cols[kept], weights[kept]
+
+
+def read_edges(path):
+    """
+    read a similarity graph in any of the two formats. Returns (keys, rows,
+    cols, weights) where keys lists the sentences in order of appearance
+    """
+    if is_npz(path):
+        data = np.load(path)
+        return (data['keys'].tolist(), data['row'], data['col'],
+                data['weight'])
+    index = {}
+    rows, cols, weights = [], [], []
+    with open(path, "r") as infile:
+        for line in infile:
+            fields = line.split()
+            if len(fields) < 3:
+                continue
+            rows.append(index.setdefault(fields[0], len(index)))
+            cols.append(index.setdefault(fields[1], len(index)))
+            weights.append(fields[2])
+    return (list(index.keys()), np.array(rows, dtype=np.int32),
+            np.array(cols, dtype=np.int32),
+            np.array(weights, dtype=np.float32))
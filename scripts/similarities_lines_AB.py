@@ -11,6 +11,11 @@ from common import sentTokenize
 import glob
 import nltk
 from similaritymeasures import *
+from similaritymatrix import sentence_features, extend_similarity, write_abc
+import simabc
+import similaritylsh
+from embeddingstore import EmbeddingStore, is_store
+from featurecache import FeatureCache, embeddings_identity
 import os
 from nltk.corpus import stopwords
 from nltk.tokenize import word_tokenize
@@ -19,6 +24,8 @@ import codecs
 import pickle
 import hashlib
 import collections
+import multiprocessing
+import numpy as np
 import sys
 
 parser = argparse.ArgumentParser()
@@ -26,9 +33,13 @@ parser.add_argument("-A", "--inputA", type=str, default=None,
                     help="set A input source text files: all files in inputA")
 parser.add_argument("-B", "--inputB", type=str, default=None,
                     help="set B input source text files: all files in inputB")
+parser.add_argument("-C", "--inputC", type=str, default=None,
+                    help="set C input source text files: all files in inputC "
+                    "(ABC layout of the u07 task)")
 parser.add_argument("-e", "--embeddings", type=str,
                     default="GoogleNews-vectors-negative300.bin.gz",
-                    help="path to embeddings file")
+                    help="path to embeddings file, or to the .npy file of "
+                    "a store created by embeddingstore.py")
 parser.add_argument("-b", "--binary", type=bool, default=True,
                     help="true if embeddings file is binary")
 parser.add_argument("-m", "--minsim", type=float, default=0.7,
@@ -36,17 +47,128 @@ parser.add_argument("-m", "--minsim", type=float, default=0.7,
                     "considered as null")
 parser.add_argument("-o", "--output", type=str,
                     help="clusters output directory")
+parser.add_argument("-f", "--format", type=str, default="dense",
+                    choices=["dense", "sparse", "npz"],
+                    help="dense: one abc line per pair (null similarities "
+                    "written as 0.0); sparse: only the pairs above minsim; "
+                    "npz: binary sparse graph written in <output file>.npz")
+parser.add_argument("-k", "--topk", type=int, default=0,
+                    help="with sparse formats, only keep for each sentence "
+                    "its topk most similar neighbours (0: keep all)")
+parser.add_argument("-p", "--pairwise", action="store_true",
+                    help="compute the similarities pair by pair instead of "
+                    "with the batched matrix computation (slow, for checking)")
+parser.add_argument("-w", "--workers", type=int, default=1,
+                    help="number of topics processed in parallel. The "
+                    "embeddings are loaded once and shared with the workers")
+parser.add_argument("-c", "--cache", type=str, default=None,
+                    help="SQLite file caching the sentence features between "
+                    "runs (created if needed)")
+parser.add_argument("--cache-size", type=int, default=1000000,
+                    help="maximum number of sentences kept in the cache")
+parser.add_argument("-s", "--state", type=str, default=None,
+                    help="directory keeping the similarity matrix of each "
+                    "topic: when a topic gets a new set of sentences (B "
+                    "after A, C after B), only the blocks involving the new "
+                    "set are computed")
+parser.add_argument("--lsh-bits", type=int, default=0,
+                    help="with sparse formats, only compute the similarities "
+                    "of the candidate pairs found by random hyperplane LSH "
+                    "with hashes of this many bits (0: all pairs, 16 is a "
+                    "good value for minsim around 0.96)")
+parser.add_argument("--lsh-tables", type=int, default=20,
+                    help="number of LSH hash tables (more tables: better "
+                    "recall, more candidates)")
+parser.add_argument("--lsh-max-bucket", type=int, default=1000,
+                    help="split the LSH buckets of more sentences along "
+                    "extra hyperplanes (0: no limit)")
+parser.add_argument("--lsh-sample", type=int, default=100,
+                    help="number of sentences of each topic whose exact "
+                    "similarities are computed to report the LSH recall "
+                    "(0: no report)")
+parser.add_argument("-r", "--resume", action="store_true",
+                    help="skip the topics whose output file for all the sets "
+                    "already exists")
 
 args = parser.parse_args()
+if args.lsh_bits > 0 and (args.format == "dense" or args.topk or args.state
+                          or args.pairwise):
+    parser.error("--lsh-bits needs a sparse format and is incompatible with "
+                 "--topk, --state and --pairwise")
 
 
 def computeMD5hash(string):
     m = hashlib.md5()
-    m.update(string)
+    m.update(string.encode("utf-8"))
     # m.update(string)
     return m.hexdigest()
 
 
+def sentence_key(sentence):
+    """
+    identifies a sentence and the embeddings used for its features
+    """
+    return computeMD5hash(embeddings_id + "\t" + sentence)
+
+
+feature_cache = None
+
+
+def topic_features(sentences):
+    """
+    features of the sentences, taken from the cache when possible
+    """
+    global feature_cache
+    if not args.cache:
+        return [sentence_features(s, wordmodel, stop) for s in sentences]
+    if feature_cache is None:
+        # opened in each worker, SQLite connections must not cross a fork
+        feature_cache = FeatureCache(args.cache, args.cache_size)
+    keys = [sentence_key(s) for s in sentences]
+    cached = feature_cache.get(keys)
+    new = {}
+    features = []
+    for key, sent in zip(keys, sentences):
+        feat = cached.get(key) or new.get(key)
+        if feat is None:
+            feat = sentence_features(sent, wordmodel, stop)
+            new[key] = feat
+        features.append(feat)
+    feature_cache.put(new)
+    print(f"Feature cache: {len(keys) - len(new)} hits, {len(new)} misses",
+          file=sys.stderr)
+    return features
+
+
+def load_state(topic, keys, texts, bounds):
+    """
+    (number of sentences, similarity matrix) of the sets of the topic whose
+    similarities were computed by a previous run. The stored sets must be
+    the first sets of the current topic, with the same sentences
+    """
+    empty = (0, np.zeros((0, 0), dtype=np.float32))
+    path = os.path.join(args.state, topic + ".npz")
+    if not os.path.exists(path):
+        return empty
+    data = np.load(path)
+    n = len(data["keys"])
+    if (n not in bounds or data["keys"].tolist() != keys[:n]
+            or data["hashes"].tolist() != [sentence_key(t) for t in texts[:n]]):
+        print(f"Ignoring outdated state {path}", file=sys.stderr)
+        return empty
+    return n, data["sim"]
+
+
+def save_state(topic, keys, texts, sim):
+    path = os.path.join(args.state, topic + ".npz")
+    tmpfile = "%s.part%d" % (path, os.getpid())
+    with open(tmpfile, "wb") as state_f:
+        np.savez(state_f, keys=np.array(keys, dtype=str),
+                 hashes=np.array([sentence_key(t) for t in texts], dtype=str),
+                 sim=sim)
+    os.replace(tmpfile, path)
+
+
 def sent_similarity(s1, s2):
     content_words_1 = [w for w in word_tokenize(s1) if w not in stop]
     content_words_1_set = set(content_words_1)
@@ -59,17 +181,119 @@ def sent_similarity(s1, s2):
 print(f"Loading embeddings {args.embeddings}", file=sys.stderr)
 wordmodelfile = args.embeddings
 # wordmodel = word2vec.Word2Vec.load_word2vec_format(wordmodelfile,
-wordmodel = models.KeyedVectors.load_word2vec_format(
-    wordmodelfile,
-    binary=args.binary)
+if is_store(wordmodelfile):
+    wordmodel = EmbeddingStore(wordmodelfile)
+else:
+    wordmodel = models.KeyedVectors.load_word2vec_format(
+        wordmodelfile,
+        binary=args.binary)
 print(f"Loading embeddings DONE", file=sys.stderr)
+embeddings_id = embeddings_identity(wordmodelfile)
 
 stop = stopwords.words('english')
 filesA = [os.path.join(args.inputA, o) for o in os.listdir(args.inputA)] if args.inputA else []
 filesB = [os.path.join(args.inputB, o) for o in os.listdir(args.inputB)] if args.inputB else []
 
-# files = glob.glob(path_pattern)
-for afile in filesA:
+
+def output_file(aname, sets=None):
+    """
+    output file of a topic for the given sets, by default all the input sets
+    """
+    if sets is None:
+        sets = "ABC" if args.inputC else "AB"
+    try:
+        outfile = os.path.join(args.output,
+                            aname.split("-A")[0]+"-"+sets+aname.split("-A")[1])
+    except IndexError:
+        outfile = os.path.join(args.output, aname+"-"+sets)
+    if args.format == "npz":
+        outfile += ".npz"
+    return outfile
+
+
+def write_edges(path, keys, rows, cols, weights):
+    if args.format == "npz":
+        with open(path, "wb") as out_f:
+            simabc.write_npz(out_f, keys, rows, cols, weights)
+    else:
+        with codecs.open(path, "w") as out_f:
+            simabc.write_sparse(out_f, keys, rows, cols, weights)
+
+
+def lsh_edges(topic, features):
+    """
+    edges above minsim among the LSH candidates, reporting the number of
+    candidates, the largest bucket and the recall measured on a sample of
+    sentences
+    """
+    rows, cols, weights, candidates, largest = \
+        similaritylsh.approximate_edges(
+            features, wordmodel.vector_size, args.minsim, args.lsh_bits,
+            args.lsh_tables, max_bucket=args.lsh_max_bucket)
+    n = len(features)
+    report = (f"LSH {topic}: {candidates} candidates of {n * (n - 1) // 2} "
+              f"pairs, {len(rows)} edges, largest bucket {largest}")
+    if args.lsh_sample > 0:
+        found, total = similaritylsh.sample_recall(
+            features, wordmodel.vector_size, args.minsim, rows, cols,
+            args.lsh_sample)
+        recall = found / total if total else 1.0
+        report += (f", recall {recall:.4f} ({found}/{total} edges of "
+                   f"{min(args.lsh_sample, n)} sampled sentences)")
+    print(report, file=sys.stderr)
+    return rows, cols, weights
+
+
+def finish(tmpfile, outfile, partial):
+    """
+    move the output of a topic in place and remove its partial outputs
+    """
+    os.replace(tmpfile, outfile)
+    for path in partial:
+        if path != outfile and os.path.exists(path):
+            os.remove(path)
+    return outfile
+
+
+def running(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def stale_parts(afiles):
+    """
+    temporary files (<file>.part<pid>) of the outputs and states of the
+    topics afiles left by processes which are not running any more; those of
+    other topics or of a run still going are kept
+    """
+    paths = []
+    for afile in afiles:
+        aname = os.path.basename(afile)
+        paths += [output_file(aname), output_file(aname, "A"),
+                  output_file(aname, "AB")]
+        if args.state:
+            paths.append(os.path.join(args.state,
+                                      aname.split("-A")[0] + ".npz"))
+    stale = []
+    for path in set(paths):
+        for tmpfile in glob.glob(glob.escape(path) + ".part[0-9]*"):
+            pid = tmpfile.rsplit(".part", 1)[1]
+            if pid.isdigit() and not running(int(pid)):
+                stale.append(tmpfile)
+    return stale
+
+
+def process_topic(afile):
+    """
+    compute and write the similarities of one topic. The output is written
+    in a temporary file renamed at the end, so that an interrupted run
+    never leaves a truncated output behind
+    """
     aname = os.path.basename(afile)
     absentences = collections.defaultdict(set)
     if args.inputA:
@@ -79,25 +303,71 @@ for afile in filesA:
             asentences = map(str.strip, af.readlines())
             for i, sent in enumerate(asentences):
                 absentences[str(i)+"A"] = sent
-    if args.inputB:
-        bfile = os.path.join(args.inputB,
-                            aname.split("-A")[0]+"-B"+aname.split("-A")[1])
+    # sentences of each set are numbered from bounds[i] to bounds[i+1]
+    bounds = [0, len(absentences)]
+    sets = "A"
+    complete = True
+    for set_name, input_dir in (("B", args.inputB), ("C", args.inputC)):
+        if not input_dir:
+            break
+        bfile = os.path.join(input_dir,
+                            aname.split("-A")[0]+"-"+set_name+aname.split("-A")[1])
+        if args.state and not os.path.exists(bfile):
+            # this set has not arrived yet
+            complete = False
+            break
+        sets += set_name
         with open(bfile, "r") as bf:
             # sentences=sentences+f.read().splitlines()
             bsentences = map(str.strip, bf.readlines())
             for i, sent in enumerate(bsentences):
-                absentences[str(i)+"B"] = sent
+                absentences[str(i)+set_name] = sent
+        bounds.append(len(absentences))
 
-    try:
-        outfile = os.path.join(args.output,
-                            aname.split("-A")[0]+"-AB"+aname.split("-A")[1])
-    except IndexError:
-        outfile = os.path.join(args.output, aname+"-AB")
+    # the output of a topic with missing sets is named after the sets it
+    # has, so that --resume computes the topic again when they arrive; the
+    # complete output replaces these partial ones
+    if complete:
+        outfile = output_file(aname)
+        partial = [output_file(aname, "A"), output_file(aname, "AB")]
+    else:
+        outfile = output_file(aname, sets)
+        partial = []
+        print(f"{aname}: only the sets {sets} are available", file=sys.stderr)
+    tmpfile = "%s.part%d" % (outfile, os.getpid())
     # print "sentences number"
     # print len(sentences)
     # sys.exit(0)#########
-    print(outfile)
-    with codecs.open(outfile, "w") as out_f:
+    if not args.pairwise:
+        keys = list(absentences.keys())
+        texts = [absentences[k] for k in keys]
+        features = topic_features(texts)
+        topic = aname.split("-A")[0]
+        if args.lsh_bits > 0:
+            rows, cols, weights = lsh_edges(topic, features)
+            write_edges(tmpfile, keys, rows, cols, weights)
+            return finish(tmpfile, outfile, partial)
+        done, sim = 0, np.zeros((0, 0), dtype=np.float32)
+        if args.state:
+            done, sim = load_state(topic, keys, texts, bounds)
+        # the matrix is always built set by set, so that an incremental
+        # computation gives exactly the same values as a full one
+        for start, end in zip(bounds, bounds[1:]):
+            if end > done:
+                sim = extend_similarity(sim, features[:start],
+                                        features[start:end],
+                                        wordmodel.vector_size)
+        if args.state and done < len(keys):
+            save_state(topic, keys, texts, sim)
+        if args.format == "dense":
+            with codecs.open(tmpfile, "w") as out_f:
+                write_abc(out_f, keys, sim, args.minsim)
+        else:
+            rows, cols, weights = simabc.edges_from_matrix(sim, args.minsim,
+                                                           args.topk)
+            write_edges(tmpfile, keys, rows, cols, weights)
+        return finish(tmpfile, outfile, partial)
+    with codecs.open(tmpfile, "w") as out_f:
         for i1, item1 in enumerate(absentences.items()):
             for i2, item2 in enumerate(absentences.items()):
                 if i1 < i2:
@@ -109,3 +379,31 @@ for afile in filesA:
                     else:
                         out_f.write(
                             item1[0]+" "+item2[0]+" "+str(0.0)+"\n")
+    return finish(tmpfile, outfile, partial)
+
+
+# files = glob.glob(path_pattern)
+# temporary files of an interrupted run
+for tmpfile in stale_parts(filesA):
+    os.remove(tmpfile)
+
+if args.resume:
+    done = [afile for afile in filesA
+            if os.path.exists(output_file(os.path.basename(afile)))]
+    print(f"Skipping {len(done)} already computed topics", file=sys.stderr)
+    filesA = [afile for afile in filesA if afile not in done]
+
+if args.workers > 1:
+    # fork after loading the embeddings: the workers share them copy-on-write
+    # (or through the page cache with a memory-mapped store)
+    with multiprocessing.get_context("fork").Pool(args.workers) as pool:
+        for outfile in pool.imap_unordered(process_topic, filesA):
+            print(outfile)
+else:
+    for afile in filesA:
+        print(process_topic(afile))
+
+if args.cache:
+    cache = FeatureCache(args.cache, args.cache_size)
+    print(f"Feature cache: evicted {cache.evict()} entries", file=sys.stderr)
+    cache.close()
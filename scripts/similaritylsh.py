@@ -0,0 +1,162 @@
+# coding: utf8
+"""
+Approximate version of similaritymatrix.py for very large topics.
+
+Only the pairs above a high threshold (0.96-0.99 in filter_similarities.sh)
+are used, so instead of computing the n x n similarity matrix, candidate
+pairs are first selected with random hyperplane LSH on the sentence
+centroids: each table hashes a centroid to the signs of its projections on
+`bits` random hyperplanes, and two sentences are candidates if they fall in
+the same bucket of at least one table. Two centroids with an angle a get
+the same bucket in a table with probability (1 - a/pi)^bits. With 16 bits
+and 20 tables, a pair with a similarity of 0.96 is found with probability
+0.99, while the number of candidates is a small fraction of the n² pairs.
+A bucket above max_bucket sentences (e.g. many sentences on the same
+subject) would still give a quadratic number of candidates, so it is split
+again along extra random hyperplanes.
+
+The exact w2v similarity (same rules and same float32 values as
+similaritymatrix.py) is then computed for the candidates only. Sentences
+with the same content words always get their similarity of 1.0, whether
+they are candidates or not.
+"""
+
+import numpy as np
+
+from similaritymatrix import centroid_matrix, incidence_matrix, identical_pairs
+
+
+def hyperplane_codes(centroids, bits, tables, seed=0):
+    """
+    tables x sentences array of the bucket of each sentence in each table
+    """
+    rng = np.random.default_rng(seed)
+    weights = np.left_shift(np.int64(1), np.arange(bits, dtype=np.int64))
+    codes = np.empty((tables, centroids.shape[0]), dtype=np.int64)
+    for t in range(tables):
+        planes = rng.standard_normal((centroids.shape[1], bits))
+        codes[t] = ((centroids @ planes) > 0.0) @ weights
+    return codes
+
+
+def split_bucket(bucket, centroids, max_bucket, rng, tries=16):
+    """
+    sub-buckets of at most max_bucket sentences of the index array bucket,
+    split in two along extra random hyperplanes through the mean of the part
+    (the centroids of a bucket are close, a hyperplane through the origin
+    seldom separates them). A part which no hyperplane splits after tries
+    attempts (identical centroids) is kept whole
+    """
+    parts, pending = [], [(bucket, 0)]
+    while pending:
+        part, failed = pending.pop()
+        if len(part) <= max_bucket or failed >= tries:
+            parts.append(part)
+            continue
+        vectors = centroids[part] - centroids[part].mean(axis=0)
+        side = vectors @ rng.standard_normal(centroids.shape[1]) > 0.0
+        if side.all() or not side.any():
+            pending.append((part, failed + 1))
+        else:
+            pending += [(part[side], 0), (part[~side], 0)]
+    return parts
+
+
+def bucket_pairs(codes, members, centroids=None, max_bucket=0, seed=0):
+    """
+    (rows, cols, largest bucket) with rows < cols of the pairs of sentences
+    of the index array members sharing a bucket in at least one table. With
+    max_bucket, the larger buckets are split by split_bucket
+    """
+    n = int(members.max()) + 1 if len(members) else 0
+    rng = np.random.default_rng([seed, 1])
+    pairs = []
+    largest = 0
+    for table in codes:
+        order = members[np.argsort(table[members], kind="stable")]
+        sorted_codes = table[order]
+        starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+        ends = np.r_[starts[1:], len(order)]
+        for start, end in zip(starts[ends - starts > 1], ends[ends - starts > 1]):
+            buckets = [order[start:end]]
+            if max_bucket and end - start > max_bucket:
+                buckets = split_bucket(buckets[0], centroids, max_bucket, rng)
+            for bucket in buckets:
+                largest = max(largest, len(bucket))
+                bucket = np.sort(bucket)
+                r, c = np.triu_indices(len(bucket), 1)
+                pairs.append(bucket[r] * n + bucket[c])
+    if not pairs:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), largest
+    pairs = np.unique(np.concatenate(pairs))
+    return pairs // n, pairs % n, largest
+
+
+def pair_similarities(centroids, incidence, rows, cols, chunk=100000):
+    """
+    float32 w2v similarities of the pairs (rows, cols), 0 for the pairs
+    without shared known word
+    """
+    weights = np.empty(len(rows), dtype=np.float32)
+    for start in range(0, len(rows), chunk):
+        r, c = rows[start:start + chunk], cols[start:start + chunk]
+        weights[start:start + chunk] = np.einsum(
+            'ij,ij->i', centroids[r], centroids[c]).astype(np.float32)
+        shared = np.asarray(incidence[r].multiply(incidence[c]).sum(axis=1))
+        weights[start:start + chunk][shared.ravel() == 0] = 0.0
+    return weights
+
+
+def approximate_edges(features, dims, floor, bits=16, tables=20, seed=0,
+                      max_bucket=1000):
+    """
+    upper triangle edges above floor, as simabc.edges_from_matrix, among the
+    LSH candidate pairs. Returns (rows, cols, weights, number of candidates,
+    largest bucket)
+    """
+    centroids = centroid_matrix(features, dims)
+    incidence = incidence_matrix(features, {})
+    # sentences without known words only have identical pairs
+    members = np.flatnonzero(np.abs(centroids).sum(axis=1) > 0.0)
+    rows, cols, largest = bucket_pairs(
+        hyperplane_codes(centroids, bits, tables, seed), members, centroids,
+        max_bucket, seed)
+    id_rows, id_cols = identical_pairs(features)
+    upper = id_rows < id_cols
+    id_rows, id_cols = id_rows[upper], id_cols[upper]
+    n = max(len(features), 1)
+    pairs = np.unique(np.concatenate([rows * n + cols, id_rows * n + id_cols]))
+    rows, cols = pairs // n, pairs % n
+    weights = pair_similarities(centroids, incidence, rows, cols)
+    weights[np.isin(pairs, id_rows * n + id_cols)] = 1.0
+    kept = weights > floor
+    return (rows[kept].astype(np.int32), cols[kept].astype(np.int32),
+            weights[kept], len(pairs), largest)
+
+
+def sample_recall(features, dims, floor, rows, cols, sample=100, seed=0):
+    """
+    (found, total): number of the exact edges above floor of a random
+    sample of sentences which are among the edges (rows, cols)
+    """
+    n = len(features)
+    if n < 2 or sample <= 0:
+        return 0, 0
+    rng = np.random.default_rng(seed)
+    sampled = np.sort(rng.choice(n, size=min(sample, n), replace=False))
+    centroids = centroid_matrix(features, dims)
+    incidence = incidence_matrix(features, {})
+    exact = (centroids[sampled] @ centroids.T).astype(np.float32)
+    exact[(incidence[sampled] @ incidence.T).toarray() == 0] = 0.0
+    groups = {}
+    for i, feat in enumerate(features):
+        groups.setdefault(feat.content, []).append(i)
+    for k, i in enumerate(sampled):
+        exact[k, groups[features[i].content]] = 1.0
+    exact[np.arange(len(sampled)), sampled] = 0.0
+    srows, scols = np.nonzero(exact > floor)
+    srows = sampled[srows]
+    edges = set(zip(rows.tolist(), cols.tolist()))
+    found = sum((min(r, c), max(r, c)) in edges
+                for r, c in zip(srows.tolist(), scols.tolist()))
+    return found, len(srows)
@@ -0,0 +1,152 @@
+# coding: utf8
+"""
+Batched version of the w2v sentence similarity of similaritymeasures.py.
+
+Instead of tokenizing both sentences and calling wordmodel.n_similarity for
+each of the n² pairs of a topic, each sentence is tokenized once, its
+centroid is computed once and the whole similarity matrix is obtained with
+a single matrix product. The rules of w2v are kept:
+- two sentences with the same content words have a similarity of 1.0;
+- two sentences without any shared content word (in the embeddings
+  vocabulary) have a similarity of 0.
+"""
+
+import numpy as np
+from scipy import sparse
+from nltk.tokenize import word_tokenize
+
+
+class SentenceFeatures:
+    """
+    what the w2v measure needs to know about a sentence
+    self.content    frozenset of the non stopword tokens
+    self.words      sorted list of the content words known by the embeddings
+    self.vector     centroid of the vectors of self.words (float32), None if
+                    no content word is known by the embeddings
+    """
+
+    def __init__(self, content, words, vector):
+        self.content = content
+        self.words = words
+        self.vector = vector
+
+
+def content_words(sentence, stop):
+    """
+    tokens of the sentence which are not stopwords, as in sent_similarity
+    """
+    return [w for w in word_tokenize(sentence) if w not in stop]
+
+
+def sentence_features(sentence, wordmodel, stop):
+    content = frozenset(content_words(sentence, stop))
+    words = sorted(w for w in content if w != '' and w in wordmodel.vocab)
+    vector = None
+    if words:
+        # same computation as gensim n_similarity before normalization
+        vector = np.array([wordmodel[w] for w in words]).mean(axis=0)
+    return SentenceFeatures(content, words, vector)
+
+
+def centroid_matrix(features, dims):
+    """
+    sentences x dims matrix of the L2 normalized centroids. Rows of
+    sentences without known words (or with a null centroid) stay at 0
+    """
+    mat = np.zeros((len(features), dims), dtype=np.float64)
+    for i, feat in enumerate(features):
+        if feat.vector is not None:
+            mat[i] = feat.vector
+    norms = np.sqrt(np.einsum('ij,ij->i', mat, mat))
+    nonnull = norms > 0.0
+    mat[nonnull] /= norms[nonnull, np.newaxis]
+    return mat
+
+
+def incidence_matrix(features, word_index):
+    """
+    sparse sentences x words binary matrix of the known content words.
+    word_index maps words to columns and is extended with the new words
+    """
+    indptr = [0]
+    indices = []
+    for feat in features:
+        for w in feat.words:
+            indices.append(word_index.setdefault(w, len(word_index)))
+        indptr.append(len(indices))
+    data = np.ones(len(indices), dtype=np.int32)
+    return sparse.csr_matrix((data, indices, indptr),
+                             shape=(len(features), max(len(word_index), 1)))
+
+
+def identical_pairs(features):
+    """
+    (rows, cols) of the pairs of sentences having the same content words
+    """
+    groups = {}
+    for i, feat in enumerate(features):
+        groups.setdefault(feat.content, []).append(i)
+    rows, cols = [], []
+    for members in groups.values():
+        if len(members) < 2:
+            continue
+        members = np.array(members)
+        r, c = np.meshgrid(members, members, indexing='ij')
+        rows.append(r.ravel())
+        cols.append(c.ravel())
+    if not rows:
+        return np.zeros(0, dtype=int), np.zeros(0, dtype=int)
+    return np.concatenate(rows), np.concatenate(cols)
+
+
+def extend_similarity(sim, features, new_features, dims):
+    """
+    similarity matrix of features + new_features, given the matrix sim of
+    features. Only the blocks involving new_features are computed, so that
+    a topic can be extended with a new set of sentences (the B set of the
+    update task) without recomputing the similarities of the previous ones.
+    The products are accumulated in float64 and rounded to float32 (the
+    precision of the embeddings): the values do not depend on the way BLAS
+    blocks the computation.
+    """
+    n, m = len(features), len(new_features)
+    all_features = list(features) + list(new_features)
+    centroids = centroid_matrix(all_features, dims)
+    result = np.zeros((n + m, n + m), dtype=np.float32)
+    result[:n, :n] = sim
+    block = (centroids @ centroids[n:].T).astype(np.float32)
+    result[:, n:] = block
+    result[n:, :n] = block[:n].T
+
+    incidence = incidence_matrix(all_features, {})
+    shared = (incidence @ incidence[n:].T).toarray() > 0
+    result[:, n:][~shared] = 0.0
+    result[n:, :n][~shared[:n].T] = 0.0
+
+    rows, cols = identical_pairs(all_features)
+    new = (rows >= n) | (cols >= n)
+    result[rows[new], cols[new]] = 1.0
+    np.fill_diagonal(result[n:, n:], 1.0)
+    return result
+
+
+def similarity_matrix(features, dims):
+    """
+    n x n float32 matrix of the w2v similarities between all the sentences
+    """
+    return extend_similarity(np.zeros((0, 0), dtype=np.float32), [],
+                             features, dims)
+
+
+def write_abc(out_f, keys, sim, minsim):
+    """
+    write the upper triangle of sim in mcl abc format, in the same order and
+    with the same formatting as the pair by pair computation: similarities
+    not above minsim are written as 0.0
+    """
+    kept = np.where(sim > minsim, sim, np.float32(0.0)).astype(np.float32)
+    for i in range(len(keys) - 1):
+        values = kept[i, i + 1:].astype(str)
+        prefix = keys[i] + " "
+        out_f.write("".join(prefix + k + " " + v + "\n"
+                            for k, v in zip(keys[i + 1:], values)))
@@ -190,89 +190,123 @@ def bigramSim(b1,b2,wordmodel):
 
     similarity = wordmodel.n_similarity(b1, b2)
     return similarity
-def w2v_words(s1, s2, wordmodel):
-    if s1 == s2:
-        return 1.0
-    cw1 = [w for w in word_tokenize(s1) if w not in stop]
-    cw2 = [w for w in word_tokenize(s2) if w not in stop]
-    intersection = set(cw1) & set(cw2)
-
-    commonwords = len(intersection)
-
-    if commonwords == 0:
-        return 0
-
-    l1 = [word for word in cw1 if word not in intersection]
-    l2 = [word for word in cw2 if word not in intersection]
-
-    if len(l1) > len(l2):
-        l1, l2 = l2, l1
-
+def unit_vectors(wordlists, wordmodel):
+    """
+    ({word: row}, matrix) of the L2 normalized vectors of the words of
+    wordlists known by wordmodel. The last row of the matrix is a null
+    vector used for the unknown words
+    """
+    index = {}
+    for words in wordlists:
+        for w in words:
+            if w not in index and w in wordmodel.vocab:
+                index[w] = len(index)
+    mat = np.zeros((len(index) + 1, wordmodel.vector_size), dtype=np.float32)
+    for w, row in index.items():
+        mat[row] = wordmodel[w]
+    norms = np.sqrt(np.einsum('ij,ij->i', mat, mat))
+    nonnull = norms > 0.0
+    mat[nonnull] /= norms[nonnull, np.newaxis]
+    return index, mat
+
+
+def greedy_alignment(l1, l2, index, mat, unknown_columns):
+    """
+    total score of the greedy alignment of the words of l1 with the words
+    of l2: each word of l1 known by the model in turn takes the most similar
+    remaining word of l2 (the first one in case of tie), if a known word of
+    l2 remains. If unknown_columns, unknown words of l2 are candidates with
+    a similarity of 0
+    """
+    rows1 = np.array([index.get(w, -1) for w in l1], dtype=int)
+    rows2 = np.array([index.get(w, -1) for w in l2], dtype=int)
+    sims = mat[rows1] @ mat[rows2].T
+    known2 = rows2 >= 0
+    free = np.ones(len(l2), dtype=bool)
     totalscore = 0
+    for i in np.flatnonzero(rows1 >= 0):
+        if not (free & known2).any():
+            break
+        candidates = free if unknown_columns else free & known2
+        maxitem = np.argmax(np.where(candidates, sims[i], -np.inf))
+        free[maxitem] = False
+        totalscore += sims[i, maxitem]
+    return totalscore
+
+
+def w2v_words_batch(pairs, wordmodel):
+    """
+    w2v_words scores of a list of (s1, s2) sentence pairs. The word vectors
+    are looked up and normalized once for the whole batch
+    """
+    aligned = []
+    wordlists = []
+    for s1, s2 in pairs:
+        if s1 == s2:
+            aligned.append(1.0)
+            continue
+        cw1 = [w for w in word_tokenize(s1) if w not in stop]
+        cw2 = [w for w in word_tokenize(s2) if w not in stop]
+        intersection = set(cw1) & set(cw2)
+        if len(intersection) == 0:
+            aligned.append(0)
+            continue
+        l1 = [word for word in cw1 if word not in intersection]
+        l2 = [word for word in cw2 if word not in intersection]
+        if len(l1) > len(l2):
+            l1, l2 = l2, l1
+        denum = min(len(s1.split()), len(s2.split()))
+        aligned.append((l1, l2, len(intersection), denum))
+        wordlists += [l1, l2]
+    index, mat = unit_vectors(wordlists, wordmodel)
+    scores = []
+    for item in aligned:
+        if not isinstance(item, tuple):
+            scores.append(item)
+            continue
+        l1, l2, commonwords, denum = item
+        totalscore = greedy_alignment(l1, l2, index, mat, True)
+        scores.append(float(commonwords + totalscore) / denum)
+    return scores
+
 
-    for t1 in l1:
-        sublist = []
-        hasitem = False
-        for i, t2 in enumerate(l2):
-            # check if POS are here
-            #if len(t1.split('/')) > 1:
-            if True:
-                # compare same POS words
-                #if t1.split('/')[1][:2] == t2.split('/')[1][:2]:
-                if True:
-                    if t1 in wordmodel.vocab and t2 in wordmodel.vocab:
-                        sublist.append((i, wordmodel.similarity(t1, t2)))
-                        hasitem = True
-                    # if we don't know one of the words
-                    # consider them as dissimilar
-                    else:
-                        sublist.append((i, 0))
-                else:
-                    sublist.append((i, 0))
-        if hasitem:
-            maxitem, subscore = max(sublist, key=itemgetter(1))
-            l2.pop(maxitem)
-            totalscore += subscore
-
-    num = float(commonwords + totalscore)
-    denum = min(len(s1.split()), len(s2.split()))
-    score = num / denum
-
-
-    return score
+def w2v_words(s1, s2, wordmodel):
+    return w2v_words_batch([(s1, s2)], wordmodel)[0]
 
 #calculate similarity between two bigrams
 #compositional similarity of distributional similarities
 
-def w2v_bg(bg1, bg2, wordmodel):
-    if bg1 == bg2:
-        return 1.0
-    intersection = bg1 & bg2
-    commonwords=len(intersection)
-    l1 = [word for word in bg1 if word not in intersection]
-    l2 = [word for word in bg2 if word not in intersection]
-
-    if len(l1) > len(l2):
-        l1, l2 = l2, l1
+def w2v_bg_batch(pairs, wordmodel):
+    """
+    w2v_bg scores of a list of (bg1, bg2) pairs of word sets
+    """
+    aligned = []
+    wordlists = []
+    for bg1, bg2 in pairs:
+        if bg1 == bg2:
+            aligned.append(1.0)
+            continue
+        intersection = bg1 & bg2
+        l1 = [word for word in bg1 if word not in intersection]
+        l2 = [word for word in bg2 if word not in intersection]
+        if len(l1) > len(l2):
+            l1, l2 = l2, l1
+        aligned.append((l1, l2, len(intersection)))
+        wordlists += [l1, l2]
+    index, mat = unit_vectors(wordlists, wordmodel)
+    scores = []
+    for item in aligned:
+        if not isinstance(item, tuple):
+            scores.append(item)
+            continue
+        l1, l2, commonwords = item
+        totalscore = greedy_alignment(l1, l2, index, mat, False)
+        scores.append(float(commonwords + totalscore) / 2)
+    return scores
 
-    totalscore = 0
 
-    for t1 in l1:
-        sublist = []
-        hasitem = False
-        for i, t2 in enumerate(l2):
-            if t1 in wordmodel.vocab and t2 in wordmodel.vocab:
-                sublist.append((i, wordmodel.similarity(t1, t2)))
-                hasitem = True
-        if hasitem:
-            maxitem, subscore = max(sublist, key=itemgetter(1))
-            l2.pop(maxitem)
-            totalscore += subscore
-
-    num = float(commonwords + totalscore)
-    denum = 2
-    score = num / denum
-    return score
+def w2v_bg(bg1, bg2, wordmodel):
+    return w2v_bg_batch([(bg1, bg2)], wordmodel)[0]
 
 
 
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+# coding: utf8
+"""
+Markov clustering (MCL) of the sentence similarity graphs on scipy.sparse
+matrices, replacing the calls to the mcl program in
+mcl_optimised_with_params.sh.
+
+The graph of a topic is read once and cut at each candidate threshold in
+memory. The clustering kept for the topic is chosen with the rule of the
+shell script: the one with the most clusters of at least two sentences
+whose first (largest) cluster has at most --max-first sentences. It is
+written in the .clus format of mcl: one cluster per line, largest first,
+sentence keys separated by tabs.
+
+At the highest thresholds the graphs are so sparse that MCL mostly finds
+their connected components: the components backend computes them directly
+with a union-find over the edges, merging them in decreasing weight order
+and refusing the merges that would create a cluster larger than
+--max-size (0: no limit).
+
+    sparsemcl.py -i $input/0.7 -o $output -t 0.96 0.97 0.98 0.99
+    sparsemcl.py -b components -i $input/0.7 -o $output
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components
+
+import simabc
+
+
+def graph_matrix(n, rows, cols, weights):
+    """
+    n x n symmetric CSR matrix of the edges with a positive weight
+    """
+    kept = (weights > 0.0) & (rows != cols)
+    graph = sparse.csr_matrix(
+        (weights[kept].astype(np.float64), (rows[kept], cols[kept])),
+        shape=(n, n))
+    return graph.maximum(graph.T).tocsr()
+
+
+def normalize(matrix):
+    """
+    make the columns of the CSC matrix stochastic
+    """
+    sums = np.asarray(matrix.sum(axis=0)).ravel()
+    sums[sums == 0.0] = 1.0
+    return sparse.csc_matrix(matrix.multiply(1.0 / sums[np.newaxis, :]))
+
+
+def prune(matrix, threshold):
+    """
+    remove the entries below threshold of the stochastic CSC matrix, always
+    keeping the largest entry of each column, and normalize again
+    """
+    matrix = sparse.csc_matrix(matrix)
+    columns = np.repeat(np.arange(matrix.shape[1]), np.diff(matrix.indptr))
+    colmax = matrix.max(axis=0).toarray().ravel()
+    matrix.data[matrix.data < np.minimum(threshold, colmax[columns])] = 0.0
+    matrix.eliminate_zeros()
+    return normalize(matrix)
+
+
+def mcl(graph, inflation=2.0, pruning=1e-4, max_iterations=100,
+        tolerance=1e-6):
+    """
+    clusters of the graph, as lists of node indices sorted by decreasing
+    size. As mcl, a loop weighted by the largest weight of its edges (1 for
+    isolated nodes) is added to each node
+    """
+    n = graph.shape[0]
+    if n == 0:
+        return []
+    loops = graph.max(axis=1).toarray().ravel()
+    loops[loops == 0.0] = 1.0
+    matrix = normalize(graph + sparse.diags(loops))
+    for _ in range(max_iterations):
+        previous = matrix
+        matrix = matrix @ matrix
+        matrix = prune(matrix.power(inflation), pruning)
+        if n == 1 or abs(matrix - previous).max() < tolerance:
+            break
+    # each node is attracted by the attractors of its cluster
+    _, labels = connected_components(matrix, directed=False)
+    return sorted_clusters(labels.tolist())
+
+
+def sorted_clusters(labels):
+    """
+    clusters of the nodes given their labels, as returned by mcl()
+    """
+    clusters = {}
+    for node, label in enumerate(labels):
+        clusters.setdefault(label, []).append(node)
+    return sorted(clusters.values(), key=lambda c: (-len(c), c[0]))
+
+
+class UnionFind:
+    """
+    disjoint sets of the nodes 0..n-1
+    self.parent  parent of each node, roots are their own parent
+    self.size    size of the set of each root
+    """
+
+    def __init__(self, n):
+        self.parent = list(range(n))
+        self.size = [1] * n
+
+    def find(self, node):
+        root = node
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[node] != root:
+            self.parent[node], node = root, self.parent[node]
+        return root
+
+    def union(self, a, b, max_size=0):
+        """
+        merge the sets of a and b unless the result would have more than
+        max_size nodes (0: no limit)
+        """
+        a, b = self.find(a), self.find(b)
+        if a == b:
+            return
+        if max_size and self.size[a] + self.size[b] > max_size:
+            return
+        if self.size[a] < self.size[b]:
+            a, b = b, a
+        self.parent[b] = a
+        self.size[a] += self.size[b]
+
+    def labels(self):
+        return [self.find(node) for node in range(len(self.parent))]
+
+
+def components_sweep(n, rows, cols, weights, thresholds, max_size=0,
+                     ordered=False):
+    """
+    [(threshold, clusters)] of the connected components of the graph cut at
+    each threshold. The edges are added in decreasing weight order, so that
+    all the thresholds are computed in a single pass. If ordered, the edges
+    are already sorted by simabc.sort_edges
+    """
+    if not ordered:
+        rows, cols, weights = simabc.sort_edges(rows, cols, weights)
+    rows, cols = rows.tolist(), cols.tolist()
+    sets = UnionFind(n)
+    clusters = {}
+    added = 0
+    for threshold in sorted(set(thresholds), reverse=True):
+        count = np.searchsorted(-weights, -np.float32(threshold),
+                                side='right')
+        for a, b in zip(rows[added:count], cols[added:count]):
+            sets.union(a, b, max_size)
+        added = count
+        clusters[threshold] = sorted_clusters(sets.labels())
+    return [(threshold, clusters[threshold]) for threshold in thresholds]
+
+
+def threshold_sweep(keys, rows, cols, weights, thresholds,
+                    backend="mcl", max_size=0, ordered=False, **mcl_options):
+    """
+    [(threshold, clusters)] for the graph cut at each threshold (edges of
+    weight at least the threshold are kept, compared in float32 so that 0.97
+    keeps a weight of 0.97). With the mcl backend, the clustering of a
+    threshold is reused for the next one when the cut removes no edge. If
+    ordered (simabc.is_sorted), each cut is a prefix of the edges
+    """
+    if backend == "components":
+        return components_sweep(len(keys), rows, cols, weights, thresholds,
+                                max_size, ordered)
+    results = []
+    previous_edges, clusters = None, None
+    for threshold in thresholds:
+        cut = simabc.threshold_edges(rows, cols, weights, threshold, ordered)
+        count = len(cut[2])
+        if count != previous_edges:
+            graph = graph_matrix(len(keys), *cut)
+            clusters = mcl(graph, **mcl_options)
+            previous_edges = count
+        results.append((threshold, clusters))
+    return results
+
+
+def best_clustering(results, max_first):
+    """
+    (threshold, clusters) with the most clusters of at least two members
+    among those whose first cluster has at most max_first members, None if
+    there are none
+    """
+    best, max_nclusters = None, 0
+    for threshold, clusters in results:
+        nclusters = sum(1 for c in clusters if len(c) > 1)
+        first_cluster = len(clusters[0]) if clusters else 0
+        if nclusters > max_nclusters and first_cluster <= max_first:
+            best, max_nclusters = (threshold, clusters), nclusters
+    return best
+
+
+def write_clus(path, keys, clusters):
+    with open(path, "w") as out_f:
+        for cluster in clusters:
+            out_f.write("\t".join(keys[i] for i in cluster) + "\n")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-i", "--input", type=str, required=True,
+                        help="similarity graphs directory (abc text, .npz "
+                        "or sorted .npz files)")
+    parser.add_argument("-o", "--output", type=str, required=True,
+                        help="clusters output directory")
+    parser.add_argument("-t", "--thresholds", type=str, nargs='+',
+                        default=["0.96", "0.97", "0.98", "0.99"],
+                        help="similarity thresholds tried for each topic")
+    parser.add_argument("-f", "--max-first", type=int, default=10,
+                        help="maximum size of the largest cluster")
+    parser.add_argument("-b", "--backend", type=str, default="mcl",
+                        choices=["mcl", "components"],
+                        help="mcl: Markov clustering; components: connected "
+                        "components of the thresholded graph")
+    parser.add_argument("-s", "--max-size", type=int, default=0,
+                        help="components backend: maximum size of a cluster "
+                        "(0: no limit)")
+    parser.add_argument("-I", "--inflation", type=float, default=2.0,
+                        help="mcl inflation")
+    parser.add_argument("-T", "--temp", type=str, default=None,
+                        help="also write the clusters of each threshold in "
+                        "<temp>/<file><threshold>.clus")
+    args = parser.parse_args()
+
+    os.makedirs(args.output, exist_ok=True)
+    if args.temp:
+        os.makedirs(args.temp, exist_ok=True)
+    thresholds = [float(t) for t in args.thresholds]
+    for name in sorted(os.listdir(args.input)):
+        path = os.path.join(args.input, name)
+        if simabc.is_npz(name):
+            name = name[:-len(".npz")]
+        print(name, file=sys.stderr)
+        keys, rows, cols, weights = simabc.read_edges(path)
+        results = threshold_sweep(keys, rows, cols, weights, thresholds,
+                                  args.backend, args.max_size,
+                                  simabc.is_sorted(path),
+                                  inflation=args.inflation)
+        for label, (threshold, clusters) in zip(args.thresholds, results):
+            nclusters = sum(1 for c in clusters if len(c) > 1)
+            print(f"{label}: nclusters {nclusters} first_cluster "
+                  f"{len(clusters[0]) if clusters else 0}", file=sys.stderr)
+            if args.temp:
+                write_clus(os.path.join(args.temp, name + label + ".clus"),
+                           keys, clusters)
+        best = best_clustering(results, args.max_first)
+        if best is None:
+            # no clustering satisfies the rule: keep the last one
+            print(f"No clustering of {name} has a first cluster of at most "
+                  f"{args.max_first} sentences, using threshold "
+                  f"{args.thresholds[-1]}", file=sys.stderr)
+            best = results[-1]
+        print(f"best threshold {best[0]}", file=sys.stderr)
+        write_clus(os.path.join(args.output, name + ".clus"), keys, best[1])
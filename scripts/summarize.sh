@@ -37,7 +37,7 @@ echo "CP DONE !!!!!!!!!!!!!!!!!!!!!"
 # Summarizing
 export HOSTNAME=localhost
 python ${ICSISUMM}/summarizer/inference.py -i ${OUTPUT} -o ${OUTPUT} -t u${TAC_NUMBER} --manpath ${REF} --decoder glpsolve --thresh 0.97 --count 3.0
-rm tmp_decoder.*
+rm -f tmp_decoder.*
 
 # To summarize with RST instead of clustering, use /scratch_global/gael/Maali/github-maali-thesis/RST-based-approach/inference_RST_noclust.py called like in run-icsi-primary-sys-34_mcl08_RST_ONO.sh
 
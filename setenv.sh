@@ -56,7 +56,28 @@ export CLUSTERS=mcl_clusters_optimised_icsi_AB_glove840b
 # ${PWD}/data/embeddings/GoogleNewsWordnet.bin
 # ${PWD}/data/embeddings/glove.840B.300d.bin
 # ${PWD}/data/embeddings/frWac_non_lem_no_postag_no_phrase_200_cbow_cut100.bin
+# or the .npy file of a store converted once with scripts/embeddingstore.py,
+# much faster to load, e.g. ${PWD}/data/embeddings/glove.840B.300d.npy
 
 export EMBEDDINGS=${PWD}/data/embeddings/glove.840B.300d.bin
 ls ${EMBEDDINGS} >& /dev/null
 
+# CLUSTER_BACKEND: "mcl" to run the mcl program, "python" to use the
+# in-process implementation of scripts/sparsemcl.py, "components" for the
+# connected components of the thresholded graphs (compare them with
+# scripts/benchmark_clustering.py)
+export CLUSTER_BACKEND=mcl
+
+# ILP_CACHE: directory of the cache of the ILP solutions of inference.py and
+# preprocess/main.py, so that re-running the chain does not solve the
+# unchanged ILPs again (at most ILP_CACHE_SIZE solutions are kept)
+# export ILP_CACHE=${DATA}/ilp_cache
+
+# MEMO_FILE: file of the stems and tokenized sentences memoized by
+# inference.py and preprocess/main.py, so that the next runs start with them
+# export MEMO_FILE=${DATA}/memo.pickle.gz
+
+# WORKERS: number of processes loading the documents in the preprocessing
+# stage and of topics processed in parallel by the similarity stage
+export WORKERS=${SLURM_CPUS_ON_NODE:-1}
+
@@ -0,0 +1,98 @@
+"""
+concepts of a topic as integer ids and sentence x concept incidence
+matrices (scipy.sparse CSR), for inference.build_concept_matrix and the
+decoder (decoder2.model_from_matrix).
+
+Concepts are interned in a Vocabulary in the order they are first seen,
+documents in another one. The document frequency of the concepts is
+computed on the pairs (document, first sentence or not), numbered
+2 * document + is_first, as the '<first>_' prefixed document names were
+counted.
+"""
+import numpy as np
+from scipy import sparse
+
+
+class Vocabulary:
+    """
+    strings interned as consecutive integer ids
+    self.ids      {string: id}, in the order of the ids
+    self.strings  [string] indexed by id
+    """
+
+    def __init__(self):
+        self.ids = {}
+        self._strings = []
+
+    def intern(self, string):
+        return self.ids.setdefault(string, len(self.ids))
+
+    def intern_all(self, strings):
+        ids = self.ids
+        return [ids.setdefault(string, len(ids)) for string in strings]
+
+    @property
+    def strings(self):
+        if len(self._strings) != len(self.ids):
+            self._strings = list(self.ids)
+        return self._strings
+
+    def __len__(self):
+        return len(self.ids)
+
+
+def incidence(rows, num_rows, num_columns):
+    """
+    num_rows x num_columns boolean CSR matrix, rows[i] lists the columns of
+    row i (duplicates allowed)
+    """
+    lengths = np.array([len(columns) for columns in rows], dtype=np.int64)
+    indptr = np.zeros(num_rows + 1, dtype=np.int64)
+    np.cumsum(lengths, out=indptr[1:len(rows) + 1])
+    indptr[len(rows) + 1:] = indptr[len(rows)]
+    indices = np.fromiter((column for columns in rows for column in columns), dtype=np.int32, count=int(indptr[-1]))
+    matrix = sparse.csr_matrix((np.ones(len(indices), dtype=np.int32), indices, indptr), shape=(num_rows, num_columns))
+    matrix.sum_duplicates()
+    matrix.data[:] = 1
+    return matrix.astype(bool)
+
+
+def document_frequency(matrix, keys, num_keys, contributing):
+    """
+    (number of (document, is_first) pairs, number of first sentence pairs)
+    of each concept, counted on the contributing sentences (boolean array)
+    whose pair is keys (2 * document + is_first)
+    """
+    sentences = np.flatnonzero(contributing)
+    pairs = sparse.csr_matrix((np.ones(len(sentences), dtype=np.int32), (keys[sentences], sentences)),
+                              shape=(num_keys, matrix.shape[0]))
+    found = (pairs @ matrix.astype(np.int32)) > 0
+    count = np.asarray(found.sum(axis=0)).ravel()
+    firsts = np.asarray(found[1::2].sum(axis=0)).ravel()
+    return count, firsts
+
+
+class ConceptMatrix:
+    """
+    final concepts of a topic
+    self.concepts  [concept] sorted, column ids of the matrix
+    self.weights   numpy array of their weights
+    self.matrix    CSR boolean matrix sentences x concepts
+    """
+
+    def __init__(self, concepts, weights, matrix):
+        self.concepts = concepts
+        self.weights = weights
+        self.matrix = matrix
+
+    def weight_dict(self):
+        return dict(zip(self.concepts, self.weights.tolist()))
+
+    def sentence_concepts(self, sentence):
+        matrix = self.matrix
+        return set(self.concepts[column] for column in matrix.indices[matrix.indptr[sentence]:matrix.indptr[sentence + 1]])
+
+    def set_sentence_concepts(self, sents):
+        # the string sets used by create_ilp_output
+        for sentence, sent in enumerate(sents):
+            sent.concepts = self.sentence_concepts(sentence)
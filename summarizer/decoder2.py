@@ -1,9 +1,184 @@
 import sys, os
-import ilp, ilp_to_localsolver
+import ilp, presolve, decoder_greedy, localsearch
 
-def decode(max_length, sentence_length_file, concepts_in_sentence_file, concept_weight_file, sentence_group_file=None, dependency_file=None, atleast=None, clusters_file=None,clweight=None ,command="glpsol"):
-    solver = ilp.IntegerLinearProgram(debug=1, tmp = "tmp_decoder.%d.%s.%s" % (os.getpid(), os.getenv("USER"), os.getenv("HOSTNAME")), command=command)
-    #solver = ilp_to_localsolver.IntegerLinearProgram(debug=1, tmp = concept_weight_file, time_limit=1)
+def build_program(solver, concept_weights, sentence_concepts, index, lengths, max_length, groups=None, depends=None, atleast=None, bonus=None):
+    """
+    fill solver with the summarization ILP. Concepts and sentences are integer ids:
+    concept_weights {concept: weight}, sentence_concepts {sentence: concepts} for the
+    sentences having concepts, index {concept: [sentences]}, lengths [length of each sentence].
+    groups lists the group key of each sentence ('' for none), depends the ids of the
+    sentences each sentence depends on, atleast True for the sentences of which at least
+    one must be selected. bonus {sentence: weight} is added to the objective coefficient
+    of the sentences (concepts folded by presolve)
+    """
+    # build objective
+    for concept, weight in concept_weights.items():
+        if concept not in index: continue # skip unused concepts
+        solver.add_binary("c%d" % concept, concept)
+        solver.add_objective(["c%d" % concept], [weight])
+
+    # sentence => concepts
+    for sentence, concepts in sentence_concepts.items():
+        solver.add_binary("s%d" % sentence, sentence)
+
+    # concept => sentence
+    for concept in index:
+        name = solver.constraint_name("index")
+        solver.add_constraint(name, ["s%d" % x for x in index[concept]], 1, ">=", 0)
+        solver.add_constraint(name, ["c%d" % concept], -1)
+
+    if groups != None:
+        members = {}
+        for sentence, group in enumerate(groups):
+            if sentence in sentence_concepts and group != '':
+                if group not in members:
+                    members[group] = []
+                members[group].append(sentence)
+        for group in members:
+            solver.add_constraint(solver.constraint_name("group"), ["s%d" % x for x in members[group]], 1, "<=", 1)
+
+    if depends != None:
+        for sentence, ids in enumerate(depends):
+            if sentence in sentence_concepts:
+                for id in ids:
+                    if "s%d" % id not in solver.binary:
+                        solver.add_constraint(solver.constraint_name("depend"), ["s%d" % sentence], 1, "=", 0)
+                    else:
+                        name = solver.constraint_name("depend")
+                        solver.add_constraint(name, ["s%d" % id], 1, ">=", 0)
+                        solver.add_constraint(name, ["s%d" % sentence], -1)
+
+    selected = [sentence for sentence in range(len(lengths)) if sentence in sentence_concepts]
+    solver.add_objective(["s%d" % sentence for sentence in selected], [-lengths[sentence] / 1000.0 for sentence in selected])
+    if bonus:
+        solver.add_objective(["s%d" % sentence for sentence in bonus], list(bonus.values()))
+    solver.add_constraint(solver.constraint_name("length"), ["s%d" % sentence for sentence in selected], [lengths[sentence] for sentence in selected], "<=", max_length)
+
+    if atleast != None:
+        at_least = []
+        for sentence, value in enumerate(atleast):
+            if sentence in sentence_concepts and value:
+                at_least.append("s%d" % sentence)
+        if len(at_least) > 0:
+            solver.add_constraint(solver.constraint_name("at_least"), at_least, 1, ">=", 1) # select at least one of those
+
+    sys.stderr.write("ilp: %d sentences, %d concepts\n" % (len(sentence_concepts), len(index)))
+
+
+def solve(solver, sentence_concepts, index):
+    """
+    run solver and return the ids of the selected sentences
+    """
+    if len(sentence_concepts) > 0 and len(index) > 0:
+        solver.run()
+    output = []
+    for variable in solver.output:
+        if variable.startswith("s") and solver.output[variable] == 1:
+            output.append(int(variable[1:]))
+    return output
+
+
+def fixed_sentences(groups=None, depends=None, atleast=None):
+    """
+    sentences in group, dependency or at least constraints, kept by presolve
+    """
+    fixed = set()
+    if groups != None:
+        fixed.update(sentence for sentence, group in enumerate(groups) if group != '')
+    if depends != None:
+        for sentence, ids in enumerate(depends):
+            if len(ids) > 0:
+                fixed.add(sentence)
+                fixed.update(ids)
+    if atleast != None:
+        fixed.update(sentence for sentence, value in enumerate(atleast) if value)
+    return fixed
+
+
+def add_objective_cut(solver, value):
+    # constrain the objective to be at least value, minus a tolerance covering
+    # the rounding of the coefficients in the cpxlp text
+    names = [solver.variable_names[index] for index in solver.objective_terms]
+    coefficients = list(solver.objective_terms.values())
+    solver.add_constraint("incumbent", names, coefficients, ">=", value - 1e-5 * (1.0 + sum(abs(x) for x in coefficients)))
+
+
+def decode_program(solver, concept_weights, sentence_concepts, index, lengths, max_length, groups=None, depends=None, atleast=None, presolved=False, method="ilp", warm_start=False):
+    """
+    build and solve the program, return the ids of the selected sentences. With presolved,
+    the program is first reduced by presolve.presolve; with presolved="check" the full
+    program is also solved and a warning is written if the optima differ.
+    method "greedy" or "lagrangian" selects the sentences with decoder_greedy, "local" with
+    localsearch.LocalSearch (for solver.time_limit seconds) instead of the solver. With
+    warm_start, the greedy summary constrains the objective of the ILP and is kept if the
+    solver does not find a summary at least as good (time limit)
+    """
+    if method == "local":
+        search = localsearch.LocalSearch(concept_weights, sentence_concepts, lengths, max_length, groups, depends, atleast, length_weight=1 / 1000.0)
+        output = search.run(time_limit=solver.time_limit)
+        sys.stderr.write(search.report() + "\n")
+        return output
+    if method != "ilp":
+        return decoder_greedy.decode(max_length, concept_weights, sentence_concepts, lengths, groups, depends, atleast, lagrangian=method == "lagrangian", time_limit=solver.time_limit)
+
+    incumbent = None
+    if warm_start:
+        model = decoder_greedy.Model(concept_weights, sentence_concepts, lengths, max_length, groups, depends, atleast)
+        incumbent, value, bound = decoder_greedy.decode_model(model, time_limit=solver.time_limit)
+        if not model.feasible(incumbent):
+            incumbent = None
+        else:
+            sys.stderr.write("warm start: value %g, upper bound %g\n" % (value, bound))
+
+    if not presolved:
+        build_program(solver, concept_weights, sentence_concepts, index, lengths, max_length, groups, depends, atleast)
+        if incumbent is not None: add_objective_cut(solver, value)
+        output = solve(solver, sentence_concepts, index)
+    else:
+        reduction = presolve.presolve(concept_weights, sentence_concepts, lengths, fixed_sentences(groups, depends, atleast))
+        sys.stderr.write(reduction.report() + "\n")
+        build_program(solver, reduction.concept_weights, reduction.sentence_concepts, reduction.index, lengths, max_length, groups, depends, atleast, reduction.bonus)
+        # the presolved objective has the same value for the same summary
+        if incumbent is not None: add_objective_cut(solver, value)
+        # the reduced program may have no concept left but still needs solving
+        # (folded concepts, at least constraint)
+        output = solve(solver, sentence_concepts, index) if reduction.sentence_concepts else []
+        if presolved == "check":
+            full = new_solver(solver.command, solver.backend, solver.time_limit, os.path.dirname(solver.tmp))
+            build_program(full, concept_weights, sentence_concepts, index, lengths, max_length, groups, depends, atleast)
+            reference = solve(full, sentence_concepts, index)
+            if not presolve.same_optimum(output, reference, concept_weights, sentence_concepts, lengths, 1 / 1000.0):
+                sys.stderr.write("WARNING: presolve changed the optimum: %g instead of %g\n" % (
+                    presolve.objective(output, concept_weights, sentence_concepts, lengths, 1 / 1000.0),
+                    presolve.objective(reference, concept_weights, sentence_concepts, lengths, 1 / 1000.0)))
+
+    if incumbent is not None and presolve.objective(output, concept_weights, sentence_concepts, lengths, 1 / 1000.0) < value - 1e-6 * max(1.0, abs(value)):
+        sys.stderr.write("WARNING: the solver found no better summary, using the greedy one\n")
+        output = incumbent
+    return output
+
+
+def new_solver(command, backend="glpsol", time_limit=100, tmp_dir=None):
+    """
+    solver whose glpsol files are written in tmp_dir, or in the working directory with
+    the process id in their name
+    """
+    tmp = "tmp_decoder.%d.%s.%s" % (os.getpid(), os.getenv("USER"), os.getenv("HOSTNAME"))
+    if tmp_dir:
+        tmp = os.path.join(tmp_dir, "tmp_decoder")
+    return ilp.IntegerLinearProgram(debug=1, tmp = tmp, command=command, backend=backend, time_limit=time_limit)
+
+
+def default_time_limit(method):
+    # seconds, the local search gets the one second the LocalSolver program had
+    return 1 if method == "local" else 100
+
+
+def read_model(sentence_length_file, concepts_in_sentence_file, concept_weight_file, sentence_group_file=None, dependency_file=None, atleast=None):
+    """
+    arguments of build_program (concept_weights, sentence_concepts, index, lengths, groups,
+    depends, atleast) read from the files written by inference.create_ilp_output
+    """
     concept_id = {}
     concept = 0
     concept_weights = {}
@@ -38,94 +213,105 @@ def decode(max_length, sentence_length_file, concepts_in_sentence_file, concept_
             sentence_concepts[sentence] = mapped_concepts
         sentence += 1
 
-    # build objective
-    objective = []
-    #clweight=100
-    for concept, weight in concept_weights.items():
-        if concept not in index: continue # skip unused concepts
-        objective.append("%+g c%d" % (weight, concept))
-        solver.binary["c%d" % concept] = concept
-    solver.objective["score"] = " ".join(objective)
+    lengths = [int(line.strip()) for line in open(sentence_length_file)]
+    groups = None
+    if sentence_group_file != None:
+        groups = [line.rstrip('\n') for line in open(sentence_group_file)]
+    depends = None
+    if dependency_file != None:
+        depends = [[int(id) for id in line.strip().split()] for line in open(dependency_file)]
+    at_least = None
+    if atleast != None:
+        at_least = [line.strip() == "1" for line in open(atleast)]
+    return concept_weights, sentence_concepts, index, lengths, groups, depends, at_least
 
-    # sentence => concepts
-    for sentence, concepts in sentence_concepts.items():
-        solver.binary["s%d" % sentence] = sentence
-    #    for concept in concepts:
-    #        solver.constraints["sent_%d" % len(solver.constraints)] = "s%d - c%d <= 0" % (sentence, concept)
 
-    # concept => sentence
-    for concept in index:
-        solver.constraints["index_%d" % len(solver.constraints)] = " + ".join(["s%d" % x for x in index[concept]]) + " - c%d >= 0" % concept
+def model_in_memory(sents, concepts):
+    """
+    same as read_model, from the sentences (with their concepts, length, groups, depends and
+    atleast attributes) and the {concept: weight} dictionary instead of the files written
+    by inference.create_ilp_output
+    """
+    concept_id = {}
+    concept_weights = {}
+    # numbered in sorted order as in the .concepts file, so that the program does
+    # not depend on the order of the dictionary (e.g. for the solution cache)
+    for concept in sorted(concepts):
+        concept_id[concept] = len(concept_id)
+        # rounded as written in the .concepts file
+        concept_weights[concept_id[concept]] = round(concepts[concept], 7)
 
-    if sentence_group_file != None:
-        groups = {}
-        sentence = 0
-        for line in open(sentence_group_file):
-            if sentence in sentence_concepts:
-                if line != '\n':
-                    if line not in groups:
-                        groups[line] = []
-                    groups[line].append(sentence)
-            sentence += 1
-        for group in groups:
-            solver.constraints["group_%d" % len(solver.constraints)] = " + ".join(["s%d" % x for x in groups[group]]) + " <= 1"
+    index = {}
+    sentence_concepts = {}
+    for sentence, sent in enumerate(sents):
+        mapped_concepts = {}
+        for concept in sent.concepts:
+            if concept not in concept_id:
+                sys.stderr.write('ERROR: not weight for concept \"%s\", sentence %d\n' % (concept, sentence))
+                sys.exit(1)
+            id = concept_id[concept]
+            if id not in index: index[id] = []
+            index[id].append(sentence)
+            mapped_concepts[id] = True
+        if len(mapped_concepts) > 0:
+            sentence_concepts[sentence] = mapped_concepts
 
+    return (concept_weights, sentence_concepts, index) + sentence_constraints(sents)
 
-    #print clusters
-        #for cluster in clusters.keys():
-        #    solver.constraints["cluster_%d" % len(solver.constraints)] = " + ".join(["s%d" % x for x in clusters[cluster]]) + " <= 1"
 
-    print("========================================================")
-    #print solver.constraints
-    if dependency_file != None:
-        groups = {}
-        sentence = 0
-        for line in open(dependency_file):
-            if sentence in sentence_concepts:
-                if line != '\n':
-                    for id in line.strip().split():
-                        id = int(id)
-                        if "s%d" % id not in solver.binary:
-                            solver.constraints["depend_%d" % len(solver.constraints)] = "s%d = 0" % (sentence)
-                        else:
-                            solver.constraints["depend_%d" % len(solver.constraints)] = "s%d - s%d >= 0" % (id, sentence)
-            sentence += 1
-
-    length_constraint = []
-    sentence = 0
-    for line in open(sentence_length_file):
-        if sentence in sentence_concepts:
-            length = line.strip()
-            length_constraint.append("%s s%d" % (length, sentence))
-            solver.objective["score"] += " - %g s%d" % (float(length) / 1000.0, sentence)
-        sentence += 1
+def model_from_matrix(sents, concept_matrix):
+    """
+    same as model_in_memory, with the concepts of the sentences given by the rows of
+    concept_matrix (a conceptmatrix.ConceptMatrix) instead of their concepts attribute
+    """
+    matrix = concept_matrix.matrix
+    # rounded as written in the .concepts file
+    concept_weights = dict(enumerate(round(weight, 7) for weight in concept_matrix.weights.tolist()))
+    sentence_concepts = {}
+    for sentence in range(matrix.shape[0]):
+        concepts = matrix.indices[matrix.indptr[sentence]:matrix.indptr[sentence + 1]].tolist()
+        if len(concepts) > 0:
+            sentence_concepts[sentence] = dict.fromkeys(concepts, True)
+    # concepts in the order they first appear, as read_model numbers their constraints
+    index = {}
+    for sentence, concepts in sentence_concepts.items():
+        for concept in concepts:
+            if concept not in index: index[concept] = []
+            index[concept].append(sentence)
+    return (concept_weights, sentence_concepts, index) + sentence_constraints(sents)
 
-    solver.constraints["length_%d" % len(solver.constraints)] = " + ".join(length_constraint) + " <= " + str(max_length)
 
-    if atleast != None:
-        at_least = []
-        sentence = 0
-        for line in open(atleast):
-            line = line.strip()
-            if sentence in sentence_concepts:
-                if line == "1":
-                    at_least.append("s%d" % sentence)
-            sentence += 1
-        if len(at_least) > 0:
-            solver.constraints["at_least_%d" % len(solver.constraints)] = " + ".join(at_least) + " >= 1" # select at least one of those
+def sentence_constraints(sents):
+    # (lengths, groups, depends, atleast) of the sentences for build_program
+    lengths = [sent.length for sent in sents]
+    groups = [' '.join([str(x) for x in sent.groups]) for sent in sents]
+    depends = [[int(x) for x in sent.depends] for sent in sents]
+    at_least = [str(sent.atleast).strip() == "1" for sent in sents]
+    return lengths, groups, depends, at_least
 
-    sys.stderr.write("ilp: %d sentences, %d concepts\n" % (len(sentence_concepts), len(index)))
-    print("*************** CONSTRAINTS ***************")
-    for constraint in solver.constraints.keys():
-        print(solver.constraints[constraint])
-    print(solver.constraints)
-    if len(sentence_concepts) > 0 and len(index) > 0:
-        solver.run()
-    output = []
-    for variable in solver.output:
-        if variable.startswith("s") and solver.output[variable] == 1:
-            output.append(int(variable[1:]))
-    return output
+
+def decode(max_length, sentence_length_file, concepts_in_sentence_file, concept_weight_file, sentence_group_file=None, dependency_file=None, atleast=None, clusters_file=None,clweight=None ,command="glpsol", backend="glpsol", presolved=False, method="ilp", warm_start=False, time_limit=None, tmp_dir=None):
+    if time_limit is None:
+        time_limit = default_time_limit(method)
+    solver = new_solver(command, backend, time_limit, tmp_dir)
+    concept_weights, sentence_concepts, index, lengths, groups, depends, at_least = read_model(sentence_length_file, concepts_in_sentence_file, concept_weight_file, sentence_group_file, dependency_file, atleast)
+    return decode_program(solver, concept_weights, sentence_concepts, index, lengths, max_length, groups, depends, at_least, presolved, method, warm_start)
+
+
+def decode_in_memory(sents, concepts, max_length, command="glpsol", backend="glpsol", presolved=False, method="ilp", warm_start=False, time_limit=None, tmp_dir=None):
+    """
+    same as decode, with the model of model_in_memory, or of model_from_matrix if concepts
+    is a conceptmatrix.ConceptMatrix instead of the {concept: weight} dictionary
+    """
+    if time_limit is None:
+        time_limit = default_time_limit(method)
+    solver = new_solver(command, backend, time_limit, tmp_dir)
+    if isinstance(concepts, dict):
+        model = model_in_memory(sents, concepts)
+    else:
+        model = model_from_matrix(sents, concepts)
+    concept_weights, sentence_concepts, index, lengths, groups, depends, at_least = model
+    return decode_program(solver, concept_weights, sentence_concepts, index, lengths, max_length, groups, depends, at_least, presolved, method, warm_start)
 
 if __name__ == '__main__':
     if len(sys.argv) < 5 or len(sys.argv) > 8:
@@ -0,0 +1,350 @@
+"""
+approximate decoder for the concept coverage model of decoder2, for inputs too
+large for the exact ILP to be solved within its time limit.
+
+The summary is built by a cost-effectiveness greedy (the sentence, with the
+sentences it depends on, adding the most uncovered concept weight per word),
+started from each of the best single sentences (partial enumeration). With
+lagrangian, the coverage constraints are relaxed with multipliers optimized
+by subgradient descent: each relaxed problem gives an upper bound on the
+optimum and its solution is repaired into another greedy start.
+
+The returned value is always reported with an upper bound on the optimum,
+which gives the optimality gap of the summary.
+"""
+import sys, time, heapq, itertools
+import localsearch
+
+
+class Model:
+    """
+    coverage model of decoder2.build_program, with its arguments. Concepts of
+    non-positive weight, never covered by the ILP, are left out, as well as
+    the sentences depending on sentences without concepts (forced to 0)
+    self.weights     {concept: weight} of the positive concepts of the candidates
+    self.concepts    {sentence: [positive concepts]} of the candidate sentences
+    self.lengths     length of each sentence
+    self.max_length  length budget
+    self.group       {sentence: group} of the candidates in a group
+    self.requires    {sentence: sentences it depends on, directly or not}
+    self.atleast     candidates of which at least one must be selected
+    self.sentences   sorted candidates
+    """
+
+    def __init__(self, concept_weights, sentence_concepts, lengths, max_length, groups=None, depends=None, atleast=None):
+        self.weights = dict((concept, weight) for concept, weight in concept_weights.items() if weight > 0)
+        self.lengths = lengths
+        self.max_length = max_length
+        self.requires, forbidden = localsearch.requirements(sentence_concepts, depends)
+        self.sentences = sorted(sentence for sentence in sentence_concepts if sentence not in forbidden)
+        self.concepts = dict((sentence, [concept for concept in sentence_concepts[sentence] if concept in self.weights]) for sentence in self.sentences)
+        used = set(concept for concepts in self.concepts.values() for concept in concepts)
+        self.weights = dict((concept, weight) for concept, weight in self.weights.items() if concept in used)
+        self.group = {}
+        if groups != None:
+            for sentence in self.sentences:
+                if groups[sentence] != '':
+                    self.group[sentence] = groups[sentence]
+        self.atleast = set()
+        if atleast != None:
+            self.atleast = set(sentence for sentence in self.sentences if atleast[sentence])
+
+    def bundle(self, sentence):
+        # the sentence and all the sentences it depends on
+        return set([sentence]) | self.requires.get(sentence, set())
+
+    def value(self, selection):
+        # objective of decoder2: covered concept weights minus 1/1000 per word
+        covered = set()
+        for sentence in selection:
+            covered.update(self.concepts[sentence])
+        return sum(self.weights[concept] for concept in covered) - sum(self.lengths[sentence] for sentence in selection) / 1000.0
+
+    def feasible(self, selection):
+        if sum(self.lengths[sentence] for sentence in selection) > self.max_length:
+            return False
+        groups = [self.group[sentence] for sentence in selection if sentence in self.group]
+        if len(groups) != len(set(groups)):
+            return False
+        if any(not self.requires.get(sentence, set()) <= set(selection) for sentence in selection):
+            return False
+        return not self.atleast or bool(self.atleast & set(selection))
+
+
+class Selection:
+    """
+    selected sentences with incremental bookkeeping
+    self.selected  set of the selected sentences
+    self.count     {concept: number of selected sentences containing it}
+    self.length    total length
+    self.value     objective value (Model.value)
+    self.groups    groups of the selected sentences
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.selected = set()
+        self.count = {}
+        self.length = 0
+        self.value = 0.0
+        self.groups = set()
+
+    def add(self, sentence):
+        model = self.model
+        self.selected.add(sentence)
+        for concept in model.concepts[sentence]:
+            if self.count.get(concept, 0) == 0:
+                self.value += model.weights[concept]
+            self.count[concept] = self.count.get(concept, 0) + 1
+        self.length += model.lengths[sentence]
+        self.value -= model.lengths[sentence] / 1000.0
+        if sentence in model.group:
+            self.groups.add(model.group[sentence])
+
+    def remove(self, sentence):
+        model = self.model
+        self.selected.remove(sentence)
+        for concept in model.concepts[sentence]:
+            self.count[concept] -= 1
+            if self.count[concept] == 0:
+                self.value -= model.weights[concept]
+        self.length -= model.lengths[sentence]
+        self.value += model.lengths[sentence] / 1000.0
+        if sentence in model.group:
+            self.groups.discard(model.group[sentence])
+
+    def gain(self, sentence):
+        # value change if the sentence alone is added
+        gain = -self.model.lengths[sentence] / 1000.0
+        for concept in self.model.concepts[sentence]:
+            if self.count.get(concept, 0) == 0:
+                gain += self.model.weights[concept]
+        return gain
+
+    def removal_gain(self, sentence):
+        # value change if the sentence is removed
+        gain = self.model.lengths[sentence] / 1000.0
+        for concept in self.model.concepts[sentence]:
+            if self.count[concept] == 1:
+                gain -= self.model.weights[concept]
+        return gain
+
+    def bundle_gain(self, sentence):
+        """
+        (sentences to add, their length, value change) to add the sentence and
+        its dependencies, None if they do not fit
+        """
+        model = self.model
+        new = model.bundle(sentence) - self.selected
+        length = sum(model.lengths[id] for id in new)
+        if self.length + length > model.max_length:
+            return None
+        groups = [model.group[id] for id in new if id in model.group]
+        if len(groups) != len(set(groups)) or self.groups.intersection(groups):
+            return None
+        covered = set()
+        for id in new:
+            covered.update(concept for concept in model.concepts[id] if self.count.get(concept, 0) == 0)
+        return new, length, sum(model.weights[concept] for concept in covered) - length / 1000.0
+
+    def add_bundle(self, sentence):
+        bundle = self.bundle_gain(sentence)
+        if bundle is None:
+            return False
+        for id in sorted(bundle[0]):
+            self.add(id)
+        return True
+
+
+def ratio(gain, length):
+    # gain per word, zero length sentences count as one word
+    return gain / max(length, 1)
+
+
+def greedy(model, seed=()):
+    """
+    Selection built by adding the seed bundles then the most cost-effective
+    bundles while they improve the value, None if the seed does not fit
+    """
+    selection = Selection(model)
+    for sentence in seed:
+        if sentence not in selection.selected and not selection.add_bundle(sentence):
+            return None
+    # the gains of the sentences without dependencies only decrease: lazy evaluation
+    heap = []
+    dependent = []
+    for sentence in model.sentences:
+        if sentence in selection.selected: continue
+        if sentence in model.requires:
+            dependent.append(sentence)
+        else:
+            heap.append((-ratio(selection.gain(sentence), model.lengths[sentence]), sentence))
+    heapq.heapify(heap)
+    while True:
+        best = None
+        while heap:
+            bound, sentence = heapq.heappop(heap)
+            if sentence in selection.selected: continue
+            bundle = selection.bundle_gain(sentence)
+            if bundle is None: continue # never fits again
+            current = ratio(bundle[2], bundle[1])
+            if not heap or current >= -heap[0][0]:
+                best = (current, sentence, bundle)
+                break
+            heapq.heappush(heap, (-current, sentence))
+        for sentence in dependent:
+            if sentence in selection.selected: continue
+            bundle = selection.bundle_gain(sentence)
+            if bundle is not None and (best is None or ratio(bundle[2], bundle[1]) > best[0]):
+                if best is not None and best[1] not in model.requires:
+                    heapq.heappush(heap, (-best[0], best[1]))
+                best = (ratio(bundle[2], bundle[1]), sentence, bundle)
+        if best is None or best[2][2] <= 0:
+            if best is not None and best[1] not in model.requires:
+                heapq.heappush(heap, (-best[0], best[1]))
+            break
+        for id in sorted(best[2][0]):
+            selection.add(id)
+    return selection
+
+
+def fractional_knapsack(profits, lengths, capacity):
+    """
+    {item: fraction} maximizing the profit of the items with a positive profit
+    within the capacity, and that profit. The items of length zero come first
+    (infinite ratio), then by decreasing profit per word, so that the first
+    item which does not fit ends the filling
+    """
+    def order(item):
+        if lengths[item] <= 0:
+            return (0, 0.0, item)
+        return (1, -float(profits[item]) / lengths[item], item)
+    items = sorted((item for item in profits if profits[item] > 0), key=order)
+    x, total, left = {}, 0.0, capacity
+    for item in items:
+        if lengths[item] <= left:
+            x[item] = 1.0
+            left -= lengths[item]
+            total += profits[item]
+        else:
+            if left > 0:
+                x[item] = float(left) / lengths[item]
+                total += profits[item] * x[item]
+            break
+    return x, total
+
+
+def lagrangian_bound(model, multipliers):
+    """
+    (upper bound, fractional solution) of the relaxation of the coverage
+    constraints with the multipliers {concept: u}, 0 <= u <= weight. Group,
+    dependency and at least constraints are dropped, which keeps the bound
+    """
+    profits = {}
+    for sentence in model.sentences:
+        profits[sentence] = sum(multipliers[concept] for concept in model.concepts[sentence]) - model.lengths[sentence] / 1000.0
+    x, total = fractional_knapsack(profits, model.lengths, model.max_length)
+    return total + sum(model.weights[concept] - multipliers[concept] for concept in model.weights), x
+
+
+def selection_bound(model, selection):
+    """
+    upper bound given a selection S: coverage being submodular, a summary T
+    covers at most the concepts of S plus the marginal coverage of each of
+    its sentences with respect to S
+    """
+    profits = {}
+    for sentence in model.sentences:
+        profits[sentence] = selection.gain(sentence)
+    return selection.value + sum(model.lengths[sentence] for sentence in selection.selected) / 1000.0 + fractional_knapsack(profits, model.lengths, model.max_length)[1]
+
+
+def decode_model(model, lagrangian=False, seeds=50, depth=1, iterations=200, time_limit=100):
+    """
+    (best selection, its value, upper bound on the optimum). The seeds best
+    single bundles (those with an at least sentence if there are some) are
+    enumerated by subsets of depth sentences
+    """
+    start = time.time()
+    best = [None]
+    def consider(selection):
+        if selection is None or not model.feasible(selection.selected): return
+        if best[0] is None or selection.value > best[0].value + 1e-12:
+            best[0] = selection
+
+    candidates = sorted(model.atleast) if model.atleast else model.sentences
+    empty = Selection(model)
+    singles = []
+    for sentence in candidates:
+        bundle = empty.bundle_gain(sentence)
+        if bundle is not None:
+            singles.append((-bundle[2], sentence))
+    singles = [sentence for gain, sentence in sorted(singles)[:seeds]]
+    if not model.atleast:
+        consider(greedy(model))
+    for size in range(1, depth + 1):
+        for seed in itertools.combinations(singles, size):
+            consider(greedy(model, seed))
+            if time.time() - start > time_limit: break
+
+    # upper bound: the weight of a concept is split among its sentences
+    index = {}
+    for sentence in model.sentences:
+        for concept in model.concepts[sentence]:
+            index[concept] = index.get(concept, 0) + 1
+    multipliers = dict((concept, model.weights[concept] / index.get(concept, 1)) for concept in model.weights)
+    relaxed, x = lagrangian_bound(model, multipliers)
+    bound = relaxed
+    if best[0] is not None:
+        bound = min(bound, selection_bound(model, best[0]))
+    if lagrangian:
+        step, stalled = 1.0, 0
+        for iteration in range(iterations):
+            if time.time() - start > time_limit: break
+            # repair the integral part of the relaxed solution
+            selection = Selection(model)
+            for sentence in sorted(x):
+                if x[sentence] == 1.0:
+                    selection.add_bundle(sentence)
+            previous = best[0]
+            consider(greedy(model, sorted(selection.selected)))
+            if best[0] is not previous:
+                bound = min(bound, selection_bound(model, best[0]))
+            lower = best[0].value if best[0] is not None else 0.0
+            if bound - lower <= 1e-9 * max(1.0, abs(bound)): break
+            coverage = {}
+            for sentence, fraction in x.items():
+                for concept in model.concepts[sentence]:
+                    coverage[concept] = coverage.get(concept, 0.0) + fraction
+            gradient = dict((concept, coverage.get(concept, 0.0) - 1.0) for concept in model.weights)
+            norm = sum(g * g for g in gradient.values())
+            if norm == 0: break
+            t = step * (relaxed - lower) / norm
+            for concept, g in gradient.items():
+                multipliers[concept] = min(model.weights[concept], max(0.0, multipliers[concept] - t * g))
+            current, x = lagrangian_bound(model, multipliers)
+            if current < relaxed - 1e-9:
+                stalled = 0
+            else:
+                stalled += 1
+                if stalled >= 5:
+                    step, stalled = step / 2, 0
+            relaxed = current
+            bound = min(bound, relaxed)
+    if best[0] is None:
+        return [], 0.0, bound
+    return sorted(best[0].selected), best[0].value, bound
+
+
+def decode(max_length, concept_weights, sentence_concepts, lengths, groups=None, depends=None, atleast=None, lagrangian=False, time_limit=100):
+    """
+    ids of the selected sentences, for the arguments of decoder2.build_program
+    """
+    model = Model(concept_weights, sentence_concepts, lengths, max_length, groups, depends, atleast)
+    selection, value, bound = decode_model(model, lagrangian, time_limit=time_limit)
+    if model.atleast and not selection:
+        sys.stderr.write("WARNING: no summary satisfies the at least constraint\n")
+    gap = (bound - value) / max(abs(bound), 1e-9) if bound > value else 0.0
+    sys.stderr.write("%s: %d sentences, value %g, upper bound %g, gap %.2f%%\n" % (
+        "lagrangian" if lagrangian else "greedy", len(selection), value, bound, 100 * gap))
+    return selection
@@ -3,30 +3,62 @@ import os,sys
 import argparse
 import shutil
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'scripts'))
+import simabc
+
 parser = argparse.ArgumentParser()
-parser.add_argument("-i", "--input", type=str, default=None, help="similarities files directory")
-parser.add_argument("-m", "--minsim", type=float, default=0.0, help="minimum similarity value under which similarity is considered as null")
+parser.add_argument("-i", "--input", type=str, default=None, help="similarities files directory (abc text or .npz files)")
+parser.add_argument("-m", "--minsim", type=str, nargs='+', default=["0.0"], help="minimum similarity values under which similarity is considered as null. With several values, the files filtered at each value are written in <output>/<value>, reading each input file once")
 parser.add_argument("-o", "--output", type=str, help="output directory")
+parser.add_argument("-s", "--sorted", action="store_true", help="instead of filtered copies, write for each input file a <name>.npz file with its edges sorted by decreasing weight, that can be cut at any threshold (simabc.cut_edges)")
 args = parser.parse_args()
 
 if os.path.exists(args.output):
     shutil.rmtree(args.output)
 os.mkdir(args.output)
 
+# output directory of each threshold
+outdirs = {}
+if args.sorted:
+    pass
+elif len(args.minsim) == 1:
+    outdirs[args.minsim[0]] = args.output
+else:
+    for minsim in args.minsim:
+        outdirs[minsim] = os.path.join(args.output, minsim)
+        os.mkdir(outdirs[minsim])
+thresholds = [(float(minsim), outdir) for minsim, outdir in outdirs.items()]
+
 print("starting")
 files = [os.path.join(args.input,o) for o in os.listdir(args.input)]
 for file in files:
+    filename=os.path.basename(file)
+    if simabc.is_npz(file):
+        filename = filename[:-len(".npz")]
+    if args.sorted:
+        keys, rows, cols, weights = simabc.read_edges(file)
+        rows, cols, weights = simabc.sort_edges(rows, cols, weights)
+        simabc.write_npz(os.path.join(args.output, filename + ".npz"), keys, rows, cols, weights, ordered=True)
+        continue
+    if simabc.is_npz(file):
+        # binary graphs are written back as sparse abc text for mcl
+        keys, rows, cols, weights = simabc.read_edges(file)
+        ordered = simabc.is_sorted(file)
+        for minsim, outdir in thresholds:
+            with open(os.path.join(outdir, filename), "w") as outfile:
+                simabc.write_sparse(outfile, keys, *simabc.threshold_edges(rows, cols, weights, minsim, ordered))
+        continue
+    outfiles = [(minsim, open(os.path.join(outdir, filename), "w")) for minsim, outdir in thresholds]
     with open(file,"r") as infile:
-        filename=os.path.basename(file)
-        outputfile=os.path.join(args.output,filename)
-        lines=infile.read().splitlines()
-        with open(outputfile,"w") as outfile:
-            for line in lines:
-                splittedline=line.split()
-                sim=float(splittedline[2])
-                if sim < args.minsim:
+        for line in infile:
+            splittedline=line.split()
+            sim=float(splittedline[2])
+            for minsim, outfile in outfiles:
+                if sim < minsim:
                     newline=splittedline[0]+" "+splittedline[1]+" 0.0\n"
                 else:
-                    newline=line+"\n"
+                    newline=line.rstrip("\r\n")+"\n"
                 outfile.write(newline)
+    for minsim, outfile in outfiles:
+        outfile.close()
 print("file has been filtered")
@@ -149,10 +149,8 @@ def make_summary_ie(data_path, id, out_path, summ_path, length, options):
     query = open(data_path + id + '.query').read().replace('\n', ' ')
     sentence_concepts_file, concept_weights_file, length_file, orig_file, group_file, depend_file, atleast_file = make_concepts_ie(id, out_path, sents, query, options)
     if num_filtered < len(sents):
-        if options.decoder == "localsolver":
-            summ_sent_nums = decoder_localsolver.decode(length, length_file, sentence_concepts_file, concept_weights_file, group_file, depend_file, atleast_file)
-        else:
-            summ_sent_nums = decoder2.decode(length, length_file, sentence_concepts_file, concept_weights_file, group_file, depend_file, atleast_file)
+        method = "local" if options.decoder == "localsolver" else "ilp"
+        summ_sent_nums = decoder2.decode(length, length_file, sentence_concepts_file, concept_weights_file, group_file, depend_file, atleast_file, method=method)
 
         summary = [sents[i] for i in summ_sent_nums]
         summary = order(summary)
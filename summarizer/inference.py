@@ -5,7 +5,17 @@ import re
 import collections
 import prob_util
 import decoder2
-import decoder_localsolver
+import ilp
+import conceptmatrix
+import sentstore
+import numpy as np
+from scipy import sparse
+import functools
+import multiprocessing
+import multiprocessing.util
+import shutil
+import tempfile
+import traceback
 
 
 class Sentence:
@@ -100,6 +110,13 @@ def load_sents_compress(path, id):
 
 
 def load_sents(path, id):
+    """
+    sentences of the topic, from its sentence store (sentstore.py) if there is one,
+    otherwise from the .sent, .sent.tok, .doc and .par (and .sent.tok.parsed) files
+    """
+    store_file = sentstore.store_path(path, id)
+    if os.path.exists(store_file):
+        return load_store_sents(store_file, os.path.join(path, id), id)
 
     data_path = os.path.join(path, id)
     orig_fh = open(data_path + '.sent')
@@ -132,6 +149,30 @@ def load_sents(path, id):
     sys.stderr.write('topic [%s]: got [%d] sentences\n' %(id, count))
     return sents
 
+def load_store_sents(store_file, data_path, id):
+    """
+    same as load_sents from a sentence store. Without a tokens column, the tokens are
+    read from the .sent.tok file if it exists
+    """
+    with sentstore.SentenceStore(store_file) as store:
+        toks = store.tokens()
+        columns = list(zip(store.texts(), store.docs(), store.pars(), store.orders()))
+    if toks is not None:
+        toks = [' '.join(tokens) for tokens in toks]
+    elif os.path.exists(data_path + '.sent.tok'):
+        toks = open(data_path + '.sent.tok').read().splitlines()
+    parses = None
+    if os.path.exists(data_path + '.sent.tok.parsed'):
+        parses = open(data_path + '.sent.tok.parsed').read().splitlines()
+    sents = []
+    for count, (orig, doc, par, order) in enumerate(columns):
+        tok = toks[count].strip() if toks is not None and count < len(toks) else ""
+        parse = parses[count].strip() if parses is not None and count < len(parses) else ""
+        sents.append(Sentence(count, order, orig.strip(), doc, tok, parse, '%d' %int(par)))
+
+    sys.stderr.write('topic [%s]: got [%d] sentences from %s\n' %(id, len(sents), store_file))
+    return sents
+
 def fix_text(text):
     """
     prepare text for ngram concept extraction
@@ -178,7 +219,7 @@ def create_ilp_output(sents, concepts, path):
     ## output concept weights
     concept_weights_file = path + '.concepts'
     concept_fh = open(concept_weights_file, 'w')
-    for concept, value in concepts.items():
+    for concept, value in sorted(concepts.items()):
         #if not concept in used_concepts: continue
         concept_fh.write('%s %1.7f\n' %(concept, value))
     concept_fh.close()
@@ -289,10 +330,40 @@ def make_concepts_baseline(id, path, sents, query):
 def make_concepts(id, path, sents, query,clusters_file,count_pfactor):
     """
     """
+    final_concepts = build_concepts(id, path, sents, query, clusters_file, count_pfactor)
+    return create_ilp_output(sents, final_concepts, path+id)
 
-    query_words = set(util.porter_stem_sent(util.remove_stopwords(util.tokenize(fix_text(query)))).split())
-    seen_sents = set()
-    all_concepts = collections.defaultdict(set)
+def build_concepts(id, path, sents, query,clusters_file,count_pfactor):
+    """
+    set the concepts of each sentence and return the {concept: weight} dictionary
+    """
+    concept_matrix = build_concept_matrix(id, sents, clusters_file, count_pfactor)
+    concept_matrix.set_sentence_concepts(sents)
+    return concept_matrix.weight_dict()
+
+def cluster_sentences(clusters_file, current, previous):
+    """
+    sentences of the current set (e.g. "B") found in the clusters (lines of
+    clusters_file) of sentences of the previous sets (e.g. "A")
+    """
+    others = [letter for letter in "ABC" if letter != current]
+    sentences = []
+    for line in open(clusters_file):
+        if not any(letter in line for letter in previous): continue
+        for cl in line.split():
+            if any(letter in cl for letter in others): continue
+            sentences.append(int(cl.split(current)[0])) # sentence number is string
+    return sentences
+
+def build_concept_matrix(id, sents, clusters_file, count_pfactor):
+    """
+    conceptmatrix.ConceptMatrix of the bigrams of the sentences: their weight is
+    the number of documents they appear in, first sentences counting
+    1 + first_weight, and the concepts of the sentences are restricted to those
+    of weight at least count_thresh which are not just stopwords. The weight of
+    the concepts of set B (C) sentences clustered with set A (A or B) sentences is
+    divided by count_pfactor
+    """
     ## different processing for set A and set B
     if '-B' in id or '-C' in id:
         first_weight = 2
@@ -305,23 +376,23 @@ def make_concepts(id, path, sents, query,clusters_file,count_pfactor):
     #modif : query_thresh = 1 -> query_thresh = 0
         #query_thresh = 1
 
-    for sent in sents:
+    vocabulary = conceptmatrix.Vocabulary()
+    documents = conceptmatrix.Vocabulary()
+    seen_sents = set()
+    sent_concepts = []
+    keys = np.zeros(len(sents), dtype=np.int64)
+    contributing = np.zeros(len(sents), dtype=bool)
+    kept = np.zeros(len(sents), dtype=bool)
+    for index, sent in enumerate(sents):
         print("**ID** %s" %sent.id)
-        ## store this sentence's concepts
-        sent.concepts = set()
-    #wprint sent
-        concepts = set(util.get_ngrams(sent.tok2, 2, bounds=False, as_string=True))
+        ## bigrams, as util.get_ngrams(sent.tok2, 2, as_string=True)
+        words = sent.tok2.split()
+        sent_concepts.append(vocabulary.intern_all([first + '_' + second for first, second in zip(words, words[1:])]))
         #concepts = set(util.get_skip_bigrams(sent.tok2, 4, bounds=False, as_string=True))
 
-        ## get query overlap
-        query_overlap = set(util.remove_stopwords(sent.tok2.split())).intersection(query_words)
-
         ## aggregate all concepts
-        if not sent.skip_concepts: # and len(query_overlap) >= query_thresh:
-            for concept in concepts:
-                if sent.order == 0: all_concepts[concept].add('<first>_' + sent.doc)
-                #if len(query_overlap) > 3: all_concepts[concept].add('<query>_' + sent.doc)
-                else: all_concepts[concept].add(sent.doc)
+        keys[index] = 2 * documents.intern(sent.doc) + int(sent.order == 0)
+        contributing[index] = not sent.skip_concepts
 
         ## ignore some sents
         skip = False
@@ -336,69 +407,34 @@ def make_concepts(id, path, sents, query,clusters_file,count_pfactor):
         if skip or sent.skip: continue
 
         seen_sents.add(sent.tok)
-        sent.concepts = concepts
-# To run initial icsisumm without clustering, do not run code below
-    abconcepts_set=set()
-    if "-B" in id:
-        if clusters_file != None:
-            print("if clusters_file != None:")
-            clusters = {}
-            lines=map(str.strip,open(clusters_file).readlines())
-            for idx, line in enumerate(lines):
-                if "A" not in line : continue
-                else:
-                    clusters[idx]=[]
-                    clusteridx=line.split()
-                    for cl in clusteridx:
-                        if "A" in cl or "C" in cl: continue
-                        else:
-                            absent_idx=int(cl.split("B")[0]) # sentence number is string
-                            abconcepts=set(sents[absent_idx].concepts)
-                            abconcepts_set=abconcepts_set | abconcepts
-    elif "-C" in id:
-        if clusters_file != None:
-            abcconcepts_set=set()
-            print("if clusters_file != None:")
-            clusters = {}
-            lines=map(str.strip,open(clusters_file).readlines())
-            for idx, line in enumerate(lines):
-                if  "B" not in line and "A" not in line: continue
-                else:
-                    clusters[idx]=[]
-                    clusteridx=line.split()
-                    for cl in clusteridx:
-                        if "A" in cl or "B" in cl: continue
-                        else:
-                            abcsent_idx=int(cl.split("C")[0]) # sentence number is string
-                            abcconcepts=set(sents[abcsent_idx].concepts)
-                            abcconcepts_set=abcconcepts_set | abcconcepts
+        kept[index] = True
+    matrix = conceptmatrix.incidence(sent_concepts, len(sents), len(vocabulary))
+    ## concepts of the sentences which are not ignored
+    sent_matrix = sparse.csr_matrix(matrix.multiply(kept[:, np.newaxis]))
+    sent_matrix.eliminate_zeros()
 
     ## create final concept set
-    final_concepts = {}
-    for concept, docs in all_concepts.items():
-        count = len(docs)
-        firsts = len([1 for d in docs if '<first>_' in d])
-        count = count + (first_weight * firsts)
-        if count < count_thresh: continue
-        print("CONCEPT %s : %s" %(concept,count))
-        if util.is_just_stopwords(concept.split('_')): continue
-        if "-B" in id:
-            if concept in abconcepts_set:
-                #count =count
-                #if count < 10 :
-               count = count / count_pfactor
-        if "-C" in id:
-            if concept in abcconcepts_set:
-                #count =count
-                #if count < 10 :
-                count = count / count_pfactor
-        final_concepts[concept] = count
-    final_concept_set = set(final_concepts.keys())
+    count, firsts = conceptmatrix.document_frequency(matrix, keys, 2 * len(documents), contributing)
+    count = count + first_weight * firsts
+    candidates = np.flatnonzero(count >= count_thresh)
+    for concept in candidates:
+        print("CONCEPT %s : %s" %(vocabulary.strings[concept], count[concept]))
+    final = np.array([concept for concept in candidates if not util.is_just_stopwords(vocabulary.strings[concept].split('_'))], dtype=np.int64)
+    weights = count.astype(float)
+# To run initial icsisumm without clustering, do not run code below
+    if clusters_file != None and ("-B" in id or "-C" in id):
+        print("if clusters_file != None:")
+        if "-B" in id: clustered = cluster_sentences(clusters_file, "B", "A")
+        else: clustered = cluster_sentences(clusters_file, "C", "AB")
+        penalized = np.asarray(sent_matrix[clustered].sum(axis=0)).ravel() > 0
+        weights[penalized] = weights[penalized] / count_pfactor
 # Initial icsisumm code continues here
-    for sent in sents:
-        sent.concepts = sent.concepts.intersection(final_concept_set)
-
-    return create_ilp_output(sents, final_concepts, path+id)
+    ## concepts in sorted order, as the .concepts file
+    final = final[np.argsort([vocabulary.strings[concept] for concept in final], kind='stable')]
+    concepts = [vocabulary.strings[concept] for concept in final]
+    sent_matrix = sparse.csr_matrix(sent_matrix[:, final])
+    sent_matrix.sort_indices()
+    return conceptmatrix.ConceptMatrix(concepts, weights[final], sent_matrix)
 
 def make_concepts_compress(id, path, sents, query, compressed_sents):
     """
@@ -661,7 +697,7 @@ def order(sents):
 
 
 import firstsent
-def make_summary(data_path, id, out_path, summ_path, length, options):
+def make_summary(data_path, id, out_path, summ_path, length, options, tmp_dir=None):
 
     ## load sents
     sents = load_sents(data_path, id)
@@ -749,7 +785,10 @@ def make_summary(data_path, id, out_path, summ_path, length, options):
         sentence_cluster_file = None
 
     count_pfactor=options.count
-    sentence_concepts_file, concept_weights_file, length_file, orig_file, group_file, depend_file, atleast_file = make_concepts(id, out_path, sents, query, sentence_cluster_file, count_pfactor)
+    concept_matrix = build_concept_matrix(id, sents, sentence_cluster_file, count_pfactor)
+    if options.dump_ilp:
+        concept_matrix.set_sentence_concepts(sents)
+        sentence_concepts_file, concept_weights_file, length_file, orig_file, group_file, depend_file, atleast_file = create_ilp_output(sents, concept_matrix.weight_dict(), out_path+id)
     print("MAKE CONCEPTS SUCCESSFULL !!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!")
 
 #    print "if -A in id: sentence_cluster_file = data_path + id + '.sent.tok.clus'"
@@ -763,10 +802,12 @@ def make_summary(data_path, id, out_path, summ_path, length, options):
     ## run decoder
     #cmd = '/usr/local/bin/python2.7 decoder2.py %d %s %s %s %s %s %s' %(length, length_file, sentence_concepts_file, concept_weights_file, group_file, depend_file, atleast_file)
     #summ_sent_nums = map(int, os.popen(cmd).read().splitlines())
+    backend = "milp" if options.decoder == "milp" else "glpsol"
+    method = options.decoder if options.decoder in ["greedy", "lagrangian"] else "ilp"
     if options.decoder == "localsolver":
-        summ_sent_nums = decoder_localsolver.decode(length, length_file, sentence_concepts_file, concept_weights_file, group_file, depend_file, atleast_file)
-    else:
-        summ_sent_nums = decoder2.decode(length, length_file, sentence_concepts_file, concept_weights_file, group_file, depend_file, atleast_file)
+        method = "local"
+    presolved = "check" if options.check_presolve else options.presolve
+    summ_sent_nums = decoder2.decode_in_memory(sents, concept_matrix, length, backend=backend, presolved=presolved, method=method, warm_start=options.warm_start, time_limit=options.time_limit, tmp_dir=tmp_dir)
     print("DECODER TERMINATED !!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!")
     #usable_sents = open(orig_file).read().splitlines()
     #summary = [usable_sents[i] for i in summ_sent_nums]
@@ -777,9 +818,45 @@ def make_summary(data_path, id, out_path, summ_path, length, options):
     summary = order(summary)
     ## output summary goes in the summary directory in the out_path
     if 'tac08' in out_path: id = id[:5] + id[6:]
-    summary_fh = open(summ_path + id, 'w')
-    for sent in summary:
-        summary_fh.write('%s\n' %sent)
+    with open(summ_path + id, 'w') as summary_fh:
+        for sent in summary:
+            summary_fh.write('%s\n' %sent)
+
+
+def summarize_topic(data_path, out_path, summ_path, length, options, id):
+    """
+    make_summary with the decoder files in a temporary directory of the topic (kept with
+    --dump-ilp). Returns (id, None if the summary was written or the traceback of the
+    failure, including sys.exit, ILP cache hits, ILP cache misses)
+    """
+    hits, misses = (ilp.CACHE.hits, ilp.CACHE.misses) if ilp.CACHE else (0, 0)
+    tmp_dir = tempfile.mkdtemp(prefix='decoder.%s.' % id)
+    error = None
+    try:
+        make_summary(data_path, id, out_path, summ_path, length, options, tmp_dir)
+    except (Exception, SystemExit):
+        error = traceback.format_exc()
+    print(util.memo_report(), file=sys.stderr)
+    if options.dump_ilp:
+        print(f"ILP files of {id} in {tmp_dir}", file=sys.stderr)
+    else:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    if ilp.CACHE:
+        hits, misses = ilp.CACHE.hits - hits, ilp.CACHE.misses - misses
+    return id, error, hits, misses
+
+
+def init_worker(ilp_cache):
+    # the solution cache of a worker process, with its own counters
+    if ilp_cache:
+        ilp.CACHE = ilp.SolutionCache(ilp_cache, int(os.environ.get('ILP_CACHE_SIZE', 10000)))
+
+
+def init_pool_worker(ilp_cache):
+    init_worker(ilp_cache)
+    if util.MEMO_FILE:
+        # pool workers exit without running the atexit functions
+        multiprocessing.util.Finalize(None, util.save_memos, (util.MEMO_FILE, util.MEMOS), exitpriority=0)
 
 from optparse import OptionParser
 def get_options(parser=None):
@@ -801,7 +878,21 @@ def get_options(parser=None):
                       help='path of input files')
     parser.add_option('-o', '--output-path', dest='outpath', type='str',
                       help='path to store output')
-    parser.add_option('--decoder', dest='decoder', type='str', default="glpsolve", help='ILP decoder (glpsolve or localsolver)')
+    parser.add_option('--decoder', dest='decoder', type='str', default="glpsolve", help='ILP decoder (glpsolve, milp: scipy in process, or approximate: localsolver: simulated annealing, greedy, lagrangian: greedy refined by Lagrangian relaxation)')
+    parser.add_option('--time-limit', dest='time_limit', type='int', default=None,
+                      help='time limit of the decoder in seconds (default: 1 for localsolver, 100 otherwise)')
+    parser.add_option('--warm-start', dest='warm_start', default=False, action='store_true',
+                      help='constrain the ILP to do at least as well as the greedy summary, kept if the solver finds no better one')
+    parser.add_option('--dump-ilp', dest='dump_ilp', default=False, action='store_true',
+                      help='also write the ILP input files (.sent.concepts, .concepts, .sent.lengths...) of each topic in the output path, for debugging')
+    parser.add_option('--ilp-cache', dest='ilp_cache', type='str', default=os.environ.get('ILP_CACHE'),
+                      help='directory of the cache of the ILP solutions, so that unchanged ILPs are not solved again (default: $ILP_CACHE, no cache if unset)')
+    parser.add_option('--presolve', dest='presolve', default=False, action='store_true',
+                      help='remove dominated sentences and fold the concepts of a single sentence before solving the ILP')
+    parser.add_option('--check-presolve', dest='check_presolve', default=False, action='store_true',
+                      help='as --presolve, also solving the full ILP to warn if the optimum differs')
+    parser.add_option('-j', '--jobs', dest='jobs', type='int', default=1,
+                      help='number of topics summarized in parallel')
     parser.add_option('-w', '--clweight', dest='clweight', type='int', help='weight of each cluster in the objective function')
     parser.add_option('--count', dest='count', type='float', help='concepts count threshold')
     parser.add_option('--thresh', dest='thresh', type='str', help='weight of each cluster in the objective function')
@@ -812,18 +903,45 @@ if __name__ == '__main__':
     (options, args) = get_options()
 
     ## new output
-    os.popen('mkdir -p %s' %options.outpath + '/summary/')
+    os.makedirs(options.outpath + '/summary/', exist_ok=True)
 
     ## parameters
     length = 100
 
+    init_worker(options.ilp_cache)
+
     ## run through all topics
     print(f"inference inputpath is {options.inputpath}", file=sys.stderr)
     ids = get_topic_ids(options.inputpath)
     print(f"inference ids are {ids}", file=sys.stderr)
-    for id in ids:
-        #if '-C' in id: continue
-        make_summary(options.inputpath, id, options.outpath, options.outpath + '/summary/', length, options)
+    summarize = functools.partial(summarize_topic, options.inputpath, options.outpath, options.outpath + '/summary/', length, options)
+    pool = None
+    if options.jobs > 1:
+        pool = multiprocessing.Pool(options.jobs, init_pool_worker, (options.ilp_cache,))
+        results = pool.imap(summarize, ids)
+    else:
+        results = map(summarize, ids)
+    failed = []
+    try:
+        for id, error, hits, misses in results:
+            # the counters of the workers, a serial run already counted them in ilp.CACHE
+            if ilp.CACHE and pool:
+                ilp.CACHE.hits += hits
+                ilp.CACHE.misses += misses
+            if error:
+                print(f"ERROR: topic {id} failed\n{error}", file=sys.stderr)
+                failed.append(id)
+    except BaseException:
+        if pool: pool.terminate()
+        raise
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+    if ilp.CACHE:
+        print(ilp.CACHE.report(), file=sys.stderr)
+    if failed:
+        print(f"{len(failed)} of {len(ids)} topics failed: {' '.join(failed)}", file=sys.stderr)
 
     if options.task not in ['chorali']:
         ## ROUGE evaluation
@@ -846,3 +964,5 @@ if __name__ == '__main__':
         evaluate_duc.run_rouge(ROUGE_SCORER, config_file, length, verbose=False)
         os.remove(config_file)
 
+    if failed:
+        sys.exit(1)
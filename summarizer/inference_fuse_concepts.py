@@ -1,5 +1,5 @@
 import sys, os, util, re, collections
-import prob_util, decoder2, decoder_localsolver
+import prob_util, decoder2
 #import random
 
 class Sentence:
@@ -689,10 +689,8 @@ def make_summary(data_path, id, out_path, summ_path, length, options):
     ## run decoder
     #cmd = '/usr/local/bin/python2.7 decoder2.py %d %s %s %s %s %s %s' %(length, length_file, sentence_concepts_file, concept_weights_file, group_file, depend_file, atleast_file)
     #summ_sent_nums = map(int, os.popen(cmd).read().splitlines())
-    if options.decoder == "localsolver":
-        summ_sent_nums = decoder_localsolver.decode(length, length_file, sentence_concepts_file, concept_weights_file, group_file, depend_file, atleast_file)
-    else:
-        summ_sent_nums = decoder2.decode(length, length_file, sentence_concepts_file, concept_weights_file, group_file, depend_file, atleast_file)
+    method = "local" if options.decoder == "localsolver" else "ilp"
+    summ_sent_nums = decoder2.decode(length, length_file, sentence_concepts_file, concept_weights_file, group_file, depend_file, atleast_file, method=method)
     #usable_sents = open(orig_file).read().splitlines()
     #summary = [usable_sents[i] for i in summ_sent_nums]
     #summary = [compressed_sents[i] for i in summ_sent_nums]
@@ -726,7 +724,7 @@ def get_options(parser=None):
                       help='path of input files')
     parser.add_option('-o', '--output-path', dest='outpath', type='str',
                       help='path to store output')
-    parser.add_option('--decoder', dest='decoder', type='str', default="glpsolve", help='ILP decoder (glpsolve or localsolver)')
+    parser.add_option('--decoder', dest='decoder', type='str', default="glpsolve", help='ILP decoder (glpsolve, or localsolver: simulated annealing)')
     return parser.parse_args()
 
 if __name__ == '__main__':
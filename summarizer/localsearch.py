@@ -0,0 +1,246 @@
+"""
+local search for the concept coverage models (decoder2.build_program,
+concept_mapper.Mapper.run), replacing the LocalSolver program: simulated
+annealing over the sentence selections, within a wall-clock budget.
+
+A move adds a sentence (with the sentences it depends on), removes one (with
+the selected sentences depending on it) or swaps one for another. The
+covered concepts are counted so that a move is evaluated in the time of the
+concepts of its sentences. Moves breaking the length budget or a group are
+not made, nor those leaving no sentence of the at least constraint. The
+temperature decreases geometrically with the elapsed time.
+"""
+import sys, time, math, random
+
+
+def requirements(sentence_concepts, depends):
+    """
+    ({sentence: sentences it depends on, directly or not}, sentences which
+    cannot be selected because they depend on a sentence without concepts)
+    """
+    direct = {}
+    if depends != None:
+        for sentence in sentence_concepts:
+            direct[sentence] = set(depends[sentence]) - set([sentence])
+    requires = {}
+    forbidden = set()
+    for sentence in sentence_concepts:
+        closure, stack = set(), list(direct.get(sentence, ()))
+        while stack:
+            id = stack.pop()
+            if id in closure or id == sentence: continue
+            if id not in sentence_concepts:
+                forbidden.add(sentence)
+                break
+            closure.add(id)
+            stack.extend(direct.get(id, ()))
+        if closure:
+            requires[sentence] = closure
+    for sentence, closure in requires.items():
+        if closure & forbidden:
+            forbidden.add(sentence)
+    return dict((sentence, closure) for sentence, closure in requires.items() if sentence not in forbidden), forbidden
+
+
+class LocalSearch:
+    """
+    selection of sentences with incremental bookkeeping, improved by
+    simulated annealing (run). Without forced_coverage, the concepts of
+    non-positive weight are ignored (never covered by the ILP); with it, all
+    the concepts of the selected sentences count. length_weight is subtracted
+    from the objective per word
+    self.weights     {concept: weight}
+    self.concepts    {sentence: concepts} of the candidate sentences
+    self.sentences   sorted candidate sentences
+    self.requires    {sentence: sentences it depends on}
+    self.dependents  {sentence: sentences depending on it}
+    self.group       {sentence: group} of the candidates in a group
+    self.atleast     candidates of which at least one must be selected
+    self.selected    current selection, with self.count {concept: number of
+                     selected sentences containing it}, self.length,
+                     self.value and self.groups (groups used)
+    self.trace       [(seconds, value)] of the improvements of the best value
+    self.iterations  number of moves tried by run
+    """
+
+    def __init__(self, concept_weights, sentence_concepts, lengths, max_length, groups=None, depends=None, atleast=None, forced_coverage=False, length_weight=0.0):
+        self.lengths = lengths
+        self.max_length = max_length
+        self.length_weight = length_weight
+        self.weights = dict((concept, weight) for concept, weight in concept_weights.items() if forced_coverage or weight > 0)
+        self.requires, forbidden = requirements(sentence_concepts, depends)
+        self.sentences = sorted(sentence for sentence in sentence_concepts if sentence not in forbidden)
+        self.concepts = dict((sentence, [concept for concept in sentence_concepts[sentence] if concept in self.weights]) for sentence in self.sentences)
+        self.dependents = {}
+        for sentence, closure in self.requires.items():
+            for id in closure:
+                self.dependents.setdefault(id, set()).add(sentence)
+        self.group = {}
+        if groups != None:
+            self.group = dict((sentence, groups[sentence]) for sentence in self.sentences if groups[sentence] != '')
+        self.atleast = set()
+        if atleast != None:
+            # as in the ILP, including the sentences which cannot be selected
+            self.atleast = set(sentence for sentence in sentence_concepts if atleast[sentence])
+        self.selected = set()
+        self.count = {}
+        self.length = 0
+        self.value = 0.0
+        self.groups = set()
+        self.trace = []
+        self.iterations = 0
+
+    def add(self, sentence):
+        self.selected.add(sentence)
+        for concept in self.concepts[sentence]:
+            if self.count.get(concept, 0) == 0:
+                self.value += self.weights[concept]
+            self.count[concept] = self.count.get(concept, 0) + 1
+        self.length += self.lengths[sentence]
+        self.value -= self.length_weight * self.lengths[sentence]
+        if sentence in self.group:
+            self.groups.add(self.group[sentence])
+
+    def remove(self, sentence):
+        self.selected.remove(sentence)
+        for concept in self.concepts[sentence]:
+            self.count[concept] -= 1
+            if self.count[concept] == 0:
+                self.value -= self.weights[concept]
+        self.length -= self.lengths[sentence]
+        self.value += self.length_weight * self.lengths[sentence]
+        if sentence in self.group:
+            self.groups.discard(self.group[sentence])
+
+    def addition(self, sentence):
+        # sentences to add to select sentence, None if they do not fit
+        new = (set([sentence]) | self.requires.get(sentence, set())) - self.selected
+        if self.length + sum(self.lengths[id] for id in new) > self.max_length:
+            return None
+        groups = [self.group[id] for id in new if id in self.group]
+        if len(groups) != len(set(groups)) or self.groups.intersection(groups):
+            return None
+        return sorted(new)
+
+    def removal(self, sentence):
+        # sentences to remove to deselect sentence
+        return sorted(set([sentence]) | (self.dependents.get(sentence, set()) & self.selected))
+
+    def apply(self, added, removed):
+        for sentence in removed:
+            self.remove(sentence)
+        for sentence in added:
+            self.add(sentence)
+
+    def undo(self, added, removed):
+        for sentence in added:
+            self.remove(sentence)
+        for sentence in removed:
+            self.add(sentence)
+
+    def initial(self):
+        """
+        greedy start: sentences by decreasing gain per word, beginning with
+        the best at least sentence
+        """
+        def gain(sentence):
+            return sum(self.weights[concept] for concept in self.concepts[sentence]) / max(self.lengths[sentence], 1)
+        if self.atleast:
+            for sentence in sorted(self.atleast & set(self.concepts), key=lambda s: (-gain(s), s)):
+                added = self.addition(sentence)
+                if added is not None:
+                    self.apply(added, [])
+                    break
+        for sentence in sorted(self.sentences, key=lambda s: (-gain(s), s)):
+            if sentence in self.selected: continue
+            added = self.addition(sentence)
+            if added is None: continue
+            value = self.value
+            self.apply(added, [])
+            if self.value <= value:
+                self.undo(added, [])
+
+    def feasible(self):
+        return self.length <= self.max_length and (not self.atleast or bool(self.atleast & self.selected))
+
+    def move(self, rng):
+        """
+        random move applied to the selection, as (added, removed), None if
+        the move is not possible
+        """
+        unselected = len(self.sentences) - len(self.selected)
+        kind = rng.random()
+        removed = []
+        if self.selected and (kind < 1 / 3.0 or (kind < 2 / 3.0 and unselected > 0)):
+            removed = self.removal(rng.choice(sorted(self.selected)))
+            if kind < 1 / 3.0:
+                self.apply([], removed)
+                if not self.feasible():
+                    self.undo([], removed)
+                    return None
+                return [], removed
+        if unselected == 0:
+            return None
+        self.apply([], removed)
+        sentence = rng.choice(self.sentences)
+        added = None if sentence in self.selected else self.addition(sentence)
+        if added is None:
+            self.undo([], removed)
+            return None
+        self.apply(added, [])
+        if not self.feasible():
+            self.undo(added, removed)
+            return None
+        return added, removed
+
+    def run(self, time_limit=1.0, iterations=None, seed=0, start_temperature=None, end_temperature=1e-4):
+        """
+        simulated annealing for time_limit seconds (or a number of
+        iterations), returns the best feasible selection found, the empty
+        selection (reported) if there is none
+        """
+        rng = random.Random(seed)
+        start = time.time()
+        self.initial()
+        best, best_value = None, None
+        self.trace = []
+        if self.feasible():
+            best, best_value = set(self.selected), self.value
+            self.trace.append((time.time() - start, best_value))
+        if len(self.sentences) == 0:
+            return self.result(best)
+        if start_temperature is None:
+            # of the order of the weight of a concept
+            start_temperature = max(sum(abs(weight) for weight in self.weights.values()) / max(len(self.weights), 1), end_temperature)
+        temperature, iteration, progress = start_temperature, 0, 0.0
+        while progress < 1.0:
+            iteration += 1
+            if iterations != None:
+                progress = iteration / float(iterations)
+            elif iteration % 100 == 0:
+                progress = (time.time() - start) / time_limit
+            if iteration % 100 == 0 or iterations != None:
+                temperature = start_temperature * (end_temperature / start_temperature) ** min(progress, 1.0)
+            value = self.value
+            move = self.move(rng)
+            if move is None: continue
+            delta = self.value - value
+            if delta < 0 and rng.random() >= math.exp(delta / temperature):
+                self.undo(*move)
+            elif self.feasible() and (best is None or self.value > best_value + 1e-12):
+                best, best_value = set(self.selected), self.value
+                self.trace.append((time.time() - start, best_value))
+        self.iterations = iteration
+        return self.result(best)
+
+    def result(self, best):
+        if best is None:
+            sys.stderr.write("ERROR: local search found no feasible selection, the selection is empty\n")
+            return []
+        return sorted(best)
+
+    def report(self):
+        # number of moves and best value over time
+        if not self.trace:
+            return "local search: %d moves, no feasible selection" % self.iterations
+        return "local search: %d moves, best value %s" % (self.iterations, " ".join("%g (%.2fs)" % (value, seconds) for seconds, value in self.trace))
@@ -0,0 +1,151 @@
+"""
+presolve of the budgeted concept coverage ILP (decoder2.build_program,
+concept_mapper.Mapper.run): sentences and concepts are integer ids, the
+model selects sentences under a length budget to maximize the weight of the
+covered concepts.
+
+Two reductions keep the optimum:
+- dominance: a sentence whose concepts are a subset of those of another
+  sentence at most as long can be replaced by it in any solution, so it is
+  removed (ties are broken by id)
+- singleton concepts: a concept found in a single sentence is covered iff
+  that sentence is selected, its weight is folded into the objective
+  coefficient of the sentence
+
+With forced_coverage (Mapper.run, whose absence constraints cover the
+concepts of the selected sentences even when their weight is negative), a
+sentence only dominates another if its extra concepts have non-negative
+weights. Otherwise (decoder2) the concepts with a non-positive weight are
+never covered and are dropped.
+
+Sentences in constraints other than the length (groups, dependencies, at
+least one) must be given as fixed: they are never removed or used as
+dominating sentences.
+"""
+
+
+class Reduction:
+    """
+    reduced model and what was removed
+    self.concept_weights    {concept: weight} of the concepts kept
+    self.sentence_concepts  {sentence: [concepts]} of the sentences kept, possibly without concepts
+    self.index              {concept: [sentences]} of the concepts kept
+    self.bonus              {sentence: total weight of its folded concepts}
+    self.dominated          {removed sentence: sentence dominating it, None if it has no concept}
+    self.folded             {folded concept: its sentence}
+    self.dropped            concepts removed because they are never worth covering
+    self.original           {sentence: concepts} of the original model
+    self.forced_coverage    see presolve()
+    """
+
+    def __init__(self, sentence_concepts, forced_coverage):
+        self.original = sentence_concepts
+        self.forced_coverage = forced_coverage
+        self.concept_weights = {}
+        self.sentence_concepts = {}
+        self.index = {}
+        self.bonus = {}
+        self.dominated = {}
+        self.folded = {}
+        self.dropped = []
+
+    def restore(self, selection, concept_weights):
+        """
+        (sentences, concepts) of the original model for the sentences selected
+        in the reduced model: the sentence ids are kept, the covered concepts
+        include the folded ones
+        """
+        sentences = sorted(selection)
+        concepts = set()
+        for sentence in sentences:
+            for concept in self.original[sentence]:
+                if self.forced_coverage or concept_weights[concept] > 0:
+                    concepts.add(concept)
+        return sentences, sorted(concepts)
+
+    def report(self):
+        num_concepts = len(set(concept for concepts in self.original.values() for concept in concepts))
+        return "presolve: %d -> %d sentences (%d dominated), %d -> %d concepts (%d folded, %d dropped)" % (
+            len(self.original), len(self.sentence_concepts), len(self.dominated),
+            num_concepts, len(self.index), len(self.folded), len(self.dropped))
+
+
+def concept_index(sentence_concepts):
+    index = {}
+    for sentence in sorted(sentence_concepts):
+        for concept in sentence_concepts[sentence]:
+            if concept not in index: index[concept] = []
+            index[concept].append(sentence)
+    return index
+
+
+def dominates(other, sentence, sets, lengths, concept_weights, forced_coverage):
+    # True if other can replace sentence in any solution
+    if not sets[sentence] <= sets[other] or lengths[sentence] < lengths[other]:
+        return False
+    if sets[sentence] == sets[other] and lengths[sentence] == lengths[other] and other > sentence:
+        return False
+    if forced_coverage:
+        return min([concept_weights[concept] for concept in sets[other] - sets[sentence]] + [0]) >= 0
+    return True
+
+
+def presolve(concept_weights, sentence_concepts, lengths, fixed=(), forced_coverage=False):
+    """
+    Reduction of the model given by concept_weights {concept: weight},
+    sentence_concepts {sentence: concepts} and lengths (indexed by sentence)
+    """
+    fixed = set(fixed)
+    reduction = Reduction(sentence_concepts, forced_coverage)
+    # without forced coverage, only the concepts of positive weight matter
+    sets = dict((sentence, set(concept for concept in concepts if forced_coverage or concept_weights[concept] > 0))
+                for sentence, concepts in sentence_concepts.items())
+    index = concept_index(sentence_concepts)
+
+    for sentence in sorted(sets):
+        if sentence in fixed: continue
+        if len(sets[sentence]) == 0:
+            reduction.dominated[sentence] = None
+            continue
+        # a dominating sentence has all the concepts, including the rarest one
+        rarest = min(sets[sentence], key=lambda concept: (len(index[concept]), concept))
+        for other in index[rarest]:
+            if other != sentence and other not in fixed and dominates(other, sentence, sets, lengths, concept_weights, forced_coverage):
+                reduction.dominated[sentence] = other
+                break
+
+    kept = dict((sentence, concepts) for sentence, concepts in sentence_concepts.items() if sentence not in reduction.dominated)
+    for concept, sentences in concept_index(kept).items():
+        weight = concept_weights[concept]
+        if not forced_coverage and weight <= 0:
+            reduction.dropped.append(concept)
+        elif len(sentences) == 1:
+            reduction.folded[concept] = sentences[0]
+            reduction.bonus[sentences[0]] = reduction.bonus.get(sentences[0], 0) + weight
+        else:
+            reduction.concept_weights[concept] = weight
+    for sentence, concepts in kept.items():
+        reduction.sentence_concepts[sentence] = [concept for concept in concepts if concept in reduction.concept_weights]
+    reduction.index = concept_index(reduction.sentence_concepts)
+    return reduction
+
+
+def objective(selection, concept_weights, sentence_concepts, lengths, length_weight=0.0, forced_coverage=False):
+    """
+    value of the selected sentences in the original model, whose objective
+    subtracts length_weight times the length of each sentence
+    """
+    concepts = set()
+    for sentence in selection:
+        concepts.update(sentence_concepts[sentence])
+    value = sum(concept_weights[concept] for concept in concepts if forced_coverage or concept_weights[concept] > 0)
+    return value - length_weight * sum(lengths[sentence] for sentence in selection)
+
+
+def same_optimum(selection, reference, concept_weights, sentence_concepts, lengths, length_weight=0.0, forced_coverage=False, tolerance=1e-6):
+    """
+    True if the selections found with and without presolve have the same value
+    """
+    value = objective(selection, concept_weights, sentence_concepts, lengths, length_weight, forced_coverage)
+    expected = objective(reference, concept_weights, sentence_concepts, lengths, length_weight, forced_coverage)
+    return abs(value - expected) <= tolerance * max(1.0, abs(expected))
@@ -0,0 +1,8 @@
+# the modules are scripts run from their directory: make them importable
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("ICSISUMM", ROOT)
+for directory in ("scripts", "summarizer"):
+    sys.path.insert(0, os.path.join(ROOT, directory))
@@ -0,0 +1,71 @@
+"""
+small random summarization models (as decoder2.read_model returns them) and
+their optimum by enumeration
+"""
+import itertools
+
+
+def random_model(rng, sentences, concepts=10, constraints=True):
+    """
+    (concept_weights, sentence_concepts, index, lengths, groups, depends,
+    atleast) with negative weights, sentences without concepts and, with
+    constraints, groups, dependencies and at least sentences
+    """
+    concept_weights = dict((c, float(rng.choice([rng.randint(1, 9), rng.randint(-3, 9)]))) for c in range(concepts))
+    sentence_concepts = {}
+    for sentence in range(sentences):
+        chosen = rng.sample(range(concepts), rng.randint(0, 4))
+        if chosen:
+            sentence_concepts[sentence] = dict.fromkeys(chosen, True)
+    index = {}
+    for sentence, chosen in sentence_concepts.items():
+        for concept in chosen:
+            index.setdefault(concept, []).append(sentence)
+    lengths = [rng.randint(5, 60) for sentence in range(sentences)]
+    groups = depends = atleast = None
+    if constraints:
+        groups = [rng.choice(['', '', '', '1', '2']) for sentence in range(sentences)]
+        depends = [[rng.randrange(sentences)] if rng.random() < 0.15 else [] for sentence in range(sentences)]
+        atleast = [rng.random() < 0.1 for sentence in range(sentences)]
+    return concept_weights, sentence_concepts, index, lengths, groups, depends, atleast
+
+
+def value(selection, concept_weights, sentence_concepts, lengths, length_weight=1 / 1000.0):
+    covered = set(concept for sentence in selection for concept in sentence_concepts[sentence])
+    return sum(concept_weights[concept] for concept in covered if concept_weights[concept] > 0) - \
+        length_weight * sum(lengths[sentence] for sentence in selection)
+
+
+def feasible(selection, model, max_length):
+    concept_weights, sentence_concepts, index, lengths, groups, depends, atleast = model
+    selection = set(selection)
+    if not selection <= set(sentence_concepts) or sum(lengths[s] for s in selection) > max_length:
+        return False
+    if groups is not None:
+        used = [groups[s] for s in selection if groups[s] != '']
+        if len(used) != len(set(used)):
+            return False
+    if depends is not None:
+        if any(id not in selection for s in selection for id in depends[s]):
+            return False
+    if atleast is not None:
+        required = [s for s in sentence_concepts if atleast[s]]
+        if required and not selection & set(required):
+            return False
+    return True
+
+
+def optimum(model, max_length):
+    """
+    best value of a feasible selection, None if there is none
+    """
+    concept_weights, sentence_concepts, index, lengths = model[:4]
+    best = None
+    candidates = sorted(sentence_concepts)
+    for size in range(len(candidates) + 1):
+        for selection in itertools.combinations(candidates, size):
+            if feasible(selection, model, max_length):
+                v = value(selection, concept_weights, sentence_concepts, lengths)
+                if best is None or v > best:
+                    best = v
+    return best
@@ -0,0 +1,34 @@
+import random
+
+import pytest
+
+import decoder_greedy
+from randommodels import feasible, optimum, random_model, value
+
+
+@pytest.mark.parametrize("lagrangian", [False, True])
+def test_bound_is_above_the_optimum(lagrangian):
+    rng = random.Random(0)
+    for trial in range(150):
+        model = random_model(rng, rng.randint(1, 10), constraints=rng.random() < 0.5)
+        concept_weights, sentence_concepts, index, lengths, groups, depends, atleast = model
+        # sentences without words (infinite profit per word in the relaxation)
+        for sentence in range(len(lengths)):
+            if rng.random() < 0.1:
+                lengths[sentence] = 0
+        best = optimum(model, 100)
+        greedy = decoder_greedy.Model(concept_weights, sentence_concepts, lengths, 100, groups, depends, atleast)
+        selection, selection_value, bound = decoder_greedy.decode_model(greedy, lagrangian)
+        if best is None:
+            continue
+        assert bound >= best - 1e-9
+        if selection:
+            assert feasible(selection, model, 100)
+            assert selection_value == pytest.approx(value(selection, concept_weights, sentence_concepts, lengths))
+            assert selection_value <= best + 1e-9
+
+
+def test_fractional_knapsack_takes_the_zero_length_items():
+    x, total = decoder_greedy.fractional_knapsack({0: 5.0, 1: 1.0, 2: -1.0}, [2, 0, 0], 1)
+    assert x == {1: 1.0, 0: 0.5}
+    assert total == 3.5
@@ -0,0 +1,50 @@
+import numpy as np
+
+from featurecache import FeatureCache, embeddings_identity
+from similaritymatrix import SentenceFeatures
+
+
+def features(n):
+    return dict(("key%d" % i, SentenceFeatures(
+        frozenset(["w%d" % i, "x"]), sorted(["w%d" % i, "x"]),
+        np.arange(3, dtype=np.float32) + i)) for i in range(n))
+
+
+def test_round_trip(tmp_path):
+    cache = FeatureCache(str(tmp_path / "features.db"))
+    saved = features(3)
+    saved["unknown"] = SentenceFeatures(frozenset(["zz"]), [], None)
+    saved["empty"] = SentenceFeatures(frozenset(), [], None)
+    cache.put(saved)
+    found = cache.get(list(saved) + ["missing"])
+    assert sorted(found) == sorted(saved)
+    for key, feat in saved.items():
+        assert found[key].content == feat.content
+        assert found[key].words == feat.words
+        if feat.vector is None:
+            assert found[key].vector is None
+        else:
+            assert found[key].vector.dtype == np.float32
+            assert np.array_equal(found[key].vector, feat.vector)
+    assert (cache.hits, cache.misses) == (5, 1)
+    cache.close()
+
+
+def test_evict_least_recently_used(tmp_path):
+    cache = FeatureCache(str(tmp_path / "features.db"), max_entries=2)
+    saved = features(3)
+    cache.put({"key0": saved["key0"], "key1": saved["key1"]})
+    cache.put({"key2": saved["key2"]})
+    cache.get(["key0"])
+    assert cache.evict() == 1
+    assert sorted(cache.get(["key0", "key1", "key2"])) == ["key0", "key2"]
+    assert cache.evict() == 0
+    cache.close()
+
+
+def test_embeddings_identity_changes_with_the_file(tmp_path):
+    path = tmp_path / "vectors.txt"
+    path.write_text("a 1 2\n")
+    before = embeddings_identity(str(path))
+    path.write_text("a 1 2\nb 3 4\n")
+    assert embeddings_identity(str(path)) != before
@@ -0,0 +1,45 @@
+import os
+
+import ilp
+
+
+def program(weight=3.0):
+    solver = ilp.IntegerLinearProgram(backend="milp")
+    for name, value in (("s0", weight), ("s1", 2.0), ("s2", 2.0)):
+        solver.add_binary(name)
+        solver.add_objective([name], [value])
+    solver.add_constraint("length", ["s0", "s1", "s2"], [30, 20, 20], "<=", 40)
+    return solver
+
+
+def test_cpxlp_text_keeps_the_order_of_the_terms():
+    solver = program(1 / 3.0)
+    assert str(solver) == ("Maximize\nscore: +0.333333 s0 +2 s1 +2 s2\n\nSubject To\n"
+                           "length: +30 s0 +20 s1 +20 s2 <= 40\n\nBinary\ns0\ns1\ns2\nEnd\n")
+
+
+def test_solutions_are_cached(tmp_path, monkeypatch):
+    monkeypatch.setattr(ilp, "CACHE", ilp.SolutionCache(str(tmp_path)))
+    first = program()
+    first.run()
+    assert first.optimal
+    assert first.output == {"s0": 0, "s1": 1, "s2": 1}
+    second = program()
+    second.run()
+    assert second.output == first.output
+    assert (ilp.CACHE.hits, ilp.CACHE.misses) == (1, 1)
+    # another program or time limit is another key
+    third = program(5.0)
+    third.run()
+    assert third.output == {"s0": 1, "s1": 0, "s2": 0}
+    assert ilp.CACHE.key(str(first), "milp", 100) != ilp.CACHE.key(str(first), "milp", 10)
+
+
+def test_cache_is_pruned_in_batches(tmp_path):
+    cache = ilp.SolutionCache(str(tmp_path), size=20)
+    sizes = []
+    for n in range(60):
+        cache.put("key%d" % n, "OPTIMAL", {"s0": 1})
+        sizes.append(len(os.listdir(str(tmp_path))))
+    assert max(sizes) <= 22
+    assert 20 in sizes
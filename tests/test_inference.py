@@ -0,0 +1,84 @@
+import collections
+import random
+import re
+
+import pytest
+
+import decoder2
+import inference
+import util
+
+
+def old_build_concepts(id, sents, clusters_file, count_pfactor):
+    # the dictionary version build_concept_matrix replaced
+    all_concepts = collections.defaultdict(set)
+    first_weight, count_thresh = (2, 4) if '-B' in id or '-C' in id else (1, 3)
+    seen_sents = set()
+    for sent in sents:
+        sent.concepts = set()
+        concepts = set(util.get_ngrams(sent.tok2, 2, bounds=False, as_string=True))
+        if not sent.skip_concepts:
+            for concept in concepts:
+                all_concepts[concept].add(('<first>_' if sent.order == 0 else '') + sent.doc)
+        skip = sent.length < 10 or sent.tok in seen_sents or re.match('^["(].*[")]$', sent.orig) or sent.unresolved
+        if skip or sent.skip: continue
+        seen_sents.add(sent.tok)
+        sent.concepts = concepts
+    clustered = set()
+    if clusters_file != None and ("-B" in id or "-C" in id):
+        new, old = ("B", "A") if "-B" in id else ("C", "AB")
+        for line in open(clusters_file):
+            if not any(set_name in line for set_name in old): continue
+            for key in line.split():
+                if not any(set_name in key for set_name in "ABC".replace(new, "")):
+                    clustered |= set(sents[int(key.split(new)[0])].concepts)
+    final_concepts = {}
+    for concept, docs in all_concepts.items():
+        count = len(docs) + first_weight * len([1 for d in docs if '<first>_' in d])
+        if count < count_thresh: continue
+        if util.is_just_stopwords(concept.split('_')): continue
+        if concept in clustered:
+            count = count / count_pfactor
+        final_concepts[concept] = count
+    for sent in sents:
+        sent.concepts = sent.concepts.intersection(final_concepts)
+    return final_concepts
+
+
+def random_topic(rng, id, tmp_path):
+    words = "the a of cat dog market price rose fell bank city river storm election vote party leader and to in".split()
+    sents = []
+    for i in range(rng.randint(0, 60)):
+        orig = " ".join(rng.choice(words) for _ in range(rng.randint(3, 18)))
+        if rng.random() < .05: orig = '"' + orig + '"'
+        sent = inference.Sentence(i, rng.choice([0, 1, 2, 3]), orig, "d%d" % rng.randint(0, 5),
+                                  tok=rng.choice([orig, "dup"]))
+        sent.skip_concepts = rng.random() < .1
+        sent.skip = rng.random() < .05
+        sent.unresolved = rng.random() < .05
+        sents.append(sent)
+    clusters = None
+    if id != "D1-A" and sents:
+        clusters = str(tmp_path / "clusters")
+        with open(clusters, "w") as out:
+            for _ in range(8):
+                keys = ["%d%s" % (rng.randrange(len(sents)), rng.choice("ABC")) for _ in range(rng.randint(1, 4))]
+                out.write(" ".join(keys) + "\n")
+    return sents, clusters
+
+
+@pytest.mark.parametrize("id", ["D1-A", "D1-B", "D1-C"])
+def test_concept_matrix_matches_the_dictionary_version(id, tmp_path, monkeypatch):
+    # the sentences are given already tokenized
+    monkeypatch.setattr(util, "tokenize", lambda text: text)
+    rng = random.Random(id)
+    for trial in range(20):
+        sents, clusters = random_topic(rng, id, tmp_path)
+        reference = list(sents)
+        old = old_build_concepts(id, reference, clusters, 2.0)
+        old_concepts = [set(sent.concepts) for sent in reference]
+        matrix = inference.build_concept_matrix(id, sents, clusters, 2.0)
+        assert matrix.weight_dict() == pytest.approx(old)
+        matrix.set_sentence_concepts(sents)
+        assert [set(sent.concepts) for sent in sents] == old_concepts
+        assert decoder2.model_from_matrix(sents, matrix) == decoder2.model_in_memory(sents, old)
@@ -0,0 +1,33 @@
+import random
+
+import localsearch
+from randommodels import feasible, optimum, random_model, value
+
+
+def test_summaries_are_feasible():
+    rng = random.Random(0)
+    found = 0
+    for trial in range(150):
+        model = random_model(rng, rng.randint(1, 10), constraints=True)
+        concept_weights, sentence_concepts, index, lengths, groups, depends, atleast = model
+        search = localsearch.LocalSearch(concept_weights, sentence_concepts, lengths, 100, groups, depends, atleast,
+                                         length_weight=1 / 1000.0)
+        selection = search.run(iterations=300, seed=trial)
+        best = optimum(model, 100)
+        if best is None:
+            assert selection == []
+            continue
+        if selection:
+            assert feasible(selection, model, 100)
+            assert value(selection, concept_weights, sentence_concepts, lengths) <= best + 1e-9
+            found += 1
+    assert found > 100
+
+
+def test_no_summary_when_the_at_least_sentence_does_not_fit():
+    search = localsearch.LocalSearch({'a': 1.0, 'b': 2.0}, {0: ['a'], 1: ['b']}, [150, 20], 100,
+                                     atleast=[True, False])
+    assert search.run(iterations=200) == []
+    search = localsearch.LocalSearch({'a': 1.0, 'b': 2.0}, {0: ['a'], 1: ['b']}, [50, 20], 100,
+                                     atleast=[True, False])
+    assert search.run(iterations=200) == [0, 1]
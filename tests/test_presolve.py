@@ -0,0 +1,50 @@
+import random
+
+import pytest
+
+import decoder2
+import presolve
+from randommodels import optimum, random_model, value
+
+
+def decode(model, max_length, presolved):
+    concept_weights, sentence_concepts, index, lengths, groups, depends, atleast = model
+    solver = decoder2.new_solver("glpsol", backend="milp")
+    return decoder2.decode_program(solver, concept_weights, sentence_concepts, index, lengths, max_length,
+                                   groups, depends, atleast, presolved=presolved)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_presolved_program_has_the_same_optimum(seed):
+    rng = random.Random(seed)
+    for trial in range(30):
+        model = random_model(rng, rng.randint(1, 10), constraints=rng.random() < 0.5)
+        best = optimum(model, 100)
+        for presolved in (False, True):
+            selection = decode(model, 100, presolved)
+            if best is None:
+                continue
+            assert value(selection, *model[:2], model[3]) == pytest.approx(best)
+
+
+def test_forced_coverage_reduction_has_the_same_optimum():
+    # concept_mapper model: the negative concepts of the selected sentences count
+    rng = random.Random(0)
+    for trial in range(100):
+        model = random_model(rng, rng.randint(1, 9), constraints=False)
+        concept_weights, sentence_concepts, index, lengths = model[:4]
+        sentence_concepts = dict((s, list(concepts)) for s, concepts in sentence_concepts.items())
+        full = max(presolve.objective(selection, concept_weights, sentence_concepts, lengths, 0, True)
+                   for selection in subsets(sorted(sentence_concepts), lengths, 100))
+        reduction = presolve.presolve(concept_weights, sentence_concepts, lengths, forced_coverage=True)
+        reduced = max(sum(reduction.concept_weights[c] for c in set(c for s in selection for c in reduction.sentence_concepts[s])) +
+                      sum(reduction.bonus.get(s, 0) for s in selection)
+                      for selection in subsets(sorted(reduction.sentence_concepts), lengths, 100))
+        assert reduced == pytest.approx(full)
+
+
+def subsets(sentences, lengths, max_length):
+    for mask in range(1 << len(sentences)):
+        selection = [s for k, s in enumerate(sentences) if mask >> k & 1]
+        if sum(lengths[s] for s in selection) <= max_length:
+            yield selection
@@ -0,0 +1,101 @@
+# problemcache and the preprocess util and text modules it uses, which have the
+# names of summarizer modules: they are imported for each test only
+import os
+import sys
+
+import pytest
+
+pytest.importorskip("sbd")
+
+PREPROCESS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "preprocess")
+NAMES = ("util", "text", "globals", "treenode", "problemcache")
+
+
+@pytest.fixture
+def problemcache():
+    path, modules = list(sys.path), dict(sys.modules)
+    for name in NAMES:
+        sys.modules.pop(name, None)
+    sys.path.insert(0, PREPROCESS)
+    try:
+        import problemcache
+        yield problemcache
+    finally:
+        sys.path[:] = path
+        for name in NAMES:
+            sys.modules.pop(name, None)
+        sys.modules.update(modules)
+
+
+class Problem:
+    def __init__(self, id, paths):
+        self.id = id
+        self.new_docs_paths = paths
+        self.old_docs_paths = []
+        self.parsed = False
+        self.loaded_ir_docs = False
+
+
+def document(problemcache, id, sentences, isempty=False):
+    doc = problemcache.text.Document.__new__(problemcache.text.Document)
+    doc.id, doc.source, doc.date = id, "XIE", "19980304"
+    doc.paragraphs = [" ".join(sentences)]
+    doc._isempty = isempty
+    doc.sentences = []
+    for order, sentence in enumerate(sentences):
+        doc.sentences.append(problemcache.text.Sentence(sentence, order, doc.source, doc.date))
+        doc.sentences[-1].paragraph_starter = order == 0
+    return doc
+
+
+def fields(doc):
+    return (doc.id, doc.source, doc.date, doc.paragraphs, doc._isempty,
+            [(s.original, s.order, s.paragraph_starter, s.parsed, s.stemmed) for s in doc.sentences])
+
+
+def test_documents_round_trip(problemcache):
+    docs = [document(problemcache, "d1", ["The cat sat.", "It slept."]),
+            document(problemcache, "d2", [], isempty=True)]
+    docs[0].sentences[1].parsed = "(S (NP It) (VP slept))"
+    restored = [problemcache.restore_document(problemcache.compact_document(doc)) for doc in docs]
+    assert [fields(doc) for doc in restored] == [fields(doc) for doc in docs]
+    assert restored[1]._isempty and not restored[0]._isempty
+
+
+def test_unsplit_document(problemcache):
+    doc = document(problemcache, "d1", [])
+    del doc.sentences
+    restored = problemcache.restore_document(problemcache.compact_document(doc))
+    assert not hasattr(restored, "sentences")
+
+
+def test_shards_and_manifest(problemcache, tmp_path):
+    source = tmp_path / "d1"
+    source.write_text("<DOC>The cat sat.</DOC>")
+    cache_dir = str(tmp_path / "cache")
+    problem = Problem("D01", [str(source)])
+    problem.new_docs = [document(problemcache, "d1", ["The cat sat."])]
+    problem.old_docs = None
+    cache = problemcache.ProblemCache(cache_dir)
+    assert cache.lookup(problem) is None
+    cache.save(problem, is_clean=False)
+    cache.write_manifest()
+    assert not cache.changed
+
+    manifest = os.path.join(cache_dir, problemcache.MANIFEST)
+    written = os.stat(manifest).st_mtime_ns
+    cache = problemcache.ProblemCache(cache_dir)
+    entry = cache.lookup(problem)
+    assert entry is not None and cache.lookup(problem, is_clean=True) is None
+    cache.write_manifest()
+    assert os.stat(manifest).st_mtime_ns == written
+
+    loaded = Problem("D01", [str(source)])
+    cache.attach(loaded, entry)
+    loaded.shard.load(loaded)
+    assert [fields(doc) for doc in loaded.new_docs] == [fields(doc) for doc in problem.new_docs]
+
+    os.utime(str(source), ns=(1, 1))
+    assert cache.lookup(problem) is not None and cache.changed
+    source.write_text("<DOC>The dog sat.</DOC>")
+    assert cache.lookup(problem) is None
@@ -0,0 +1,43 @@
+import pytest
+
+import sentstore
+
+TEXTS = ["Première phrase.", "Second one.", "", "Last sentence here."]
+DOCS = ["b", "b", "a", "a"]
+PARS = [True, False, True, False]
+TOKENS = [["première", "phrase", "."], ["second", "one", "."], [], ["last", "sentence", "here", "."]]
+
+
+def test_write_and_read(tmp_path):
+    path = str(tmp_path / "topic.npz")
+    sentstore.write(path, TEXTS, DOCS, PARS, tokens=TOKENS)
+    with sentstore.SentenceStore(path) as store:
+        assert len(store) == 4
+        assert store.texts() == TEXTS
+        assert store.docs() == DOCS
+        assert store.pars() == PARS
+        assert store.orders() == [0, 1, 0, 1]
+        assert store.tokens() == TOKENS
+        assert store.stems() is None
+    assert not list(tmp_path.glob("*.tmp*"))
+
+
+def test_add_keeps_the_other_columns(tmp_path):
+    path = str(tmp_path / "topic.npz")
+    sentstore.write(path, TEXTS, DOCS, PARS, orders=[3, 4, 0, 1], tokens=TOKENS)
+    stems = [[token[:3] for token in tokens] for tokens in TOKENS]
+    sentstore.SentenceStore(path).add("stems", stems)
+    with sentstore.SentenceStore(path) as store:
+        assert store.columns == ["doc", "order", "par", "stems", "text", "tokens"]
+        assert store.stems() == stems
+        assert store.tokens() == TOKENS
+        assert store.orders() == [3, 4, 0, 1]
+        assert store.docs() == DOCS
+
+
+def test_add_checks_the_length(tmp_path):
+    path = str(tmp_path / "topic.npz")
+    sentstore.write(path, TEXTS, DOCS, PARS)
+    with sentstore.SentenceStore(path) as store:
+        with pytest.raises(ValueError):
+            store.add("tokens", TOKENS[:2])
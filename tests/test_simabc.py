@@ -0,0 +1,58 @@
+import io
+
+import numpy as np
+
+import simabc
+
+
+def random_graph(n=30, seed=0):
+    rng = np.random.default_rng(seed)
+    rows, cols = np.triu_indices(n, 1)
+    weights = rng.choice(np.array([0.0, 0.5, 0.96, 0.97, 0.98, 0.99, 1.0],
+                                  dtype=np.float32), len(rows))
+    weights[::7] += rng.random(len(weights[::7])).astype(np.float32) * 0.01
+    return ["%dA" % i for i in range(n)], rows.astype(np.int32), cols.astype(np.int32), weights
+
+
+def edge_set(rows, cols, weights):
+    return set(zip(rows.tolist(), cols.tolist(), weights.tolist()))
+
+
+def test_sorted_and_unsorted_cuts_are_the_same():
+    keys, rows, cols, weights = random_graph()
+    srows, scols, sweights = simabc.sort_edges(rows, cols, weights)
+    assert np.all(np.diff(sweights) <= 0)
+    for minsim in [0.0001, 0.5, 0.96, 0.97, 0.975, 0.98, 0.99, 1.0, 1.1]:
+        cut = simabc.threshold_edges(rows, cols, weights, minsim)
+        # a weight of 0.97 is kept at the threshold 0.97
+        assert np.all(cut[2] >= np.float32(minsim))
+        assert edge_set(*cut) == edge_set(*simabc.threshold_edges(
+            srows, scols, sweights, minsim, ordered=True))
+
+
+def test_npz_round_trip(tmp_path):
+    keys, rows, cols, weights = random_graph()
+    path = str(tmp_path / "graph.npz")
+    simabc.write_npz(path, keys, rows, cols, weights)
+    assert not simabc.is_sorted(path)
+    read = simabc.read_edges(path)
+    assert read[0] == keys
+    assert edge_set(*read[1:]) == edge_set(rows, cols, weights)
+    simabc.write_npz(path, keys, *simabc.sort_edges(rows, cols, weights), ordered=True)
+    assert simabc.is_sorted(path)
+
+
+def test_sparse_text_keeps_the_isolated_sentences(tmp_path):
+    keys = ["0A", "1A", "2A", "3B"]
+    rows, cols, weights = simabc.edges_from_matrix(np.array(
+        [[1, 0.99, 0.2, 0.1], [0.99, 1, 0.3, 0.1], [0.2, 0.3, 1, 0.1],
+         [0.1, 0.1, 0.1, 1]], dtype=np.float32), 0.9)
+    out = io.StringIO()
+    simabc.write_sparse(out, keys, rows, cols, weights)
+    assert out.getvalue() == "0A 1A 0.99\n2A 2A 0.0\n3B 3B 0.0\n"
+    path = tmp_path / "graph.abc"
+    path.write_text(out.getvalue())
+    read_keys, read_rows, read_cols, read_weights = simabc.read_edges(str(path))
+    assert read_keys == keys
+    assert edge_set(*simabc.sort_edges(read_rows, read_cols, read_weights)) == \
+        {(0, 1, np.float32(0.99).item())}
@@ -0,0 +1,59 @@
+import numpy as np
+
+import similaritylsh
+from similaritymatrix import SentenceFeatures, similarity_matrix
+
+
+def clustered_features(n, dims=16, seed=0):
+    # sentences around a few directions, sharing the words of their direction
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((4, dims))
+    features = []
+    for i in range(n):
+        topic = i % 4
+        vector = (centers[topic] + 0.05 * rng.standard_normal(dims)).astype(np.float32)
+        words = ["t%d" % topic, "u%d" % rng.integers(3)]
+        features.append(SentenceFeatures(frozenset(words + ["s%d" % i]),
+                                         sorted(words), vector))
+    return features
+
+
+def exact_edges(features, dims, floor):
+    sim = similarity_matrix(features, dims)
+    rows, cols = np.nonzero(np.triu(sim > floor, 1))
+    return set(zip(rows.tolist(), cols.tolist())), sim
+
+
+def test_edges_are_exact_similarities():
+    features = clustered_features(120)
+    edges, sim = exact_edges(features, 16, 0.9)
+    rows, cols, weights, candidates, largest = similaritylsh.approximate_edges(
+        features, 16, 0.9, bits=8, tables=10)
+    assert np.all(rows < cols)
+    assert np.array_equal(weights, sim[rows, cols])
+    assert set(zip(rows.tolist(), cols.tolist())) <= edges
+    assert candidates <= 120 * 119 // 2
+    found, total = similaritylsh.sample_recall(features, 16, 0.9, rows, cols,
+                                               sample=120)
+    assert total == 2 * len(edges)
+    assert found / total > 0.95
+
+
+def test_buckets_are_capped():
+    features = clustered_features(400)
+    rows, cols, weights, candidates, largest = similaritylsh.approximate_edges(
+        features, 16, 0.9, bits=2, tables=4, max_bucket=50)
+    assert largest <= 50
+    uncapped = similaritylsh.approximate_edges(features, 16, 0.9, bits=2,
+                                               tables=4, max_bucket=0)
+    assert uncapped[4] > 50
+    assert candidates < uncapped[3]
+
+
+def test_identical_sentences_are_always_found():
+    features = clustered_features(30)
+    features.append(SentenceFeatures(features[0].content, [], None))
+    rows, cols, weights, candidates, largest = similaritylsh.approximate_edges(
+        features, 16, 0.99, bits=16, tables=1)
+    pairs = dict(zip(zip(rows.tolist(), cols.tolist()), weights.tolist()))
+    assert pairs[(0, 30)] == 1.0
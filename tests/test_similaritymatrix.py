@@ -0,0 +1,49 @@
+import numpy as np
+
+from similaritymatrix import (SentenceFeatures, extend_similarity,
+                              similarity_matrix)
+
+
+def random_features(n, dims=8, vocabulary=12, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((vocabulary, dims)).astype(np.float32)
+    features = []
+    for i in range(n):
+        words = sorted(set(rng.choice(vocabulary, rng.integers(0, 4)).tolist()))
+        # the words above 9 are not in the embeddings
+        known = ["w%d" % w for w in words if w < 10]
+        vector = vectors[[w for w in words if w < 10]].mean(axis=0) if known else None
+        features.append(SentenceFeatures(frozenset("w%d" % w for w in words),
+                                         known, vector))
+    return features
+
+
+def pairwise(features):
+    # the w2v rules, one pair at a time
+    n = len(features)
+    sim = np.zeros((n, n), dtype=np.float32)
+    for i in range(n):
+        for j in range(n):
+            a, b = features[i], features[j]
+            if i == j or a.content == b.content:
+                sim[i, j] = 1.0
+            elif set(a.words) & set(b.words):
+                sim[i, j] = np.dot(a.vector / np.linalg.norm(a.vector),
+                                   b.vector / np.linalg.norm(b.vector))
+    return sim
+
+
+def test_similarity_matrix_follows_the_w2v_rules():
+    features = random_features(40)
+    assert np.allclose(similarity_matrix(features, 8), pairwise(features),
+                       atol=1e-6)
+
+
+def test_extended_matrix_is_the_full_matrix():
+    features = random_features(50, seed=1)
+    full = similarity_matrix(features, 8)
+    a = similarity_matrix(features[:20], 8)
+    ab = extend_similarity(a, features[:20], features[20:35], 8)
+    abc = extend_similarity(ab, features[:35], features[35:], 8)
+    assert np.array_equal(ab, full[:35, :35])
+    assert np.array_equal(abc, full)
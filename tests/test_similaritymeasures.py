@@ -0,0 +1,99 @@
+import random
+from operator import itemgetter
+
+import numpy as np
+import pytest
+
+try:
+    import similaritymeasures
+except LookupError as e: # nltk data not installed
+    pytest.skip(str(e), allow_module_level=True)
+from similaritymeasures import stop, w2v_bg, w2v_bg_batch, w2v_words, word_tokenize
+
+
+class WordModel:
+    # the part of the gensim KeyedVectors used by the measures
+    def __init__(self, words, dims=6, seed=0):
+        rng = np.random.default_rng(seed)
+        self.vocab = dict((w, rng.standard_normal(dims).astype(np.float32)) for w in words)
+        self.vector_size = dims
+
+    def __getitem__(self, word):
+        return self.vocab[word]
+
+    def similarity(self, w1, w2):
+        v1, v2 = self.vocab[w1], self.vocab[w2]
+        return np.dot(v1 / np.linalg.norm(v1), v2 / np.linalg.norm(v2))
+
+
+def old_w2v_words(s1, s2, wordmodel):
+    # word by word version the matrix one replaced
+    if s1 == s2:
+        return 1.0
+    cw1 = [w for w in word_tokenize(s1) if w not in stop]
+    cw2 = [w for w in word_tokenize(s2) if w not in stop]
+    intersection = set(cw1) & set(cw2)
+    if len(intersection) == 0:
+        return 0
+    l1 = [word for word in cw1 if word not in intersection]
+    l2 = [word for word in cw2 if word not in intersection]
+    if len(l1) > len(l2):
+        l1, l2 = l2, l1
+    totalscore = 0
+    for t1 in l1:
+        sublist = []
+        hasitem = False
+        for i, t2 in enumerate(l2):
+            if t1 in wordmodel.vocab and t2 in wordmodel.vocab:
+                sublist.append((i, wordmodel.similarity(t1, t2)))
+                hasitem = True
+            else:
+                sublist.append((i, 0))
+        if hasitem:
+            maxitem, subscore = max(sublist, key=itemgetter(1))
+            l2.pop(maxitem)
+            totalscore += subscore
+    return float(len(intersection) + totalscore) / min(len(s1.split()), len(s2.split()))
+
+
+def old_w2v_bg(bg1, bg2, wordmodel):
+    if bg1 == bg2:
+        return 1.0
+    intersection = bg1 & bg2
+    l1 = [word for word in bg1 if word not in intersection]
+    l2 = [word for word in bg2 if word not in intersection]
+    if len(l1) > len(l2):
+        l1, l2 = l2, l1
+    totalscore = 0
+    for t1 in l1:
+        sublist = []
+        for i, t2 in enumerate(l2):
+            if t1 in wordmodel.vocab and t2 in wordmodel.vocab:
+                sublist.append((i, wordmodel.similarity(t1, t2)))
+        if sublist:
+            maxitem, subscore = max(sublist, key=itemgetter(1))
+            l2.pop(maxitem)
+            totalscore += subscore
+    return float(len(intersection) + totalscore) / 2
+
+
+WORDS = ["w%d" % i for i in range(15)]
+MODEL = WordModel(WORDS[:12])
+
+
+def test_w2v_words_matches_the_word_by_word_alignment():
+    rng = random.Random(0)
+    for trial in range(300):
+        s1 = " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 8)))
+        s2 = " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 8)))
+        assert w2v_words(s1, s2, MODEL) == pytest.approx(old_w2v_words(s1, s2, MODEL), abs=1e-5)
+
+
+def test_w2v_bg_matches_the_word_by_word_alignment():
+    rng = random.Random(1)
+    pairs = [(set(rng.sample(WORDS, 2)), set(rng.sample(WORDS, 2))) for _ in range(300)]
+    pairs.append(({"w1", "w2"}, {"w1", "w2"}))
+    scores = w2v_bg_batch(pairs, MODEL)
+    for (bg1, bg2), score in zip(pairs, scores):
+        assert score == pytest.approx(old_w2v_bg(bg1, bg2, MODEL), abs=1e-5)
+        assert w2v_bg(bg1, bg2, MODEL) == score
@@ -0,0 +1,66 @@
+import numpy as np
+
+import simabc
+import sparsemcl
+
+
+def cliques(sizes, weight=0.99, bridge=0.5):
+    # disjoint cliques, consecutive cliques joined by one weaker edge
+    rows, cols, weights = [], [], []
+    start = 0
+    for k, size in enumerate(sizes):
+        for i in range(start, start + size):
+            for j in range(i + 1, start + size):
+                rows.append(i), cols.append(j), weights.append(weight)
+        if k:
+            rows.append(start - 1), cols.append(start), weights.append(bridge)
+        start += size
+    return (["%dA" % i for i in range(start)], np.array(rows, dtype=np.int32),
+            np.array(cols, dtype=np.int32), np.array(weights, dtype=np.float32))
+
+
+def test_mcl_separates_the_cliques():
+    keys, rows, cols, weights = cliques([5, 4, 3])
+    graph = sparsemcl.graph_matrix(len(keys), rows, cols, weights)
+    assert sparsemcl.mcl(graph) == [[0, 1, 2, 3, 4], [5, 6, 7, 8], [9, 10, 11]]
+
+
+def test_isolated_nodes_are_singletons():
+    graph = sparsemcl.graph_matrix(3, np.zeros(0, dtype=np.int32),
+                                   np.zeros(0, dtype=np.int32),
+                                   np.zeros(0, dtype=np.float32))
+    assert sparsemcl.mcl(graph) == [[0], [1], [2]]
+
+
+def test_sweep_of_a_sorted_graph_is_the_same():
+    keys, rows, cols, weights = cliques([5, 4, 3, 6])
+    thresholds = [0.4, 0.5, 0.9, 0.99, 1.0]
+    sweep = sparsemcl.threshold_sweep(keys, rows, cols, weights, thresholds)
+    ordered = sparsemcl.threshold_sweep(
+        keys, *simabc.sort_edges(rows, cols, weights), thresholds, ordered=True)
+    assert sweep == ordered
+    assert [len(clusters) for threshold, clusters in sweep] == [4, 4, 4, 4, 18]
+
+
+def test_components_are_the_connected_components_of_each_cut():
+    rng = np.random.default_rng(0)
+    n = 60
+    rows, cols = np.triu_indices(n, 1)
+    kept = rng.random(len(rows)) < 0.03
+    rows, cols = rows[kept].astype(np.int32), cols[kept].astype(np.int32)
+    weights = rng.choice(np.array([0.5, 0.96, 0.97, 0.99], dtype=np.float32), len(rows))
+    thresholds = [0.97, 0.5, 0.99, 0.96]
+    for threshold, clusters in sparsemcl.components_sweep(n, rows, cols, weights, thresholds):
+        cut = simabc.threshold_edges(rows, cols, weights, threshold)
+        graph = sparsemcl.graph_matrix(n, *cut)
+        labels = sparsemcl.connected_components(graph, directed=False)[1]
+        assert clusters == sparsemcl.sorted_clusters(labels.tolist())
+
+
+def test_components_respect_the_maximum_size():
+    keys, rows, cols, weights = cliques([5, 4, 3], bridge=0.99)
+    sweep = sparsemcl.threshold_sweep(keys, rows, cols, weights, [0.9],
+                                      backend="components", max_size=5)
+    clusters = sweep[0][1]
+    assert max(len(cluster) for cluster in clusters) <= 5
+    assert sorted(node for cluster in clusters for node in cluster) == list(range(12))
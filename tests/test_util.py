@@ -0,0 +1,40 @@
+import multiprocessing
+
+import util
+
+
+def test_memo_drops_the_least_recently_used():
+    memo = util.Memo(lambda x: x * 2, 3)
+    assert [memo(x) for x in [1, 2, 3, 1, 4, 5]] == [2, 4, 6, 2, 8, 10]
+    assert list(memo.results) == [1, 4, 5]
+    assert (memo.hits, memo.misses) == (1, 5)
+
+
+def test_saved_memos_are_merged(tmp_path):
+    path = str(tmp_path / "memos")
+    first = util.Memo(str, 4)
+    for x in [1, 2, 3]:
+        first(x)
+    util.save_memos(path, {"str": first})
+    second = util.Memo(str, 4)
+    second(9)
+    util.save_memos(path, {"str": second})
+    loaded = util.Memo(str, 4)
+    util.load_memos(path, {"str": loaded})
+    assert list(loaded.results) == [1, 2, 3, 9]
+
+
+def save_many(args):
+    path, worker = args
+    for k in range(10):
+        memo = util.Memo(str, 100000)
+        for j in range(50):
+            memo("%d-%d-%d" % (worker, k, j))
+        util.save_memos(path, {"str": memo})
+
+
+def test_concurrent_saves_keep_all_the_results(tmp_path):
+    path = str(tmp_path / "memos")
+    with multiprocessing.Pool(4) as pool:
+        pool.map(save_many, [(path, worker) for worker in range(4)])
+    assert len(util.load_pickle(path)["str"]) == 4 * 10 * 50